@@ -0,0 +1,63 @@
+# benchmarks/bench_separation.py
+"""
+Songs-per-hour of Demucs separation, one song per apply_model call vs. chunks
+from several songs packed into shared batches. Needs torch and demucs (the
+real model, on CPU by default).
+
+    python -m benchmarks.bench_separation --songs 4 --duration 60 --batch_sizes 4 8 16
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import generate_song  # noqa: E402
+from src.separator import load_demucs_model, separate_vocals, separate_vocals_batch  # noqa: E402
+
+
+def songs_per_hour(songs: int, seconds: float) -> float:
+    return songs * 3600.0 / seconds if seconds > 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Demucs batched vs. sequential separation throughput.")
+    parser.add_argument("--songs", type=int, default=4, help="Synthetic songs to separate.")
+    parser.add_argument("--duration", type=float, default=60.0, help="Song length in seconds.")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[4, 8], help="Chunks per forward pass to try.")
+    parser.add_argument("--shifts", type=int, default=1, help="Random shifts per song (both modes).")
+    args = parser.parse_args()
+
+    model = load_demucs_model()
+    model.eval()
+    with tempfile.TemporaryDirectory(prefix="cleanmusic-sep-") as work_dir:
+        paths = []
+        for i in range(args.songs):
+            mix = generate_song(os.path.join(work_dir, f"song{i}"), args.duration, seed=i)["paths"]["mix"]
+            # Stems are stored per input file name, and every synthetic mix is called mix.wav.
+            path = os.path.join(work_dir, f"song{i}.wav")
+            os.replace(mix, path)
+            paths.append(path)
+
+        start = time.perf_counter()
+        for path in paths:
+            separate_vocals(path, output_dir=os.path.join(work_dir, "sequential"), model=model, shifts=args.shifts)
+        sequential = time.perf_counter() - start
+        print(f"sequential (shifts={args.shifts}): {sequential:.1f}s, {songs_per_hour(args.songs, sequential):.1f} songs/hour")
+
+        for batch_size in args.batch_sizes:
+            start = time.perf_counter()
+            separate_vocals_batch(
+                paths, output_dir=os.path.join(work_dir, f"batch{batch_size}"), model=model,
+                batch_size=batch_size, shifts=args.shifts
+            )
+            elapsed = time.perf_counter() - start
+            print(
+                f"batched (batch={batch_size}, shifts={args.shifts}): {elapsed:.1f}s, "
+                f"{songs_per_hour(args.songs, elapsed):.1f} songs/hour"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# benchmarks/bench_streaming.py
+"""
+Soak test for broadcast-delay streaming (src/streaming.py): a synthetic song
+is looped for --soak seconds and fed block by block at --speed times real
+time, and the run fails if the censor did not keep up.
+
+    python -m benchmarks.bench_streaming --soak 600
+    python -m benchmarks.bench_streaming --soak 3600 --model_size tiny   # real Whisper on this box
+    python -m benchmarks.bench_streaming --soak 600 --speed 4 --rtf 0.2  # stand-in costing 0.2 s per audio second
+
+Keeping up means:
+- every block is processed within its own duration;
+- no edit arrives after its audio was emitted;
+- every cuss word in the input is muted in the output.
+With the stand-in transcriber, --rtf sets the simulated model cost. Without
+--model_size, Whisper is not needed.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.standins import StandInStreamTranscriber  # noqa: E402
+from benchmarks.synthetic import generate_song  # noqa: E402
+from src.censor_manager import CUSS_MAPPING  # noqa: E402
+from src.streaming import StreamCensor, whisper_transcriber  # noqa: E402
+
+
+def soak(song, transcribe, soak_s, speed=1.0, block_ms=100.0, delay_s=7.0, window_s=6.0, step_s=2.0):
+    mix, sr = sf.read(song["paths"]["mix"], dtype="float32", always_2d=True)
+    censor = StreamCensor(transcribe, sr, mix.shape[1], delay_s=delay_s, window_s=window_s, step_s=step_s)
+    block = int(sr * block_ms / 1000)
+    total = int(soak_s * sr)
+    delay = censor.delay.delay_frames
+
+    # Ground-truth cuss spans (loop-adjusted), with the output energy inside each one.
+    spans = []
+    for loop in range(int(np.ceil(soak_s / song["duration"]))):
+        for w in song["words"]:
+            start = int((loop * song["duration"] + w["start"]) * sr)
+            if w["word"] in CUSS_MAPPING and start < total:
+                spans.append([start, min(total, int((loop * song["duration"] + w["end"]) * sr)), 0.0, 0.0])
+
+    def score(out, first_frame, original):
+        for span in spans:
+            lo, hi = max(span[0], first_frame), min(span[1], first_frame + len(out))
+            if hi > lo:
+                span[2] += float(np.sum(out[lo - first_frame:hi - first_frame] ** 2))
+                span[3] += float(np.sum(original[lo % len(mix):lo % len(mix) + (hi - lo)] ** 2))
+
+    worst_block, process_time = 0.0, 0.0
+    started = time.perf_counter()
+    position = 0
+    while position < total:
+        frames = min(block, total - position)
+        indices = (position + np.arange(frames)) % len(mix)
+        began = time.perf_counter()
+        out = censor.process(mix[indices])
+        spent = time.perf_counter() - began
+        worst_block, process_time = max(worst_block, spent), process_time + spent
+        score(out, position - delay, mix)
+        position += frames
+        # Pace the feed like a live source would.
+        ahead = position / sr / speed - (time.perf_counter() - started)
+        if ahead > 0:
+            time.sleep(ahead)
+    score(censor.close(), max(0, position - delay), mix)
+
+    missed = sum(1 for s in spans if s[3] > 0 and s[2] > 0.01 * s[3])
+    stats = dict(censor.stats)
+    stats.update({
+        "audio_s": round(total / sr, 1),
+        "wall_s": round(time.perf_counter() - started, 1),
+        "block_ms": block_ms,
+        "worst_block_ms": round(worst_block * 1000, 3),
+        "mean_block_ms": round(process_time * 1000 / max(1, stats["blocks"]), 3),
+        "transcribe_rtf": round(stats["transcribe_s"] / stats["transcribed_s"], 3) if stats["transcribed_s"] else 0.0,
+        "cuss_words": len(spans),
+        "missed": missed,
+    })
+    return stats
+
+
+def check(stats, speed=1.0):
+    failures = []
+    if stats["worst_block_ms"] > stats["block_ms"] / speed:
+        failures.append(f"a block took {stats['worst_block_ms']:.1f} ms, longer than its {stats['block_ms'] / speed:.1f} ms")
+    if stats["late_edits"]:
+        failures.append(f"{stats['late_edits']} edits arrived after their audio was emitted")
+    if stats["missed"]:
+        failures.append(f"{stats['missed']} of {stats['cuss_words']} cuss words were not muted")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Broadcast-delay streaming soak test.")
+    parser.add_argument("--soak", type=float, default=600.0, help="Seconds of audio to stream.")
+    parser.add_argument("--speed", type=float, default=1.0, help="Feed rate as a multiple of real time.")
+    parser.add_argument("--song_duration", type=float, default=60.0, help="Length of the looped synthetic song.")
+    parser.add_argument("--cuss_per_minute", type=float, default=12.0, help="Cuss word density of the song.")
+    parser.add_argument("--delay", type=float, default=7.0, help="Broadcast delay in seconds.")
+    parser.add_argument("--window", type=float, default=6.0, help="Seconds per transcription window.")
+    parser.add_argument("--step", type=float, default=2.0, help="Seconds between windows.")
+    parser.add_argument("--rtf", type=float, default=0.2, help="Simulated stand-in cost, seconds per audio second.")
+    parser.add_argument("--model_size", default=None, help="Use this real Whisper model instead of the stand-in.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="cleanmusic-stream-") as work_dir:
+        song = generate_song(work_dir, args.song_duration, args.cuss_per_minute, seed=0)
+        if args.model_size:
+            from src.lyrics import load_whisper_model
+            transcribe = whisper_transcriber(load_whisper_model(args.model_size))
+        else:
+            transcribe = StandInStreamTranscriber(song["words"], song["duration"], rtf=args.rtf / args.speed)
+        stats = soak(song, transcribe, args.soak, args.speed, delay_s=args.delay, window_s=args.window, step_s=args.step)
+
+    for key, value in stats.items():
+        print(f"{key}: {value}")
+    failures = check(stats, args.speed)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
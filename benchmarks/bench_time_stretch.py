@@ -0,0 +1,65 @@
+# benchmarks/bench_time_stretch.py
+"""
+Speed and artifact level of the replacement-clip time stretch backends
+(src/time_stretch.py) on the tests/test_wsola.py cases (a 1 s 440 Hz
+sine stretched to 2 s and squeezed to 0.5 s) and on sub-second harmonic
+"words". The phase vocoder needs torch and torchaudio and is skipped
+without them.
+
+    python -m benchmarks.bench_time_stretch --repeats 20
+
+The artifact level is the energy more than 15 Hz away from the source's
+partials, relative to the total (dB, lower is better): smeared phases and
+badly joined frames both show up there.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic import XTTS_SAMPLE_RATE, artifact_db, harmonic_word  # noqa: E402
+from src.time_stretch import BACKENDS, stretch  # noqa: E402
+
+SAMPLE_RATE = XTTS_SAMPLE_RATE
+
+
+def cases():
+    sine = np.sin(2 * np.pi * 440 * np.linspace(0, 1.0, SAMPLE_RATE)).astype(np.float32)
+    yield "sine 1.0s -> 2.0s", sine, 2.0, [440.0]
+    yield "sine 1.0s -> 0.5s", sine, 0.5, [440.0]
+    word = harmonic_word(0.45, 180.0)
+    partials = [180.0 * k for k in range(1, 6)]
+    yield "word 0.45s -> 0.3s", word, 0.3, partials
+    yield "word 0.45s -> 0.7s", word, 0.7, partials
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WSOLA vs. phase vocoder time stretch.")
+    parser.add_argument("--repeats", type=int, default=20, help="Calls per case; the median time is reported.")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS, help="Backends to compare.")
+    args = parser.parse_args()
+
+    for name, samples, seconds, freqs in cases():
+        target = int(seconds * SAMPLE_RATE)
+        for backend in args.backends:
+            try:
+                out = stretch(samples, SAMPLE_RATE, target, backend=backend)
+            except ImportError as e:
+                print(f"{name:22s} {backend:14s} skipped ({e})")
+                continue
+            times = []
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                stretch(samples, SAMPLE_RATE, target, backend=backend)
+                times.append(time.perf_counter() - start)
+            print(
+                f"{name:22s} {backend:14s} {1000 * float(np.median(times)):7.2f} ms  "
+                f"artifacts {artifact_db(out, freqs):6.1f} dB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+# benchmarks/run_benchmarks.py
+"""
+End-to-end pipeline benchmark on synthetic songs with offline model stand-ins.
+
+    python -m benchmarks.run_benchmarks --quick
+    python -m benchmarks.run_benchmarks --output bench.json --baseline previous.json
+
+Reports wall/CPU time, audio-seconds-per-second and peak Python allocations per
+stage, and exits non-zero when a stage falls below benchmarks/thresholds.json or
+regresses against a baseline run by more than --tolerance.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.standins import StandInSynthesizer, StandInWhisper, standin_separate  # noqa: E402
+from benchmarks.synthetic import generate_song  # noqa: E402
+from src import metrics  # noqa: E402
+from src.censor_manager import detect_cuss_words  # noqa: E402
+from src.lyrics import transcribe_audio  # noqa: E402
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+
+FULL_DURATIONS = [30.0, 120.0, 300.0]
+FULL_DENSITIES = [2.0, 12.0, 40.0]
+QUICK_DURATIONS = [20.0, 60.0]
+QUICK_DENSITIES = [6.0, 30.0]
+
+
+@contextmanager
+def measure(run: metrics.PipelineMetrics, name: str, audio_seconds: float):
+    """metrics.stage() plus the peak of Python-tracked allocations inside the stage."""
+    tracemalloc.start()
+    try:
+        with run.stage(name, audio_seconds=audio_seconds) as extra:
+            yield extra
+            _, peak = tracemalloc.get_traced_memory()
+            extra["peak_alloc_mb"] = round(peak / (1024 * 1024), 3)
+    finally:
+        tracemalloc.stop()
+
+
+def run_scenario(work_dir: str, duration: float, density: float, seed: int = 0, stem_format: str = "stem") -> Dict:
+    from src.mixer import create_clean_version
+
+    song = generate_song(os.path.join(work_dir, "song"), duration, density, seed=seed)
+    paths = song["paths"]
+    run = metrics.PipelineMetrics(run_id=f"bench-{int(duration)}s-{density:g}cpm")
+    previous = metrics.activate(run)
+    try:
+        with measure(run, "transcription", duration):
+            lyrics_data = transcribe_audio(StandInWhisper(), paths["mix"])
+
+        with measure(run, "detection", duration) as extra:
+            cuss_segments = detect_cuss_words(lyrics_data)
+            extra["segments"] = len(cuss_segments)
+
+        with measure(run, "separation", duration):
+            vocals_path, instrumental_path = standin_separate(
+                paths["mix"], output_dir=os.path.join(work_dir, "separated"), stem_format=stem_format
+            )
+
+        synth = StandInSynthesizer()
+        synth_dir = os.path.join(work_dir, "synth")
+        with measure(run, "synthesis", duration):
+            for i, seg in enumerate(cuss_segments):
+                seg["synth_path"] = synth.generate_speech(
+                    text=seg["replacement"],
+                    speaker_wav=vocals_path,
+                    output_path=os.path.join(synth_dir, f"{seg['replacement']}_{i}.wav"),
+                    duration=seg["end"] - seg["start"],
+                )
+
+        with measure(run, "mixing", duration):
+            create_clean_version(
+                original_audio_path=paths["mix"],
+                instrumental_path=instrumental_path,
+                cuss_segments=cuss_segments,
+                vocals_path=vocals_path,
+                synth_dir=synth_dir,
+                output_path=os.path.join(work_dir, "clean.wav"),
+            )
+    finally:
+        metrics.activate(previous)
+
+    stages = {}
+    for record in run.records:
+        if record["event"] == "stage" and "." not in record["stage"]:
+            stages[record["stage"]] = {
+                key: record.get(key)
+                for key in ("wall_s", "cpu_s", "audio_s_per_s", "peak_alloc_mb", "peak_rss_mb")
+            }
+    return {
+        "duration": duration,
+        "cuss_per_minute": density,
+        "cuss_count": song["cuss_count"],
+        "stages": stages,
+    }
+
+
+def check_results(results: List[Dict], thresholds: Dict, baseline: Dict = None, tolerance: float = 0.25) -> List[str]:
+    """Returns a list of human-readable threshold/regression failures."""
+    failures = []
+    min_speed = thresholds.get("min_audio_s_per_s", {})
+    max_alloc = thresholds.get("max_peak_alloc_mb_per_audio_minute", {})
+    baseline_index = {
+        (r["duration"], r["cuss_per_minute"]): r for r in (baseline or {}).get("results", [])
+    }
+
+    for result in results:
+        label = f"{result['duration']:g}s @ {result['cuss_per_minute']:g}/min"
+        for stage, values in result["stages"].items():
+            speed = values.get("audio_s_per_s") or 0.0
+            if stage in min_speed and speed < min_speed[stage]:
+                failures.append(f"{label}: {stage} at {speed:.1f}x realtime, below {min_speed[stage]}x")
+
+            alloc_per_min = (values.get("peak_alloc_mb") or 0.0) / (result["duration"] / 60.0)
+            if stage in max_alloc and alloc_per_min > max_alloc[stage]:
+                failures.append(
+                    f"{label}: {stage} allocated {alloc_per_min:.1f} MB per audio minute, above {max_alloc[stage]}"
+                )
+
+            previous = baseline_index.get((result["duration"], result["cuss_per_minute"]))
+            old_speed = previous and previous["stages"].get(stage, {}).get("audio_s_per_s")
+            if old_speed and speed < old_speed * (1.0 - tolerance):
+                failures.append(f"{label}: {stage} regressed from {old_speed:.1f}x to {speed:.1f}x realtime")
+    return failures
+
+
+def print_table(results: List[Dict]):
+    print(f"{'song':>16} {'stage':>14} {'wall s':>9} {'cpu s':>9} {'x rt':>9} {'alloc MB':>9}")
+    for result in results:
+        label = f"{result['duration']:g}s/{result['cuss_per_minute']:g}cpm"
+        for stage, values in result["stages"].items():
+            print(
+                f"{label:>16} {stage:>14} {values['wall_s']:>9.3f} {values['cpu_s']:>9.3f} "
+                f"{values['audio_s_per_s'] or 0:>9.1f} {values['peak_alloc_mb'] or 0:>9.1f}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CleanMusic pipeline benchmark with synthetic songs.")
+    parser.add_argument("--quick", action="store_true", help="Run the short scenario set.")
+    parser.add_argument("--durations", type=float, nargs="+", help="Song lengths in seconds.")
+    parser.add_argument("--densities", type=float, nargs="+", help="Cuss words per minute.")
+    parser.add_argument("--stem_format", default="stem", choices=["stem", "stem16", "wav"], help="Stem storage to benchmark.")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path.")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH, help="Threshold file (JSON).")
+    parser.add_argument("--baseline", default=None, help="Previous --output file to compare against.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs. baseline (fraction).")
+    args = parser.parse_args()
+
+    durations = args.durations or (QUICK_DURATIONS if args.quick else FULL_DURATIONS)
+    densities = args.densities or (QUICK_DENSITIES if args.quick else FULL_DENSITIES)
+
+    results = []
+    for duration, density in itertools.product(durations, densities):
+        with tempfile.TemporaryDirectory(prefix="cleanmusic-bench-") as work_dir:
+            results.append(run_scenario(work_dir, duration, density, stem_format=args.stem_format))
+
+    print_table(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results}, f, indent=2)
+
+    with open(args.thresholds, encoding="utf-8") as f:
+        thresholds = json.load(f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    failures = check_results(results, thresholds, baseline, args.tolerance)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("All benchmark thresholds met.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmarks/standins.py
+"""
+Deterministic, offline stand-ins for Whisper, Demucs and XTTS. They expose the
+same call shapes the pipeline uses, read the ground truth written by
+benchmarks.synthetic, and do the same file I/O as the real stages so the
+benchmark still measures our own code around the models.
+"""
+import json
+import os
+import time
+
+import numpy as np
+import soundfile as sf
+
+from src.stem_store import write_stem
+
+
+def _words_path(audio_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(audio_path)), "words.json")
+
+
+class StandInWhisper:
+    """Mimics whisper's model.transcribe() result for a synthetic song."""
+
+    def transcribe(self, audio, word_timestamps=True, **kwargs):
+        # Decode the file like Whisper would, so I/O stays in the measurement.
+        sf.read(audio, dtype="float32")
+        with open(_words_path(audio), encoding="utf-8") as f:
+            words = json.load(f)
+
+        segments = []
+        for i in range(0, len(words), 8):
+            chunk = words[i:i + 8]
+            segments.append({
+                "start": chunk[0]["start"],
+                "end": chunk[-1]["end"],
+                "text": " ".join(w["word"] for w in chunk),
+                "words": [{
+                    "word": f" {w['word']},",
+                    "start": w["start"],
+                    "end": w["end"],
+                    "probability": w["confidence"],
+                } for w in chunk],
+            })
+        return {"text": " ".join(s["text"] for s in segments), "segments": segments}
+
+
+def standin_separate(audio_path: str, output_dir: str = "data/separated", stem_format: str = "stem"):
+    """
+    Mimics separate_vocals(): reads the mix and writes vocals/no_vocals stems
+    (.stem files, or .wav with stem_format="wav"). The stems come from the
+    synthetic ground truth instead of a model.
+    """
+    data, sr = sf.read(audio_path, dtype="float32")
+    source_dir = os.path.dirname(os.path.abspath(audio_path))
+    vocals, _ = sf.read(os.path.join(source_dir, "vocals.wav"), dtype="float32")
+    instrumental = data - vocals
+
+    filename = os.path.splitext(os.path.basename(audio_path))[0]
+    save_dir = os.path.join(output_dir, filename)
+    os.makedirs(save_dir, exist_ok=True)
+    if stem_format == "wav":
+        vocals_path = os.path.join(save_dir, "vocals.wav")
+        no_vocals_path = os.path.join(save_dir, "no_vocals.wav")
+        sf.write(vocals_path, vocals, sr)
+        sf.write(no_vocals_path, instrumental, sr)
+    else:
+        dtype = "int16" if stem_format == "stem16" else "float32"
+        vocals_path = write_stem(os.path.join(save_dir, "vocals.stem"), vocals, sr, dtype=dtype)
+        no_vocals_path = write_stem(os.path.join(save_dir, "no_vocals.stem"), instrumental, sr, dtype=dtype)
+    return vocals_path, no_vocals_path
+
+
+class StandInSynthesizer:
+    """Mimics VoiceSynthesizer.generate_speech() with a pitched tone at XTTS's rate."""
+
+    sample_rate = 24000
+
+    def generate_speech(self, text, speaker_wav, output_path, language="en", duration=None):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        duration = duration or 0.1 * max(1, len(text))
+        t = np.arange(int(duration * self.sample_rate)) / self.sample_rate
+        pitch = 120.0 + 10.0 * (sum(map(ord, text)) % 12)
+        clip = 0.2 * np.sin(2 * np.pi * pitch * t) * np.hanning(len(t))
+        sf.write(output_path, clip.astype(np.float32), self.sample_rate)
+        return output_path
+
+
+class StandInStreamTranscriber:
+    """
+    Mimics StreamCensor's transcribe(audio, offset_s) callable for a synthetic
+    song looped end to end. Returns the ground-truth words that lie fully
+    inside the window and sleeps rtf seconds per audio second to stand in for
+    the model's compute.
+    """
+
+    def __init__(self, words, song_duration: float, rtf: float = 0.0):
+        self.words = words
+        self.song_duration = song_duration
+        self.rtf = rtf
+
+    def __call__(self, audio, offset_s: float):
+        length = len(audio) / 16000.0
+        if self.rtf:
+            time.sleep(self.rtf * length)
+        found = []
+        loop = int(offset_s // self.song_duration)
+        for repeat in (loop, loop + 1):
+            base = repeat * self.song_duration - offset_s
+            for w in self.words:
+                start, end = base + w["start"], base + w["end"]
+                if start >= 0 and end <= length:
+                    found.append({"word": w["word"], "start": start, "end": end, "confidence": w["confidence"]})
+        return found
@@ -0,0 +1,136 @@
+# benchmarks/synthetic.py
+"""
+Deterministic synthetic songs for benchmarking. Each song is a simple beat plus
+word-shaped vocal bursts, written as a mix and as separate stems together with
+the ground-truth word timeline, so stand-in models can "recognize" and
+"separate" it exactly.
+
+Also the harmonic "words" and the artifact measure shared by the time stretch
+benchmark and tests/test_wsola.py.
+"""
+import json
+import os
+from typing import Dict, List
+
+import numpy as np
+import soundfile as sf
+
+from src.censor_manager import CUSS_MAPPING
+
+CLEAN_WORDS = [
+    "yeah", "we", "go", "up", "all", "night", "money", "on", "my", "mind",
+    "city", "lights", "keep", "it", "real", "back", "to", "the", "block",
+]
+
+WORD_GAP = 0.12
+INTRO_SECONDS = 8.0
+OUTRO_SECONDS = 6.0
+
+XTTS_SAMPLE_RATE = 22050
+ARTIFACT_MARGIN_HZ = 15.0
+
+
+def _instrumental(num_samples: int, sr: int, rng: np.random.Generator) -> np.ndarray:
+    t = np.arange(num_samples) / sr
+    roots = np.array([55.0, 65.41, 49.0, 73.42])
+    chord = roots[(t // 2.0).astype(int) % len(roots)]
+    bass = 0.25 * np.sin(2 * np.pi * chord * t)
+
+    beat_phase = t % 0.5
+    kick = 0.5 * np.sin(2 * np.pi * 60 * beat_phase) * np.exp(-beat_phase * 30)
+
+    hat_phase = t % 0.25
+    hats = 0.05 * rng.standard_normal(num_samples) * np.exp(-hat_phase * 80)
+
+    mono = bass + kick + hats
+    return np.stack([mono, mono * 0.95], axis=1).astype(np.float32)
+
+
+def _vocal_burst(duration: float, sr: int, pitch: float) -> np.ndarray:
+    n = max(1, int(duration * sr))
+    t = np.arange(n) / sr
+    envelope = np.sin(np.pi * np.arange(n) / n) ** 0.5
+    harmonics = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in range(1, 6))
+    return (0.3 * envelope * harmonics).astype(np.float32)
+
+
+def harmonic_word(seconds: float, f0: float, sr: int = XTTS_SAMPLE_RATE, partials: int = 5) -> np.ndarray:
+    """A steady voiced sound with a syllable-like attack and release."""
+    t = np.arange(int(seconds * sr)) / sr
+    tone = sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, partials + 1))
+    envelope = np.minimum(1.0, np.minimum(t, t[-1] - t) / 0.03)
+    return (0.5 * tone * envelope).astype(np.float32)
+
+
+def artifact_db(samples: np.ndarray, freqs, sr: int = XTTS_SAMPLE_RATE) -> float:
+    """Energy more than ARTIFACT_MARGIN_HZ away from freqs, relative to the total (dB)."""
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples)))) ** 2
+    bins = np.fft.rfftfreq(len(samples), 1.0 / sr)
+    clean = np.zeros(len(bins), dtype=bool)
+    for freq in freqs:
+        clean |= np.abs(bins - freq) <= ARTIFACT_MARGIN_HZ
+    return 10 * np.log10(max(spectrum[~clean].sum(), 1e-20) / spectrum.sum())
+
+
+def generate_song(
+    output_dir: str,
+    duration: float = 60.0,
+    cuss_per_minute: float = 6.0,
+    sr: int = 44100,
+    seed: int = 0
+) -> Dict:
+    """
+    Writes mix.wav, vocals.wav, no_vocals.wav and words.json into output_dir.
+    Returns a dict with the paths, the ground-truth words and the number of cuss
+    words placed in the song.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    num_samples = int(duration * sr)
+
+    instrumental = _instrumental(num_samples, sr, rng)
+    vocals = np.zeros_like(instrumental)
+
+    cuss_words = sorted(CUSS_MAPPING)
+    vocal_end = max(INTRO_SECONDS, duration - OUTRO_SECONDS)
+    words: List[Dict] = []
+    pos = min(INTRO_SECONDS, duration)
+    while pos < vocal_end:
+        word_duration = float(rng.uniform(0.18, 0.4))
+        end = min(pos + word_duration, vocal_end)
+        # Expected words per minute is ~60 / 0.41, so scale to hit the density.
+        is_cuss = rng.random() < cuss_per_minute * 0.41 / 60.0
+        word = cuss_words[rng.integers(len(cuss_words))] if is_cuss else CLEAN_WORDS[rng.integers(len(CLEAN_WORDS))]
+
+        start_idx, end_idx = int(pos * sr), int(end * sr)
+        burst = _vocal_burst(end - pos, sr, float(rng.uniform(140, 260)))[:end_idx - start_idx]
+        vocals[start_idx:start_idx + len(burst)] += burst[:, None]
+
+        words.append({
+            "word": word,
+            "start": round(pos, 3),
+            "end": round(end, 3),
+            "confidence": round(float(rng.uniform(0.6, 1.0)), 3),
+        })
+        pos = end + WORD_GAP
+
+    mix = instrumental + vocals
+    paths = {
+        "mix": os.path.join(output_dir, "mix.wav"),
+        "vocals": os.path.join(output_dir, "vocals.wav"),
+        "instrumental": os.path.join(output_dir, "no_vocals.wav"),
+        "words": os.path.join(output_dir, "words.json"),
+    }
+    sf.write(paths["mix"], mix, sr)
+    sf.write(paths["vocals"], vocals, sr)
+    sf.write(paths["instrumental"], instrumental, sr)
+    with open(paths["words"], "w", encoding="utf-8") as f:
+        json.dump(words, f)
+
+    return {
+        "paths": paths,
+        "words": words,
+        "duration": duration,
+        "sample_rate": sr,
+        "cuss_count": sum(1 for w in words if w["word"] in CUSS_MAPPING),
+    }
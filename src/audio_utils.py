@@ -1,24 +1,88 @@
-from pydub import AudioSegment
+import logging
 import os
 
+import numpy as np
+import soundfile as sf
+from pydub import AudioSegment
+
+from src.encoder import encode_audio, segment_to_array
+from src.resample import resample
+from src.stem_store import is_stem_path, open_stem
+
+logger = logging.getLogger(__name__)
+
+
+def _array_to_segment(data, sample_rate):
+    """16-bit pydub AudioSegment from a float32 (frames, channels) buffer."""
+    pcm = np.clip(np.round(data * 32768.0), -32768, 32767).astype("<i2")
+    return AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=sample_rate, channels=data.shape[1])
+
+
 def load_audio(file_path, target_sample_rate=44100):
-    """Loads an audio file into a pydub AudioSegment and normalizes sample rate."""
+    """
+    Loads an audio file into a pydub AudioSegment and normalizes sample rate
+    (with src/resample.py; None keeps the file's rate).
+    """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
-    print(f"Loading audio: {file_path}")
-    audio = AudioSegment.from_file(file_path)
+    logger.info("Loading audio: %s", file_path)
+    if is_stem_path(file_path):
+        stem = open_stem(file_path)
+        audio = _array_to_segment(stem.read(), stem.sample_rate)
+    else:
+        audio = AudioSegment.from_file(file_path)
     
     # Normalize sample rate to avoid white noise from mismatched rates
-    if audio.frame_rate != target_sample_rate:
-        print(f"  Resampling from {audio.frame_rate} Hz to {target_sample_rate} Hz")
-        audio = audio.set_frame_rate(target_sample_rate)
+    if target_sample_rate and audio.frame_rate != target_sample_rate:
+        logger.info("Resampling from %d Hz to %d Hz", audio.frame_rate, target_sample_rate)
+        audio = _array_to_segment(resample(segment_to_array(audio), audio.frame_rate, target_sample_rate), target_sample_rate)
     
     return audio
 
-def save_audio(audio_segment, output_path, format="mp3"):
-    """Exports an audio segment to a file."""
-    print(f"Saving audio to: {output_path}")
-    audio_segment.export(output_path, format=format)
+def save_audio(audio_segment, output_path, format=None, bitrate=None, passthrough_from=None, changed_ranges=None):
+    """
+    Exports an audio segment to a file. The format is inferred from the output
+    extension unless given; see encoder.encode_audio for the passthrough options.
+    """
+    logger.info("Saving audio to: %s", output_path)
+    encode_audio(
+        segment_to_array(audio_segment),
+        audio_segment.frame_rate,
+        output_path,
+        format=format,
+        bitrate=bitrate,
+        passthrough_from=passthrough_from,
+        changed_ranges=changed_ranges
+    )
+
+def get_audio_duration(file_path):
+    """
+    Returns the duration of an audio file in seconds without decoding it, or
+    None when the container can't be probed cheaply.
+    """
+    try:
+        if is_stem_path(file_path):
+            return open_stem(file_path).duration
+        return sf.info(file_path).duration
+    except Exception:
+        return None
+
+def resample_array(data, src_rate, dst_rate):
+    """Resamples a (frames, channels) float buffer with a polyphase filter (see src/resample.py)."""
+    if src_rate == dst_rate or len(data) == 0:
+        return data
+    return resample(data, src_rate, dst_rate)
+
+def fit_frames(data, frames, channels):
+    """Trims/zero-pads a (frames, channels) buffer to an exact length and channel count."""
+    data = np.asarray(data, dtype=np.float32)
+    if data.ndim == 1:
+        data = data[:, None]
+    if data.shape[1] != channels:
+        data = np.repeat(data.mean(axis=1, keepdims=True), channels, axis=1)
+    if len(data) >= frames:
+        return data[:frames]
+    return np.concatenate([data, np.zeros((frames - len(data), channels), dtype=np.float32)])
 
 def slice_audio(audio_segment, start_ms, end_ms):
     """Slices audio from start_ms to end_ms."""
@@ -0,0 +1,230 @@
+# src/batch.py
+"""
+Batch mode: runs a manifest of songs stage by stage, so each model is loaded
+once and both Whisper and Demucs can pack windows/chunks from several songs
+into one forward pass.
+
+    python src/batch.py --manifest songs.txt --output_dir data/clean
+
+A manifest has one song per line, "input" or "input,output"; blank lines and
+lines starting with # are skipped. Without an output the clean song is written
+to --output_dir under the input's file name. Two entries may not write the
+same output.
+"""
+import argparse
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import main as pipeline
+from src import metrics
+from src.audio_utils import get_audio_duration
+from src.cache import song_dir_name
+from src.edl import build_edl, default_edl_path, save_edl
+from src.lyrics import transcribe_batch
+from src.separator import load_demucs_model, separate_vocals_batch
+
+
+def read_manifest(path: str, output_dir: str = "data/clean") -> List[Tuple[str, str]]:
+    """
+    Returns [(input_path, output_path), ...] from a manifest file. Raises
+    ValueError when two entries would write the same output (e.g. same-named
+    inputs from different folders, both defaulting to output_dir).
+    """
+    entries, written = [], {}
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            input_path, _, output_path = (part.strip() for part in line.partition(","))
+            output_path = output_path or os.path.join(output_dir, os.path.basename(input_path))
+            previous = written.setdefault(os.path.abspath(output_path), number)
+            if previous != number:
+                raise ValueError(f"{path}:{number}: output {output_path} is already written by line {previous}")
+            entries.append((input_path, output_path))
+    return entries
+
+
+def _transcribe_all(entries, durations, whisper_model, model_size, batch_size, vad):
+    """
+    Word lists (or the exception raised) per entry. Songs are decoded together
+    with transcribe_batch; if that fails, each song is retried on its own so
+    one unreadable file only fails itself.
+    """
+    paths = [input_path for input_path, _ in entries]
+    voiced = [pipeline.run_vad(path) for path in paths] if vad else None
+    seconds = sum(d or 0 for d in durations)
+    try:
+        with metrics.current().stage("transcription.inference", audio_seconds=seconds or None, songs=len(paths)):
+            return transcribe_batch(whisper_model, paths, batch_size=batch_size, voiced_intervals=voiced)
+    except Exception as e:
+        print(f"Warning: batched transcription failed, transcribing songs one at a time: {e}")
+
+    transcripts = []
+    for path, audio_seconds in zip(paths, durations):
+        try:
+            transcripts.append(pipeline.run_transcription(
+                path, model_size, whisper_model=whisper_model, audio_seconds=audio_seconds, vad=vad
+            ))
+        except Exception as e:
+            transcripts.append(e)
+    return transcripts
+
+
+def process_batch(
+    entries: List[Tuple[str, str]],
+    model_size: str = "base",
+    use_synth: bool = True,
+    bitrate: Optional[str] = None,
+    passthrough: bool = False,
+    patch: bool = False,
+    stem_format: str = "stem",
+    vad: bool = False,
+    whisper_batch_size: int = 8,
+    separation_batch_size: int = 8,
+    songs_per_separation: int = 4,
+    separated_dir: str = "data/separated",
+    synth_root: str = "data/synth"
+) -> List[Dict]:
+    """
+    Runs every song through the pipeline. Returns one result per entry:
+    {"input", "output", "cuss_words", "error"}. A failing song is reported
+    and skipped instead of stopping the batch.
+    """
+    stats = metrics.current()
+    results = [{"input": i, "output": None, "cuss_words": 0, "error": None} for i, _ in entries]
+
+    # 1-2. Transcribe (windows from all songs decoded in shared batches) and detect.
+    print(f"--- Transcribing {len(entries)} songs ---")
+    with stats.stage("transcription.model_load", model=model_size):
+        whisper_model = pipeline.load_whisper_model(model_size)
+    durations = [get_audio_duration(input_path) for input_path, _ in entries]
+    transcripts = _transcribe_all(entries, durations, whisper_model, model_size, whisper_batch_size, vad)
+
+    pending = []
+    for index, (input_path, output_path) in enumerate(entries):
+        if isinstance(transcripts[index], Exception):
+            print(f"Error: {input_path}: {transcripts[index]}")
+            results[index]["error"] = str(transcripts[index])
+            continue
+        cuss_segments = pipeline.run_detection(transcripts[index])
+        results[index]["cuss_words"] = len(cuss_segments)
+        if cuss_segments:
+            pending.append((index, input_path, output_path, cuss_segments, durations[index]))
+        elif passthrough:
+            results[index]["output"] = pipeline.write_unedited(input_path, output_path, bitrate)
+    print(f"{len(pending)} of {len(entries)} songs need editing.")
+
+    # 3. Separate in groups; chunks from every song in a group share model batches.
+    stems = {}
+    demucs_model = load_demucs_model() if pending else None
+    for first in range(0, len(pending), songs_per_separation):
+        group = pending[first:first + songs_per_separation]
+        seconds = sum(song[4] or 0 for song in group)
+        print(f"--- Separating {len(group)} songs ---")
+        try:
+            with stats.stage("separation", audio_seconds=seconds or None, songs=len(group)):
+                paths = separate_vocals_batch(
+                    [song[1] for song in group],
+                    output_dir=separated_dir,
+                    model=demucs_model,
+                    stem_format=stem_format,
+                    batch_size=separation_batch_size
+                )
+        except Exception as e:
+            print(f"Error: separation failed for {len(group)} songs: {e}")
+            for song in group:
+                results[song[0]]["error"] = str(e)
+            continue
+        stems.update((song[0], song_paths) for song, song_paths in zip(group, paths))
+
+    # 4-5. Synthesize with one warm XTTS model, then mix each song.
+    synthesizer = None
+    for index, input_path, output_path, cuss_segments, audio_seconds in pending:
+        if index not in stems:
+            continue
+        vocals_path, instrumental_path = stems[index]
+        # Each song gets its own directory, keyed by content as songs may share a file name.
+        synth_dir = os.path.join(synth_root, song_dir_name(input_path))
+        if use_synth:
+            try:
+                synthesizer = pipeline.run_synthesis(cuss_segments, vocals_path, synth_dir=synth_dir, synthesizer=synthesizer)
+            except Exception as e:
+                print(f"Warning: Voice synthesis failed for {input_path}: {e}")
+        try:
+            save_edl(
+                build_edl(input_path, cuss_segments, vocals_path, instrumental_path, synth_dir=synth_dir),
+                default_edl_path(output_path)
+            )
+            results[index]["output"] = pipeline.run_mixing(
+                input_path, output_path, cuss_segments, vocals_path, instrumental_path,
+                audio_seconds=audio_seconds, bitrate=bitrate, passthrough=passthrough,
+                patch=patch, synth_dir=synth_dir
+            )
+        except Exception as e:
+            print(f"Error: mixing failed for {input_path}: {e}")
+            results[index]["error"] = str(e)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CleanMusic: process a manifest of songs in batches.")
+    parser.add_argument("--manifest", required=True, help="Text file with one 'input[,output]' per line.")
+    parser.add_argument("--output_dir", default="data/clean", help="Output directory for entries without an output path.")
+    parser.add_argument("--whisper_batch_size", type=int, default=8, help="30 s Whisper windows per decoding pass.")
+    parser.add_argument("--separation_batch_size", type=int, default=8, help="Demucs chunks per forward pass.")
+    parser.add_argument("--songs_per_separation", type=int, default=4, help="Songs held in memory and chunked together.")
+    parser.add_argument("--bitrate", default=None, help="Bitrate for lossy output, e.g. 192k (default depends on format).")
+    parser.add_argument("--passthrough", action="store_true", help="Copy unedited audio from the input and write clean songs unchanged.")
+    parser.add_argument("--patch", action="store_true", help="Patch a copy of each input, regenerating only the edited regions.")
+    parser.add_argument("--stem_format", default="stem", choices=["stem", "stem16", "wav"], help="How separated stems are stored.")
+    parser.add_argument("--vad", action="store_true", help="Only transcribe sections with vocals.")
+    parser.add_argument("--model_size", default="base", help="Whisper model size (tiny, base, small, medium, large).")
+    parser.add_argument("--no_use_synth", dest="use_synth", action="store_false", help="Disable voice synthesis.")
+    parser.add_argument("--metrics_file", default=None, help="Append per-stage metrics as JSON lines to this file.")
+    parser.add_argument("--log_level", default="WARNING", help="Logging level (DEBUG, INFO, WARNING, ERROR).")
+    parser.set_defaults(use_synth=True)
+    args = parser.parse_args()
+    metrics.configure_logging(args.log_level)
+
+    try:
+        entries = read_manifest(args.manifest, args.output_dir)
+    except ValueError as e:
+        parser.error(str(e))
+    missing = [input_path for input_path, _ in entries if not os.path.exists(input_path)]
+    for input_path in missing:
+        print(f"Error: Input file not found: {input_path}")
+    entries = [entry for entry in entries if entry[0] not in missing]
+
+    run_metrics = metrics.PipelineMetrics(sink_path=args.metrics_file)
+    previous = metrics.activate(run_metrics)
+    try:
+        with run_metrics.stage("total", songs=len(entries)):
+            results = process_batch(
+                entries,
+                model_size=args.model_size,
+                use_synth=args.use_synth,
+                bitrate=args.bitrate,
+                passthrough=args.passthrough,
+                patch=args.patch,
+                stem_format=args.stem_format,
+                vad=args.vad,
+                whisper_batch_size=args.whisper_batch_size,
+                separation_batch_size=args.separation_batch_size,
+                songs_per_separation=args.songs_per_separation
+            )
+    finally:
+        run_metrics.emit_summary()
+        metrics.activate(previous)
+
+    failed = [r for r in results if r["error"]]
+    print(f"Done! {len(results) - len(failed)} of {len(results)} songs processed.")
+    for result in failed:
+        print(f"  FAILED {result['input']}: {result['error']}")
+    if failed or missing:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# src/cache.py
+"""
+Content-addressed cache on shared storage. Entries are keyed by a hash of the
+input audio, so the same song submitted under different paths (or processed
+by another worker) reuses its transcript, stems and synth clips.
+
+    <root>/transcripts/<key>-<model>.json
+    <root>/stems/<key>/<name>/vocals.stem, no_vocals.stem
+    <root>/synth/<key>/<replacement>_<ms>ms_<reference>.wav
+
+Synth clips are named by replacement word, clip length in milliseconds and
+a hash of the reference vocal stem's path (see run_synthesis in
+src/main.py), so transcripts from different Whisper models of one song
+share a directory: a clip is only reused for the same word and length.
+"""
+import glob
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from src import metrics
+
+HASH_BLOCK = 1 << 20
+
+
+def content_hash(path: str) -> str:
+    """SHA-256 of the file contents (hex, first 32 chars)."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()[:32]
+
+
+def song_dir_name(path: str) -> str:
+    """<file name>-<content hash prefix>: a per-song directory name that same-named inputs don't share."""
+    return f"{os.path.splitext(os.path.basename(path))[0]}-{content_hash(path)[:8]}"
+
+
+class SharedCache:
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, kind: str, name: str) -> str:
+        return os.path.join(self.root, kind, name)
+
+    def load_transcript(self, key: str, model_size: str) -> Optional[List[Dict]]:
+        path = self.path("transcripts", f"{key}-{model_size}.json")
+        hit = os.path.exists(path)
+        metrics.current().cache("shared_transcript", hit)
+        if not hit:
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def save_transcript(self, key: str, model_size: str, words: List[Dict]) -> str:
+        path = self.path("transcripts", f"{key}-{model_size}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written next to its final name and renamed, so readers never see a partial file.
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(words, f)
+        os.replace(tmp_path, path)
+        return path
+
+    def stems_dir(self, key: str) -> str:
+        return self.path("stems", key)
+
+    def find_stems(self, key: str) -> Optional[Tuple[str, str]]:
+        """(vocals_path, instrumental_path) from a previous separation of this song, if any."""
+        for vocals_path in sorted(glob.glob(os.path.join(self.stems_dir(key), "*", "vocals.*"))):
+            instrumental_path = os.path.join(os.path.dirname(vocals_path), "no_vocals" + os.path.splitext(vocals_path)[1])
+            if os.path.exists(instrumental_path):
+                metrics.current().cache("shared_stems", True)
+                return vocals_path, instrumental_path
+        metrics.current().cache("shared_stems", False)
+        return None
+
+    def synth_dir(self, key: str) -> str:
+        return self.path("synth", key)
@@ -1,6 +1,6 @@
 import re
 import unicodedata
-from typing import Optional
+from typing import Dict, Optional
 
 # src/censor_manager.py
 
@@ -73,58 +73,53 @@ def _normalize_word(word: str) -> str:
     return normalized.strip("'")
 
 
-def _resolve_cuss_key(raw_word: str) -> Optional[str]:
+def _resolve_cuss_key(raw_word: str, mapping: Optional[Dict[str, str]] = None) -> Optional[str]:
     """
     Returns the dictionary key that should be used for the provided word.
     Handles slang spellings such as "fuckin" or "niggas" and stretched
-    pronunciations like "shiiiit".
+    pronunciations like "shiiiit". mapping defaults to CUSS_MAPPING.
     """
+    if mapping is None:
+        mapping = CUSS_MAPPING
     normalized = _normalize_word(raw_word)
     if not normalized:
         return None
 
-    if normalized in CUSS_MAPPING:
+    if normalized in mapping:
         return normalized
 
     # Drop repeated characters (e.g., "shiiiit" -> "shit")
     squashed = _REPEATED_CHAR.sub(r"\1", normalized)
-    if squashed and squashed in CUSS_MAPPING:
+    if squashed and squashed in mapping:
         return squashed
 
     # Handle trailing apostrophe slang: "fuckin" -> "fucking"
     if normalized.endswith("in"):
         candidate = f"{normalized}g"
-        if candidate in CUSS_MAPPING:
+        if candidate in mapping:
             return candidate
     if normalized.endswith("n"):
         candidate = f"{normalized[:-1]}ng"
-        if candidate in CUSS_MAPPING:
+        if candidate in mapping:
             return candidate
 
     # Handle plural/slang "niggas" -> "nigga"
     if normalized.endswith("s"):
         candidate = normalized[:-1]
-        if candidate in CUSS_MAPPING:
+        if candidate in mapping:
             return candidate
 
     return None
 
 
-def detect_cuss_words(lyrics_data):
+def detect_cuss_words(lyrics_data, mapping: Optional[Dict[str, str]] = None):
     """
-    Scans lyrics for cuss words.
+    Scans lyrics (transcript dicts or a src/word_timeline.py WordTimeline) for
+    cuss words, using mapping instead of CUSS_MAPPING if given. Each distinct
+    word is resolved once and the transcript is matched as an array lookup.
     Returns a list of dicts: {'word': str, 'start': float, 'end': float, 'replacement': str}
     """
-    cuss_segments = []
-    for item in lyrics_data:
-        cuss_key = _resolve_cuss_key(item.get("word", ""))
-        if not cuss_key:
-            continue
-
-        cuss_segments.append({
-            "word": item.get("word", ""),
-            "start": item['start'],
-            "end": item['end'],
-            "replacement": CUSS_MAPPING[cuss_key]
-        })
-    return cuss_segments
+    from src.word_timeline import WordTimeline
+
+    timeline = lyrics_data if isinstance(lyrics_data, WordTimeline) else WordTimeline.from_words(lyrics_data)
+    return timeline.detect(mapping)
@@ -0,0 +1,118 @@
+# src/checkpoint.py
+"""
+Durable per-song, per-stage checkpoints so an interrupted run resumes from
+the last completed stage instead of starting over.
+
+    <root>/<content hash>-<model>[-vad][-lyrics<hash>]/
+        manifest.json        input, model_size, vad, stage -> {file, completed, refs}
+        transcription.json   word list
+        detection.json       cuss segments
+        separation.json      stem paths
+        synthesis.json       segments with synth_path
+        mixing.json          output path
+        synth/               synth clips for this song
+
+A stage's checkpoint only counts while every file it references still exists,
+and rewriting a stage drops the checkpoints of the stages that depend on it
+(STAGE_DEPENDS). The stems depend only on the input, so a dictionary edit
+that changes the detected segments keeps them and only redoes synthesis,
+the EDL and the mix.
+"""
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from src import metrics
+from src.cache import content_hash
+
+CHECKPOINT_VERSION = 1
+STAGE_ORDER = ("transcription", "detection", "separation", "synthesis", "edl", "mixing")
+# The stages each stage's output was computed from.
+STAGE_DEPENDS = {
+    "transcription": (),
+    "detection": ("transcription",),
+    "separation": (),
+    "synthesis": ("detection", "separation"),
+    "edl": ("detection", "separation", "synthesis"),
+    "mixing": ("edl",),
+}
+
+
+def _dependents(stage: str) -> List[str]:
+    """Every stage computed, directly or not, from stage's output."""
+    found: List[str] = []
+    for later in STAGE_ORDER:
+        if any(dep == stage or dep in found for dep in STAGE_DEPENDS[later]):
+            found.append(later)
+    return found
+
+
+def _write_json(path: str, data: Any):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SongCheckpoint:
+    def __init__(self, root: str, input_path: str, model_size: str = "base", vad: bool = False,
+                 lyrics_path: Optional[str] = None):
+        self.key = f"{content_hash(input_path)}-{model_size}" + ("-vad" if vad else "")
+        if lyrics_path:
+            # Aligned supplied lyrics are a different transcript from free decoding.
+            self.key += f"-lyrics{content_hash(lyrics_path)[:8]}"
+        self.dir = os.path.join(root, self.key)
+        self.manifest_path = os.path.join(self.dir, "manifest.json")
+        os.makedirs(self.dir, exist_ok=True)
+        self.manifest = {"version": CHECKPOINT_VERSION, "input": os.path.abspath(input_path), "stages": {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") == CHECKPOINT_VERSION:
+                self.manifest = manifest
+        # The settings the key was made from, for tools that rerun a checkpoint (src/word_index.py).
+        self.manifest.update(model_size=model_size, vad=vad)
+        if lyrics_path:
+            self.manifest["lyrics"] = os.path.abspath(lyrics_path)
+
+    @property
+    def synth_dir(self) -> str:
+        return os.path.join(self.dir, "synth")
+
+    def get(self, stage: str) -> Optional[Any]:
+        """The stage's saved data, or None if it never completed or a referenced file is gone."""
+        entry = self.manifest["stages"].get(stage)
+        valid = bool(entry) and all(os.path.exists(ref) for ref in entry.get("refs", []))
+        metrics.current().cache(f"checkpoint_{stage}", valid)
+        if not valid:
+            return None
+        with open(os.path.join(self.dir, entry["file"]), encoding="utf-8") as f:
+            return json.load(f)
+
+    def put(self, stage: str, data: Any, refs: Iterable[Optional[str]] = ()) -> Any:
+        """Saves a completed stage (data file first, then the manifest) and invalidates the stages that depend on it."""
+        filename = f"{stage}.json"
+        _write_json(os.path.join(self.dir, filename), data)
+        stages = self.manifest["stages"]
+        for later in _dependents(stage):
+            stages.pop(later, None)
+        stages[stage] = {
+            "file": filename,
+            "completed": time.time(),
+            "refs": [os.path.abspath(ref) for ref in refs if ref],
+        }
+        _write_json(self.manifest_path, self.manifest)
+        return data
+
+    def last_completed(self) -> Optional[str]:
+        done = [stage for stage in STAGE_ORDER if stage in self.manifest["stages"]]
+        return done[-1] if done else None
+
+
+def segments_match(a: Iterable[Dict], b: Iterable[Dict]) -> bool:
+    """True when two cuss segment lists describe the same edits (ignoring synth paths)."""
+    keys = ("word", "replacement", "start", "end")
+    return [tuple(s.get(k) for k in keys) for s in a] == [tuple(s.get(k) for k in keys) for s in b]
@@ -0,0 +1,150 @@
+# src/edl.py
+"""
+Edit decision lists (EDLs): everything the mixer needs to render a clean
+version, serialized after detection/synthesis so the output can be re-rendered
+(e.g. with different fades or synth gain) without loading any model.
+"""
+import json
+import os
+from typing import Dict, List, Optional
+
+import soundfile as sf
+
+from src.stem_store import is_stem_path, open_stem
+
+EDL_VERSION = 1
+SUPPORTED_VERSIONS = {1}
+
+
+def default_edl_path(output_path: str) -> str:
+    """data/clean_song.mp3 -> data/clean_song.edl.json"""
+    return os.path.splitext(output_path)[0] + ".edl.json"
+
+
+def _probe(path: Optional[str]):
+    """(sample_rate, frames) of an audio file or stem, or (None, None)."""
+    if not path or not os.path.exists(path):
+        return None, None
+    try:
+        if is_stem_path(path):
+            stem = open_stem(path)
+            return stem.sample_rate, stem.frames
+        info = sf.info(path)
+        return info.samplerate, info.frames
+    except (RuntimeError, ValueError):
+        return None, None
+
+
+def _abspath(path: Optional[str]) -> Optional[str]:
+    return os.path.abspath(path) if path else None
+
+
+def build_edl(
+    input_path: str,
+    cuss_segments: List[Dict],
+    vocals_path: Optional[str],
+    instrumental_path: str,
+    synth_dir: str = "data/synth",
+    fade_ms: float = 0,
+    synth_gain_db: float = 0.0,
+    schedule: Optional[Dict] = None,
+    dsp: bool = False
+) -> Dict:
+    """
+    Builds an EDL from the detected (and synthesized) segments. Sample bounds
+    are given at the rate the mixer renders at: the instrumental stem's.
+    schedule records the quality choices a src/scheduler.py plan made; dsp
+    marks a render without stems (mix mode "dsp", see src/dsp_suppress.py).
+    """
+    source_rate, source_frames = _probe(input_path)
+    render_rate, _ = _probe(instrumental_path)
+    render_rate = render_rate or source_rate
+
+    segments = []
+    for seg in sorted(cuss_segments, key=lambda x: x['start']):
+        entry = {
+            "word": seg.get("word", ""),
+            "replacement": seg.get("replacement"),
+            "start": seg["start"],
+            "end": seg["end"],
+            "synth_path": _abspath(seg.get("synth_path")),
+            "fade_ms": seg.get("fade_ms", fade_ms),
+            "gain_db": seg.get("gain_db", synth_gain_db),
+        }
+        if "asr_start" in seg:
+            # Refined on the vocal stem; the transcript's times, for review.
+            entry["asr_start"], entry["asr_end"] = seg["asr_start"], seg["asr_end"]
+        if render_rate:
+            start_ms = max(0, int(seg['start'] * 1000))
+            end_ms = max(start_ms, int(seg['end'] * 1000))
+            entry["start_sample"] = start_ms * render_rate // 1000
+            entry["end_sample"] = end_ms * render_rate // 1000
+        segments.append(entry)
+
+    has_vocals = not dsp and bool(vocals_path and os.path.exists(vocals_path))
+    mode = "dsp" if dsp else "stems" if has_vocals else "fallback"
+    edl = {
+        "version": EDL_VERSION,
+        "source": {
+            "path": _abspath(input_path),
+            "sample_rate": source_rate,
+            "frames": source_frames,
+        },
+        "stems": {
+            "vocals": _abspath(vocals_path) if has_vocals else None,
+            "instrumental": _abspath(instrumental_path),
+            "sample_rate": render_rate,
+        },
+        "mix": {
+            "mode": mode,
+            "fade_ms": fade_ms,
+            "synth_gain_db": synth_gain_db,
+            "synth_dir": _abspath(synth_dir),
+        },
+        "segments": segments,
+    }
+    if schedule:
+        edl["schedule"] = schedule
+    return edl
+
+
+def save_edl(edl: Dict, path: str) -> str:
+    """Writes the EDL as JSON, atomically."""
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(edl, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_edl(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        edl = json.load(f)
+    version = edl.get("version")
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported EDL version {version!r} in {path}")
+    for key in ("source", "stems", "mix", "segments"):
+        if key not in edl:
+            raise ValueError(f"EDL {path} is missing '{key}'")
+    return edl
+
+
+def edl_segments(edl: Dict, fade_ms: Optional[float] = None, synth_gain_db: Optional[float] = None) -> List[Dict]:
+    """
+    Returns the EDL's segments in the mixer's cuss_segments shape, optionally
+    overriding the fade and synth gain choices for every segment.
+    """
+    segments = []
+    for entry in edl["segments"]:
+        seg = dict(entry)
+        if fade_ms is not None:
+            seg["fade_ms"] = fade_ms
+        if synth_gain_db is not None:
+            seg["gain_db"] = synth_gain_db
+        if not seg.get("synth_path"):
+            seg.pop("synth_path", None)
+        segments.append(seg)
+    return segments
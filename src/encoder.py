@@ -0,0 +1,209 @@
+# src/encoder.py
+import logging
+import os
+import shutil
+import subprocess
+from typing import Iterable, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+logger = logging.getLogger(__name__)
+
+# Extension -> output format.
+EXTENSION_FORMATS = {
+    ".wav": "wav",
+    ".flac": "flac",
+    ".mp3": "mp3",
+    ".m4a": "aac",
+    ".aac": "aac",
+    ".mp4": "aac",
+    ".opus": "opus",
+    ".ogg": "opus",
+}
+
+PCM_FORMATS = {"wav", "flac"}
+
+# Lossy format -> (ffmpeg codec, default bitrate)
+LOSSY_CODECS = {
+    "mp3": ("libmp3lame", "192k"),
+    "aac": ("aac", "192k"),
+    "opus": ("libopus", "128k"),
+}
+
+# Muxer to use for a lossy format, keyed by extension where it matters.
+_MUXERS = {".m4a": "ipod", ".mp4": "mp4", ".aac": "adts", ".opus": "opus", ".ogg": "ogg", ".mp3": "mp3"}
+_DEFAULT_MUXERS = {"mp3": "mp3", "aac": "adts", "opus": "opus"}
+
+BLOCK_FRAMES = 1 << 16
+
+
+def infer_format(path: str, default: str = "mp3") -> str:
+    """Returns the output format implied by the file extension (mp3 if unknown)."""
+    ext = os.path.splitext(path)[1].lower()
+    return EXTENSION_FORMATS.get(ext, default)
+
+
+def segment_to_array(audio_segment) -> np.ndarray:
+    """Converts a pydub AudioSegment into a float32 (frames, channels) buffer in [-1, 1]."""
+    width = audio_segment.sample_width
+    samples = np.array(audio_segment.get_array_of_samples(), dtype=np.float32)
+    if width == 1:
+        # 8-bit WAV is unsigned
+        samples -= 128.0
+    samples /= float(1 << (8 * width - 1))
+    return samples.reshape(-1, audio_segment.channels)
+
+
+def _as_frames(samples: np.ndarray) -> np.ndarray:
+    data = np.asarray(samples, dtype=np.float32)
+    if data.ndim == 1:
+        data = data[:, None]
+    return np.clip(data, -1.0, 1.0)
+
+
+def _iter_blocks(data: np.ndarray, block_frames: int = BLOCK_FRAMES) -> Iterable[np.ndarray]:
+    for start in range(0, len(data), block_frames):
+        yield data[start:start + block_frames]
+
+
+def _write_pcm(data: np.ndarray, sample_rate: int, output_path: str, fmt: str, subtype: Optional[str]):
+    subtype = subtype or "PCM_16"
+    with sf.SoundFile(output_path, "w", samplerate=sample_rate, channels=data.shape[1],
+                      format=fmt.upper(), subtype=subtype) as f:
+        for block in _iter_blocks(data):
+            f.write(block)
+
+
+def _ffmpeg_binary() -> str:
+    binary = shutil.which("ffmpeg")
+    if binary is None:
+        raise RuntimeError("ffmpeg not found in PATH; it is required for mp3/aac/opus output.")
+    return binary
+
+
+def _write_lossy(data: np.ndarray, sample_rate: int, output_path: str, fmt: str, bitrate: Optional[str]):
+    codec, default_bitrate = LOSSY_CODECS[fmt]
+    ext = os.path.splitext(output_path)[1].lower()
+    muxer = _MUXERS.get(ext) if EXTENSION_FORMATS.get(ext) == fmt else None
+    cmd = [
+        _ffmpeg_binary(), "-y", "-loglevel", "error",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", str(data.shape[1]), "-i", "pipe:0",
+        "-c:a", codec, "-b:a", bitrate or default_bitrate,
+    ]
+    if fmt == "opus" and sample_rate != 48000:
+        # libopus only accepts 48 kHz (and a few lower rates)
+        cmd += ["-ar", "48000"]
+    cmd += ["-f", muxer or _DEFAULT_MUXERS[fmt], output_path]
+
+    process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for block in _iter_blocks(data):
+            process.stdin.write(np.ascontiguousarray(block).tobytes())
+    except BrokenPipeError:
+        pass
+    finally:
+        process.stdin.close()
+    stderr = process.stderr.read()
+    if process.wait() != 0:
+        raise RuntimeError(f"ffmpeg failed to encode {output_path}: {stderr.decode(errors='replace').strip()}")
+
+
+def _splice_original(
+    data: np.ndarray,
+    sample_rate: int,
+    original_path: str,
+    changed_ranges: Iterable[Tuple[int, int]]
+) -> np.ndarray:
+    """
+    Replaces everything outside changed_ranges with the original samples
+    instead of a stem re-mix. For WAV/FLAC written in the source's subtype
+    (see _source_subtype) those frames come out bit-identical up to 24-bit PCM;
+    lossy outputs still re-encode every frame. Returns data unchanged when the
+    original can't be copied frame-for-frame.
+    """
+    try:
+        info = sf.info(original_path)
+    except RuntimeError:
+        return data
+    if info.samplerate != sample_rate or info.channels != data.shape[1]:
+        logger.info("Passthrough skipped: original is %d Hz/%dch, render is %d Hz/%dch",
+                    info.samplerate, info.channels, sample_rate, data.shape[1])
+        return data
+
+    original, _ = sf.read(original_path, dtype="float32", always_2d=True)
+    frames = min(len(original), len(data))
+    spliced = original[:len(data)].copy()
+    if len(spliced) < len(data):
+        spliced = np.concatenate([spliced, data[frames:]])
+    for start, end in changed_ranges:
+        start, end = max(0, start), min(len(data), end)
+        spliced[start:end] = data[start:end]
+    return spliced
+
+
+def _source_subtype(path: str, fmt: str) -> Optional[str]:
+    """The subtype of path if fmt can store it (e.g. PCM_24 or FLOAT), else None."""
+    try:
+        subtype = sf.info(path).subtype
+    except RuntimeError:
+        return None
+    return subtype if sf.check_format(fmt.upper(), subtype) else None
+
+
+def encode_audio(
+    samples: np.ndarray,
+    sample_rate: int,
+    output_path: str,
+    format: Optional[str] = None,
+    bitrate: Optional[str] = None,
+    subtype: Optional[str] = None,
+    passthrough_from: Optional[str] = None,
+    changed_ranges: Optional[Iterable[Tuple[int, int]]] = None
+) -> str:
+    """
+    Writes a float buffer straight to disk. WAV/FLAC go through soundfile;
+    MP3/AAC/Opus are streamed to ffmpeg as raw float32. The format defaults to
+    the one implied by output_path.
+
+    With passthrough_from (the original song) and changed_ranges (sample
+    ranges that were edited), every frame outside the ranges is copied from the
+    original file when its sample rate and channel count match the render.
+    WAV/FLAC output then defaults to the original's subtype instead of PCM_16,
+    so a 24-bit or float source isn't truncated.
+    """
+    fmt = format or infer_format(output_path)
+    data = _as_frames(samples)
+    if passthrough_from and changed_ranges is not None:
+        data = _splice_original(data, sample_rate, passthrough_from, changed_ranges)
+
+    out_dir = os.path.dirname(output_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+
+    if fmt in PCM_FORMATS:
+        if subtype is None and passthrough_from:
+            subtype = _source_subtype(passthrough_from, fmt)
+        _write_pcm(data, sample_rate, output_path, fmt, subtype)
+    elif fmt in LOSSY_CODECS:
+        _write_lossy(data, sample_rate, output_path, fmt, bitrate)
+    else:
+        raise ValueError(f"Unsupported output format: {fmt}")
+    return output_path
+
+
+def copy_stream(input_path: str, output_path: str, format: Optional[str] = None) -> bool:
+    """
+    Passthrough for songs that need no edits: copies the input as-is when it is
+    already in the requested output format. Returns False if a re-encode would
+    be needed instead.
+    """
+    fmt = format or infer_format(output_path)
+    if infer_format(input_path, default="") != fmt:
+        return False
+    if os.path.abspath(input_path) != os.path.abspath(output_path):
+        out_dir = os.path.dirname(output_path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        shutil.copyfile(input_path, output_path)
+    return True
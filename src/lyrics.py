@@ -1,22 +1,33 @@
-import whisper
-import torch
+WHISPER_SAMPLE_RATE = 16000
 
 def load_whisper_model(model_size="base"):
     """Loads the Whisper model."""
+    # Imported lazily so the transcript post-processing can run (and be
+    # benchmarked with stand-in models) without pulling in whisper/torch.
+    import torch
+    import whisper
+
     device = "cuda" if torch.cuda.is_available() else "cpu"
     print(f"Loading Whisper model '{model_size}' on {device}...")
     model = whisper.load_model(model_size, device=device)
     return model
 
-def transcribe_audio(model, audio_path):
+def _load_whisper_audio(audio_path):
     """
-    Transcribes audio and returns word-level timestamps.
-    Returns a list of dicts: {'word': str, 'start': float, 'end': float, 'confidence': float}
+    Mono float32 at Whisper's rate, resampled with src/resample.py. Formats
+    soundfile can't read are decoded by ffmpeg (through pydub) at their own rate.
     """
-    print(f"Transcribing {audio_path}...")
-    # word_timestamps=True is crucial for our use case
-    result = model.transcribe(audio_path, word_timestamps=True)
-    
+    from src.audio_utils import load_audio, resample_array
+    from src.encoder import segment_to_array
+    from src.vad import load_mono
+
+    try:
+        return load_mono(audio_path, WHISPER_SAMPLE_RATE)
+    except RuntimeError:
+        audio = load_audio(audio_path, target_sample_rate=None)
+        return resample_array(segment_to_array(audio).mean(axis=1), audio.frame_rate, WHISPER_SAMPLE_RATE)
+
+def _collect_words(result):
     words = []
     for segment in result["segments"]:
         if "words" in segment:
@@ -28,3 +39,174 @@ def transcribe_audio(model, audio_path):
                     "confidence": word["probability"]
                 })
     return words
+
+def transcribe_audio(model, audio_path, voiced_intervals=None):
+    """
+    Transcribes audio and returns word-level timestamps.
+    Returns a list of dicts: {'word': str, 'start': float, 'end': float, 'confidence': float}
+
+    With voiced_intervals ((start, end) seconds, see src/vad.py) only those
+    sections are decoded: they are joined into one clip, transcribed in a
+    single pass, and the word timestamps are mapped back to song time.
+    """
+    print(f"Transcribing {audio_path}...")
+    if voiced_intervals is None:
+        # word_timestamps=True is crucial for our use case
+        result = model.transcribe(audio_path, word_timestamps=True)
+        return _collect_words(result)
+
+    from src.vad import gather_intervals, remap_time
+
+    audio = _load_whisper_audio(audio_path)
+    clip, spans = gather_intervals(audio, WHISPER_SAMPLE_RATE, voiced_intervals)
+    if not spans:
+        return []
+    result = model.transcribe(clip, word_timestamps=True)
+    words = _collect_words(result)
+    for word in words:
+        word["start"] = remap_time(word["start"], spans)
+        word["end"] = max(word["start"], remap_time(word["end"], spans))
+    return words
+
+def transcribe_array(model, audio):
+    """Word-level transcription of a mono float32 buffer at WHISPER_SAMPLE_RATE (times relative to its start)."""
+    result = model.transcribe(audio, word_timestamps=True, condition_on_previous_text=False)
+    return _collect_words(result)
+
+# Batched decoding works on fixed 30 s mel windows (Whisper's input size) that
+# overlap by WINDOW_OVERLAP_SECONDS; each window keeps only the words centred
+# in the part it "owns", so words cut at a window edge come from its neighbour.
+WINDOW_SECONDS = 30.0
+WINDOW_OVERLAP_SECONDS = 3.0
+TIME_PRECISION = 0.02
+NO_SPEECH_THRESHOLD = 0.6
+LOGPROB_THRESHOLD = -1.0
+
+def plan_windows(duration, window=WINDOW_SECONDS, overlap=WINDOW_OVERLAP_SECONDS):
+    """
+    Returns [(start, end, own_start, own_end)] in seconds covering duration.
+    Owned ranges tile the song without gaps or overlap.
+    """
+    hop = window - overlap
+    windows = []
+    start = 0.0
+    while True:
+        end = min(start + window, duration)
+        last = end >= duration
+        own_start = 0.0 if not windows else start + overlap / 2
+        own_end = duration if last else start + hop + overlap / 2
+        windows.append((start, end, own_start, own_end))
+        if last:
+            return windows
+        start += hop
+
+def split_timestamped_tokens(tokens, timestamp_begin, offset, window_end):
+    """
+    Splits a decoded window's tokens (<|t0|> text <|t1|><|t1|> text <|t2|> ...)
+    into segments with absolute start/end times. Text after the last timestamp
+    runs to window_end.
+    """
+    segments = []
+    current, start = [], None
+    for token in tokens:
+        if token >= timestamp_begin:
+            time = offset + (token - timestamp_begin) * TIME_PRECISION
+            if current:
+                segments.append({"start": start if start is not None else offset, "end": time, "tokens": current})
+                current, start = [], None
+            else:
+                start = time
+        else:
+            current.append(token)
+    if current:
+        segments.append({"start": start if start is not None else offset, "end": window_end, "tokens": current})
+    return segments
+
+def transcribe_batch(model, audio_paths, batch_size=8, voiced_intervals=None, language=None):
+    """
+    Transcribes several songs with batched decoding: 30 s mel windows from all
+    songs are packed into batches for one encoder/decoder pass each, then
+    word timestamps are aligned per window. Returns one word list per song in
+    the same shape as transcribe_audio. voiced_intervals, if given, holds one
+    interval list (or None) per song, as in transcribe_audio.
+
+    Decoding is greedy at temperature 0 without the previous-text prompt, so
+    results can differ slightly from model.transcribe on hard passages.
+    """
+    import torch
+    import whisper
+    from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES
+    from whisper.timing import add_word_timestamps
+    from whisper.tokenizer import get_tokenizer
+
+    from src.vad import gather_intervals, remap_time
+
+    songs = []
+    windows = []
+    for index, audio_path in enumerate(audio_paths):
+        print(f"Transcribing {audio_path}...")
+        audio = _load_whisper_audio(audio_path)
+        intervals = voiced_intervals[index] if voiced_intervals else None
+        spans = None
+        if intervals is not None:
+            audio, spans = gather_intervals(audio, WHISPER_SAMPLE_RATE, intervals)
+        mel = whisper.log_mel_spectrogram(torch.from_numpy(audio), model.dims.n_mels, padding=N_SAMPLES)
+        songs.append({"mel": mel, "spans": spans, "words": []})
+        if len(audio):
+            windows.extend((index,) + window for window in plan_windows(len(audio) / WHISPER_SAMPLE_RATE))
+
+    frames_per_second = WHISPER_SAMPLE_RATE // HOP_LENGTH
+    fp16 = model.device.type == "cuda"
+    options = whisper.DecodingOptions(language=language, without_timestamps=False, fp16=fp16)
+    # Newer Whisper releases need the model's language count for large-v3 tokenizers.
+    tokenizer_kwargs = {"num_languages": model.num_languages} if hasattr(model, "num_languages") else {}
+    tokenizers = {}
+    last_speech = {}
+    for first in range(0, len(windows), batch_size):
+        group = windows[first:first + batch_size]
+        mels = []
+        for index, start, end, _, _ in group:
+            seek = int(round(start * frames_per_second))
+            mels.append(whisper.pad_or_trim(songs[index]["mel"][:, seek:seek + N_FRAMES], N_FRAMES))
+        batch = torch.stack(mels).to(model.device, torch.float16 if fp16 else torch.float32)
+        results = whisper.decode(model, batch, options)
+
+        for (index, start, end, own_start, own_end), mel_window, result in zip(group, batch, results):
+            if result.no_speech_prob > NO_SPEECH_THRESHOLD and result.avg_logprob < LOGPROB_THRESHOLD:
+                continue
+            if result.language not in tokenizers:
+                tokenizers[result.language] = get_tokenizer(
+                    model.is_multilingual, language=result.language, task="transcribe", **tokenizer_kwargs
+                )
+            tokenizer = tokenizers[result.language]
+            tokens = [t for t in result.tokens if t < tokenizer.eot]
+            segments = split_timestamped_tokens(tokens, tokenizer.timestamp_begin, start, end)
+            if not segments:
+                continue
+            for segment in segments:
+                segment["seek"] = int(round(start * frames_per_second))
+            add_word_timestamps(
+                segments=segments,
+                model=model,
+                tokenizer=tokenizer,
+                mel=mel_window,
+                num_frames=int(round((end - start) * frames_per_second)),
+                last_speech_timestamp=last_speech.get(index, start)
+            )
+            owned = [
+                word for segment in segments for word in segment.get("words", [])
+                if own_start <= (word["start"] + word["end"]) / 2 < own_end
+            ]
+            if owned:
+                last_speech[index] = owned[-1]["end"]
+            songs[index]["words"].extend(owned)
+
+    transcripts = []
+    for song in songs:
+        words = _collect_words({"segments": [{"words": sorted(song["words"], key=lambda w: w["start"])}]})
+        if song["spans"] is not None:
+            for word in words:
+                word["start"] = remap_time(word["start"], song["spans"])
+                word["end"] = max(word["start"], remap_time(word["end"], song["spans"]))
+        transcripts.append(words)
+    return transcripts
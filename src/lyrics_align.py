@@ -0,0 +1,249 @@
+# src/lyrics_align.py
+"""
+Supplied-lyrics mode: when the lyrics are known (plain text or LRC), cuss
+words are found in the text before any model is loaded. Only songs that need
+edits are then force-aligned to get word timestamps.
+
+Alignment restricts Whisper to the known text. The encoder runs once per
+30 s window, followed by a single decoder pass over the lyric tokens. The
+cross-attention of the alignment heads is then turned into word timings by
+DTW (whisper.timing.find_alignment, the same step word_timestamps=True uses
+after decoding). This skips autoregressive decoding entirely, and a
+profanity can't be misheard as a clean word.
+
+- LRC line times anchor each window to its lines.
+- Plain lyrics are aligned window by window. Words that land near a window's
+  end are treated as unplaced and start the next window, because forced
+  alignment piles up text that doesn't fit at the end.
+- A cuss word that can't be aligned at all is not dropped. It is muted over
+  the gap between its aligned neighbours (within its LRC line) and marked
+  "unaligned", with a warning.
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+
+from src.censor_manager import detect_cuss_words
+from src.lyrics import WHISPER_SAMPLE_RATE, WINDOW_SECONDS, _load_whisper_audio
+
+_TIME_TAG = re.compile(r"\[(\d+):(\d+(?:\.\d+)?)\]")
+_OFFSET_TAG = re.compile(r"^\[offset:\s*([+-]?\d+)\]$", re.IGNORECASE)
+_OTHER_TAG = re.compile(r"\[[^\]]*\]")  # LRC metadata ([ar:...]) and section labels ([Chorus])
+_WORD_TAG = re.compile(r"<\d+:\d+(?:\.\d+)?>")  # enhanced LRC per-word times
+
+# LRC stamps are often a little late; windows start this much earlier.
+LEAD_SECONDS = 0.5
+# Plain lyrics: words ending this close to a window's end are retried in the next one.
+EDGE_SECONDS = 1.5
+# Lyric tokens per window, well inside the decoder's 448-token context.
+MAX_WINDOW_TOKENS = 220
+
+
+def parse_lyrics(text: str) -> List[Dict]:
+    """
+    Lyric lines as [{"time": seconds or None, "text": str}]. LRC lines
+    with several stamps are repeated at each one, [offset:ms] is applied and
+    the result is sorted by time. Plain lines get time None.
+    """
+    offset = 0.0
+    lines = []
+    for raw in text.splitlines():
+        raw = raw.strip()
+        match = _OFFSET_TAG.match(raw)
+        if match:
+            # A positive offset makes the lyrics appear sooner.
+            offset = int(match.group(1)) / 1000.0
+            continue
+        times = [int(m) * 60 + float(s) for m, s in _TIME_TAG.findall(raw)]
+        words = _OTHER_TAG.sub(" ", _WORD_TAG.sub(" ", _TIME_TAG.sub(" ", raw))).split()
+        if not words:
+            continue
+        for time in times or [None]:
+            lines.append({"time": time, "text": " ".join(words)})
+    if any(line["time"] is not None for line in lines):
+        lines = [dict(line, time=max(0.0, line["time"] - offset)) for line in lines if line["time"] is not None]
+        lines.sort(key=lambda line: line["time"])
+    return lines
+
+
+def load_lyrics(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8-sig") as f:
+        return parse_lyrics(f.read())
+
+
+def lyric_words(lines: List[Dict]) -> List[Dict]:
+    """
+    Every word of the lyrics in transcript form. start/end are the line's
+    LRC time (0.0 for plain lyrics) until the words are aligned.
+    """
+    words = []
+    for number, line in enumerate(lines):
+        time = line["time"] or 0.0
+        for word in line["text"].split():
+            words.append({"word": word.lower().replace(",", "").replace(".", ""), "start": time, "end": time,
+                          "confidence": 1.0, "line": number})
+    return words
+
+
+def text_cuss_words(lines: List[Dict]) -> List[Dict]:
+    """detect_cuss_words on the lyric text alone (no audio, no model)."""
+    return detect_cuss_words(lyric_words(lines))
+
+
+def plan_chunks(lines: List[Dict], duration: float, window: float = WINDOW_SECONDS) -> List[Tuple[float, float, List[int]]]:
+    """
+    Groups timed lines into alignment windows of at most window seconds:
+    [(start, end, line numbers)]. A line runs until the next line's stamp;
+    windows start LEAD_SECONDS early and end LEAD_SECONDS after their last
+    line.
+    """
+    chunks = []
+    current: List[int] = []
+    start = 0.0
+    for number, line in enumerate(lines):
+        line_end = lines[number + 1]["time"] if number + 1 < len(lines) else duration
+        if current and line_end + LEAD_SECONDS - start > window:
+            chunks.append((start, lines[number]["time"], current))
+            current = []
+        if not current:
+            start = max(0.0, line["time"] - LEAD_SECONDS)
+        current.append(number)
+    if current:
+        chunks.append((start, duration, current))
+    return [(begin, min(end + LEAD_SECONDS, begin + window, duration), numbers)
+            for begin, end, numbers in chunks if min(end, duration) > begin]
+
+
+def assign_timings(words: List[Dict], token_counts: List[int], timings: List, offset: float) -> List[Optional[Dict]]:
+    """
+    Maps whisper WordTimings (split by the tokenizer's own word rules) back
+    onto the lyric words they came from, using token positions. Returns one
+    entry per lyric word: a copy with absolute times, or None if no timing
+    covered it.
+    """
+    owners = [index for index, count in enumerate(token_counts) for _ in range(count)]
+    placed: List[Optional[Dict]] = [None] * len(words)
+    position = 0
+    for timing in timings:
+        if position >= len(owners):
+            break
+        index = owners[position]
+        position += len(timing.tokens)
+        if not timing.word.strip():
+            continue
+        start, end = offset + float(timing.start), offset + float(timing.end)
+        word = placed[index]
+        if word is None:
+            placed[index] = dict(words[index], start=start, end=end, confidence=float(timing.probability))
+        else:
+            word["end"] = max(word["end"], end)
+            word["confidence"] = min(word["confidence"], float(timing.probability))
+    return placed
+
+
+def place_unaligned_cuss_words(words: List[Dict], placed: List[Optional[Dict]], lines: List[Dict],
+                               duration: float) -> List[Dict]:
+    """
+    Cuss words among the lyric words that alignment left unplaced (placed[i]
+    is None). Each one spans the gap between its nearest placed neighbours,
+    kept within its line's span for LRC lyrics, and is marked "unaligned".
+    Muting too much is better than letting a supplied cuss word through.
+    """
+    fallback = []
+    for index, word in enumerate(words):
+        if placed[index] is not None or not detect_cuss_words([word]):
+            continue
+        start = max((other["end"] for other in placed[:index] if other), default=0.0)
+        end = min((other["start"] for other in placed[index + 1:] if other), default=duration)
+        line = lines[word["line"]]
+        if line["time"] is not None:
+            line_end = lines[word["line"] + 1]["time"] if word["line"] + 1 < len(lines) else duration
+            start, end = max(start, line["time"]), min(end, line_end)
+            if end <= start:
+                start, end = line["time"], max(line["time"], line_end)
+        fallback.append(dict(word, start=start, end=max(start, end), confidence=0.0, unaligned=True))
+    return fallback
+
+
+def align_lyrics(model, audio_path: str, lines: List[Dict], language: str = "en",
+                 voiced_intervals: Optional[List[Tuple[float, float]]] = None) -> List[Dict]:
+    """
+    Word timestamps for the supplied lyrics, in transcribe_audio's format.
+    With voiced_intervals (see src/vad.py) only those sections are
+    searched, which keeps plain lyrics out of instrumental passages.
+    """
+    import torch
+    import whisper
+    from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES
+    from whisper.timing import find_alignment
+    from whisper.tokenizer import get_tokenizer
+
+    from src.vad import gather_intervals, remap_time
+
+    print(f"Aligning supplied lyrics to {audio_path}...")
+    audio = _load_whisper_audio(audio_path)
+    spans = None
+    if voiced_intervals is not None and not any(line["time"] is not None for line in lines):
+        audio, spans = gather_intervals(audio, WHISPER_SAMPLE_RATE, voiced_intervals)
+    duration = len(audio) / WHISPER_SAMPLE_RATE
+    words = lyric_words(lines)
+    if not words or not duration:
+        return []
+
+    mel = whisper.log_mel_spectrogram(torch.from_numpy(audio), model.dims.n_mels, padding=N_SAMPLES)
+    frames_per_second = WHISPER_SAMPLE_RATE // HOP_LENGTH
+    fp16 = model.device.type == "cuda"
+    tokenizer_kwargs = {"num_languages": model.num_languages} if hasattr(model, "num_languages") else {}
+    tokenizer = get_tokenizer(model.is_multilingual, language=language, task="transcribe", **tokenizer_kwargs)
+    raw_words = [word for line in lines for word in line["text"].split()]
+    token_counts = [len(tokenizer.encode(" " + word)) for word in raw_words]
+
+    def align(first: int, last: int, start: float, end: float) -> List[Optional[Dict]]:
+        seek = int(round(start * frames_per_second))
+        num_frames = int(round((end - start) * frames_per_second))
+        segment = whisper.pad_or_trim(mel[:, seek:seek + num_frames], N_FRAMES)
+        text_tokens = [token for word in raw_words[first:last] for token in tokenizer.encode(" " + word)]
+        timings = find_alignment(model, tokenizer, text_tokens,
+                                 segment.to(model.device, torch.float16 if fp16 else torch.float32), num_frames)
+        return assign_timings(words[first:last], token_counts[first:last], timings, start)
+
+    placed_at: List[Optional[Dict]] = [None] * len(words)
+    if lines[0]["time"] is not None:
+        line_of = [word["line"] for word in words]
+        for start, end, numbers in plan_chunks(lines, duration):
+            first, last = line_of.index(numbers[0]), len(line_of) - line_of[::-1].index(numbers[-1])
+            placed_at[first:last] = align(first, last, start, end)
+    else:
+        cursor, first = 0.0, 0
+        while first < len(words) and cursor < duration:
+            end = min(cursor + WINDOW_SECONDS, duration)
+            last, tokens = first + 1, token_counts[first]
+            while last < len(words) and tokens + token_counts[last] <= MAX_WINDOW_TOKENS:
+                tokens += token_counts[last]
+                last += 1
+            placed = []
+            for word in align(first, last, cursor, end):
+                # The first word that is missing or too close to the window end starts the next window.
+                if word is None or (end < duration and word["end"] > end - EDGE_SECONDS):
+                    break
+                placed.append(word)
+            if placed:
+                placed_at[first:first + len(placed)] = placed
+                first += len(placed)
+                cursor = placed[-1]["end"]
+            else:
+                cursor += WINDOW_SECONDS / 2
+    aligned = [word for word in placed_at if word]
+    print(f"Aligned {len(aligned)} of {len(words)} lyric words.")
+
+    missing = place_unaligned_cuss_words(words, placed_at, lines, duration)
+    if missing:
+        print(f"Warning: {len(missing)} cuss words in the lyrics could not be aligned; muting each between its "
+              f"aligned neighbours: {', '.join(word['word'] for word in missing)}")
+        aligned = sorted(aligned + missing, key=lambda word: word["start"])
+
+    for word in aligned:
+        word.pop("line", None)
+        if spans is not None:
+            word["start"] = remap_time(word["start"], spans)
+            word["end"] = max(word["start"], remap_time(word["end"], spans))
+    return aligned
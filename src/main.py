@@ -1,119 +1,698 @@
 # src/main.py
 import argparse
+import hashlib
 import os
 import sys
+import time
+import uuid
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import metrics
+from src.audio_utils import get_audio_duration, load_audio, save_audio
+from src.edl import build_edl, default_edl_path, save_edl
+from src.encoder import copy_stream
 from src.lyrics import load_whisper_model, transcribe_audio
 from src.censor_manager import detect_cuss_words
+from src.lyrics_align import align_lyrics, load_lyrics, lyric_words, text_cuss_words
+from src.scheduler import CostModel, Scheduler
+from src.cache import content_hash, song_dir_name
+from src.checkpoint import SongCheckpoint, segments_match
+from src.fingerprint import FingerprintIndex, find_duplicate, fingerprint, load_fingerprint_audio, shift_words
+from src.repetition import apply_repeats, decode_intervals, detect_repeats
+from src.vad import detect_voiced_intervals
+from src.boundary_refine import refine_segments
+from src.word_index import WordIndex, track_key
 from src.separator import separate_vocals
 from src.voice_synth import VoiceSynthesizer
-from src.mixer import create_clean_version
+from src.mixer import create_clean_version, patch_clean_version
+from src.patcher import can_patch
+from src.preview import LAYOUTS as PREVIEW_LAYOUTS
+from src.preview import render_preview
 
-def main():
-    parser = argparse.ArgumentParser(description="CleanMusic: AI-powered song censorship.")
-    parser.add_argument("--input", required=True, help="Path to the input audio file.")
-    parser.add_argument("--output", default="data/clean_song.mp3", help="Path to the output clean audio.")
-    parser.add_argument("--model_size", default="base", help="Whisper model size (tiny, base, small, medium, large).")
-    parser.add_argument("--skip_separation", action="store_true", help="Skip source separation (for testing mixing only).")
-    parser.add_argument(
-        "--use_synth",
-        action="store_true",
-        help="Enable voice synthesis for cuss words."
-    )
-    parser.add_argument(
-        "--no_use_synth",
-        dest="use_synth",
-        action="store_false",
-        help="Disable voice synthesis."
+
+# Context decoded either side of a window that differs from a duplicate's reference.
+RETRANSCRIBE_PAD_S = 1.0
+
+
+def run_transcription(input_path, model_size="base", whisper_model=None, audio_seconds=None, vad=False, vad_path=None, repeats=False):
+    """
+    Step 1: word-level transcription. Loads Whisper unless a warm model is passed in.
+    With vad, only voiced sections are decoded; vad_path (a vocal stem) gives a
+    sharper gate than the full mix. With repeats, verified repeated sections
+    (see src/repetition.py) are skipped and get copies of their source's words.
+    """
+    stats = metrics.current()
+    voiced = run_vad(vad_path or input_path, "vocals" if vad_path else "mix") if vad else None
+    repeated = run_repeat_detection(input_path) if repeats else None
+    if repeated:
+        voiced = decode_intervals(repeated[0], repeated[1], voiced)
+    if whisper_model is None:
+        with stats.stage("transcription.model_load", model=model_size):
+            whisper_model = load_whisper_model(model_size)
+    with stats.stage("transcription.inference", audio_seconds=audio_seconds, model=model_size) as extra:
+        if voiced is None:
+            return transcribe_audio(whisper_model, input_path)
+        extra["decoded_seconds"] = round(sum(end - start for start, end in voiced), 3)
+        words = transcribe_audio(whisper_model, input_path, voiced_intervals=voiced)
+    return apply_repeats(words, repeated[0]) if repeated else words
+
+
+def run_alignment(input_path, lines, model_size="base", whisper_model=None, audio_seconds=None, vad=False, vad_path=None):
+    """
+    Step 1 with supplied lyrics: force-aligns the known text (see
+    src/lyrics_align.py) instead of decoding. With vad, plain lyrics are only
+    placed in voiced sections.
+    """
+    stats = metrics.current()
+    voiced = run_vad(vad_path or input_path, "vocals" if vad_path else "mix") if vad else None
+    if whisper_model is None:
+        with stats.stage("transcription.model_load", model=model_size):
+            whisper_model = load_whisper_model(model_size)
+    with stats.stage("transcription.alignment", audio_seconds=audio_seconds, model=model_size) as extra:
+        words = align_lyrics(whisper_model, input_path, lines, voiced_intervals=voiced)
+        extra["lyric_words"] = sum(len(line["text"].split()) for line in lines)
+        extra["aligned_words"] = sum(1 for word in words if not word.get("unaligned"))
+        # Cuss words placed by fallback only: the edit list is incomplete without review.
+        extra["unaligned_cuss_words"] = sum(1 for word in words if word.get("unaligned"))
+    return words
+
+
+def run_fingerprint(input_path, index):
+    """
+    Fingerprints the song and looks it up in a src/fingerprint.py index.
+    Returns (hashes, frames, duplicate), where duplicate is find_duplicate's
+    match or None; (None, None, None) if the file can't be analysed.
+    """
+    stats = metrics.current()
+    with stats.stage("fingerprint") as extra:
+        try:
+            mono = load_fingerprint_audio(input_path)
+        except (RuntimeError, OSError) as e:
+            print(f"Warning: fingerprinting failed, processing from scratch: {e}")
+            return None, None, None
+        hashes, frames = fingerprint(mono)
+        duplicate = find_duplicate(index, mono, hashes, frames)
+        extra["hashes"] = len(hashes)
+    stats.cache("fingerprint", duplicate is not None)
+    if duplicate:
+        differs = duplicate["differs"]
+        check = ("unverified: reference audio missing" if differs is None
+                 else f"{sum(end - start for start, end in differs):.1f}s differ" if differs else "same audio")
+        print(f"Duplicate of {duplicate['input']} (offset {duplicate['offset_s']:+.3f}s, "
+              f"{duplicate['coverage']:.0%} coverage, {check}{', aligned' if duplicate['aligned'] else ''}).")
+    return hashes, frames, duplicate
+
+
+def run_retranscription(input_path, words, differs, model_size="base", whisper_model=None, audio_seconds=None):
+    """
+    Transcript reuse for a duplicate whose audio differs from its reference
+    in places (e.g. a radio edit of an explicit master): the windows in
+    differs, padded by RETRANSCRIBE_PAD_S for context, are decoded again and
+    replace the reused words there.
+    """
+    stats = metrics.current()
+    windows = []
+    for start, end in differs:
+        start, end = max(0.0, start - RETRANSCRIBE_PAD_S), end + RETRANSCRIBE_PAD_S
+        if audio_seconds:
+            end = min(end, audio_seconds)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end))
+        else:
+            windows.append((start, end))
+    if whisper_model is None:
+        with stats.stage("transcription.model_load", model=model_size):
+            whisper_model = load_whisper_model(model_size)
+    with stats.stage("transcription.inference", audio_seconds=audio_seconds, model=model_size) as extra:
+        extra["decoded_seconds"] = round(sum(end - start for start, end in windows), 3)
+        fresh = transcribe_audio(whisper_model, input_path, voiced_intervals=windows)
+    print(f"Re-transcribed {extra['decoded_seconds']:.1f}s where the audio differs from the reference.")
+    kept = [word for word in words if not any(word["start"] < end and word["end"] > start for start, end in windows)]
+    return sorted(kept + fresh, key=lambda word: word["start"])
+
+
+def _reusable_segments(duplicate, cuss_segments):
+    """A duplicate's synthesized segments if they fit this song: aligned, same edits, clips still on disk."""
+    saved = duplicate["result"].get("segments") if duplicate and duplicate["aligned"] else None
+    if not saved or not segments_match(saved, cuss_segments):
+        return None
+    if not all(os.path.exists(seg["synth_path"]) for seg in saved if seg.get("synth_path")):
+        return None
+    return saved
+
+
+def run_repeat_detection(path):
+    """(repeats, duration) of the verified repeated sections, or None if there are none or the file can't be analysed."""
+    with metrics.current().stage("repetition") as extra:
+        try:
+            repeats, duration = detect_repeats(path)
+        except (RuntimeError, ValueError) as e:
+            print(f"Warning: repeated-section detection failed, transcribing the whole song: {e}")
+            return None
+        extra["audio_seconds"] = duration
+        extra["repeats"] = len(repeats)
+        extra["repeated_seconds"] = round(sum(r["repeat"][1] - r["repeat"][0] for r in repeats), 3)
+    for repeat in repeats:
+        print(f"Repeat: {repeat['source'][0]:.1f}-{repeat['source'][1]:.1f}s again at {repeat['repeat'][0]:.1f}s.")
+    return (repeats, duration) if repeats else None
+
+
+def run_vad(path, source="mix"):
+    """Voiced intervals for gated transcription, or None (decode everything) if the file can't be analysed."""
+    with metrics.current().stage("vad", source=source) as extra:
+        try:
+            voiced, duration = detect_voiced_intervals(path, source=source)
+        except (RuntimeError, ValueError) as e:
+            print(f"Warning: voice activity detection failed, transcribing the whole song: {e}")
+            return None
+        extra["audio_seconds"] = duration
+        extra["voiced_seconds"] = round(sum(end - start for start, end in voiced), 3)
+    print(f"Voice activity: {extra['voiced_seconds']:.1f}s of {duration:.1f}s in {len(voiced)} sections.")
+    return voiced
+
+
+def run_detection(lyrics_data):
+    """Step 2: dictionary lookup over the transcript."""
+    with metrics.current().stage("detection", words=len(lyrics_data)):
+        return detect_cuss_words(lyrics_data)
+
+
+def run_separation(input_path, skip_separation=False, audio_seconds=None, stem_format="stem", model=None, output_dir="data/separated", shifts=5):
+    """
+    Step 3: source separation. Returns (vocals_path, instrumental_path).
+    With skip_separation the stems from a previous run are reused. Demucs is
+    loaded per call unless a warm model is passed in; shifts trades quality
+    for time (one model pass per shift).
+    """
+    if skip_separation:
+        # Fallback for testing if files exist
+        filename = os.path.splitext(os.path.basename(input_path))[0]
+        for stem_dir in (f"data/separated/{song_dir_name(input_path)}", f"data/separated/htdemucs/{filename}",
+                         f"data/separated/{filename}"):
+            for ext in (".stem", ".wav"):
+                vocals_path = os.path.join(stem_dir, f"vocals{ext}")
+                instrumental_path = os.path.join(stem_dir, f"no_vocals{ext}")
+                if os.path.exists(vocals_path) and os.path.exists(instrumental_path):
+                    metrics.current().cache("stems", True)
+                    return vocals_path, instrumental_path
+        raise FileNotFoundError("separation skipped but files not found.")
+
+    print("Separating vocals and instrumental...")
+    metrics.current().cache("stems", False)
+    with metrics.current().stage("separation", audio_seconds=audio_seconds, shifts=shifts):
+        return separate_vocals(input_path, output_dir=output_dir, model=model, stem_format=stem_format, shifts=shifts)
+
+
+def run_refinement(cuss_segments, vocals_path):
+    """
+    Step 3b: snaps segment edges to the vocal stem (src/boundary_refine.py).
+    Returns the refined segments, or the originals if the stem can't be read.
+    """
+    with metrics.current().stage("refinement", segments=len(cuss_segments)) as extra:
+        try:
+            refined = refine_segments(cuss_segments, vocals_path)
+        except (OSError, RuntimeError, ValueError) as e:
+            print(f"Warning: boundary refinement failed, keeping the transcript times: {e}")
+            return cuss_segments
+        moved = [abs(seg["start"] - seg["asr_start"]) + abs(seg["end"] - seg["asr_end"])
+                 for seg in refined if "asr_start" in seg]
+        extra["moved"] = len(moved)
+        extra["mean_shift_ms"] = round(1000 * sum(moved) / (2 * len(moved)), 1) if moved else 0.0
+    print(f"Refined the edges of {extra['moved']} of {len(refined)} segments on the vocal stem.")
+    return refined
+
+
+def run_synthesis(cuss_segments, vocals_path, synth_dir="data/synth", synthesizer=None):
+    """
+    Step 4: synthesizes a replacement clip per segment and stores its path in
+    seg['synth_path'] for the mixer. Returns the synthesizer so callers can reuse it.
+    """
+    stats = metrics.current()
+    if synthesizer is None:
+        with stats.stage("synthesis.model_load"):
+            synthesizer = VoiceSynthesizer()
+    os.makedirs(synth_dir, exist_ok=True)
+
+    # The clip depends only on the text, the reference voice and the duration,
+    # so a word repeated with the same length (e.g. in every chorus) is synthesized once.
+    # Files are named after all three, so a clip left by an earlier run (before a
+    # dictionary edit or with refinement toggled) is only reused when it fits.
+    reference = hashlib.sha1(os.path.abspath(vocals_path).encode()).hexdigest()[:8]
+    clips = {}
+    for seg in cuss_segments:
+        replacement = seg['replacement']
+        clip_key = (replacement, round(seg['end'] - seg['start'], 2))
+        stats.cache("synth_clip_repeat", clip_key in clips)
+        if clip_key in clips:
+            seg['synth_path'] = clips[clip_key]
+            continue
+        duration = clip_key[1]
+        output_name = f"{replacement}_{round(duration * 1000)}ms_{reference}"
+        output_path = os.path.join(synth_dir, f"{output_name}.wav")
+
+        # Check if already exists to save time (simple caching)
+        cached = os.path.exists(output_path)
+        stats.cache("synth_clip", cached)
+        if not cached:
+            # Written under a name unique to this call and renamed, so a crash never
+            # leaves a partial clip that the existence check above would reuse, and
+            # workers synthesizing the same clip don't write over each other.
+            partial_path = os.path.join(synth_dir, f"{output_name}.{uuid.uuid4().hex[:8]}.partial.wav")
+            with stats.stage("synthesis.inference", audio_seconds=duration, word=replacement):
+                synthesizer.generate_speech(
+                    text=replacement,
+                    speaker_wav=vocals_path, # Use extracted vocals as reference
+                    output_path=partial_path,
+                    duration=duration
+                )
+            if os.path.exists(partial_path):
+                os.replace(partial_path, output_path)
+
+        # Store the specific path in the segment for the mixer
+        seg['synth_path'] = output_path
+        clips[clip_key] = output_path
+    return synthesizer
+
+
+def run_mixing(
+    input_path,
+    output_path,
+    cuss_segments,
+    vocals_path,
+    instrumental_path,
+    audio_seconds=None,
+    bitrate=None,
+    passthrough=False,
+    patch=False,
+    synth_dir="data/synth",
+    dsp=False
+):
+    """
+    Step 5: renders the clean version, patching a copy of the input when
+    possible. With dsp there are no stems and the vocals are suppressed in
+    the input (src/dsp_suppress.py).
+    """
+    if patch and not can_patch(input_path, output_path):
+        print("Warning: patch mode needs a wav/flac/mp3 output in the input's format; rendering the full song.")
+        patch = False
+    with metrics.current().stage("mixing", audio_seconds=audio_seconds, segments=len(cuss_segments)):
+        if patch:
+            patch_clean_version(
+                original_audio_path=input_path,
+                instrumental_path=instrumental_path,
+                cuss_segments=cuss_segments,
+                vocals_path=vocals_path,
+                synth_dir=synth_dir,
+                output_path=output_path,
+                dsp=dsp
+            )
+            return output_path
+        create_clean_version(
+            original_audio_path=input_path,
+            instrumental_path=instrumental_path,
+            cuss_segments=cuss_segments,
+            vocals_path=vocals_path,
+            synth_dir=synth_dir,
+            output_path=output_path,
+            bitrate=bitrate,
+            passthrough=passthrough,
+            dsp=dsp
+        )
+    return output_path
+
+
+def write_unedited(input_path, output_path, bitrate=None):
+    """Passthrough for clean songs: copies the input, re-encoding only if the format differs."""
+    with metrics.current().stage("mixing.encode", audio_seconds=get_audio_duration(input_path)):
+        if not copy_stream(input_path, output_path):
+            save_audio(load_audio(input_path), output_path, bitrate=bitrate)
+    return output_path
+
+
+def _index_track(word_index, input_path, output_path, words, model_size, vad, checkpoint_dir, lyrics, options):
+    """Adds the song's words to the word index with the options it was rendered with."""
+    index = WordIndex(word_index)
+    index.add_track(
+        track_key(input_path, model_size, vad, lyrics),
+        os.path.abspath(input_path),
+        os.path.abspath(output_path),
+        words,
+        dict(options, model_size=model_size, vad=vad,
+             checkpoint_dir=os.path.abspath(checkpoint_dir) if checkpoint_dir else None,
+             lyrics=os.path.abspath(lyrics) if lyrics else None)
     )
-    parser.set_defaults(use_synth=True)
+    index.close()
 
-    
-    args = parser.parse_args()
-    
-    input_path = args.input
-    if not os.path.exists(input_path):
-        print(f"Error: Input file not found: {input_path}")
-        sys.exit(1)
-        
+
+def process_song(
+    input_path,
+    output_path,
+    model_size="base",
+    use_synth=True,
+    skip_separation=False,
+    bitrate=None,
+    passthrough=False,
+    patch=False,
+    stem_format="stem",
+    edl_path=None,
+    vad=False,
+    checkpoint_dir=None,
+    word_index=None,
+    scheduler=None,
+    queue_depth=0,
+    repeats=False,
+    lyrics=None,
+    fingerprint_index=None,
+    preview=None,
+    dsp=False,
+    refine=False
+):
+    """
+    Runs the full pipeline for one song. Returns the output path, or None when
+    the song is already clean (unless passthrough is set, in which case the
+    input is written to output_path unchanged).
+
+    The edit decision list is saved to edl_path (default: next to the output)
+    before mixing, so the mix can be re-rendered with src/render.py.
+
+    With checkpoint_dir, every completed stage is checkpointed (see
+    src/checkpoint.py) and a rerun resumes after the last stage that finished.
+    With word_index, the transcript is added to that src/word_index.py
+    database so dictionary changes can find this song again.
+
+    With repeats, repeated sections are transcribed once (src/repetition.py).
+
+    With lyrics (a plain text or LRC file), cuss words are looked up in the
+    text first, so a clean song returns before any model is loaded; otherwise
+    the lyrics are force-aligned instead of transcribed (src/lyrics_align.py).
+
+    With fingerprint_index, a song that duplicates an indexed track (another
+    encode of the same master, see src/fingerprint.py) reuses its transcript
+    at the measured offset, and its stems and synth clips when the two are
+    aligned. New tracks are added to the index.
+
+    With preview (a src/preview.py layout), output_path gets review snippets
+    around each edit instead of the full clean song.
+
+    With dsp, Demucs is skipped: the vocals are suppressed in the input over
+    the cuss regions only (src/dsp_suppress.py). This is much faster but
+    leaves more of the vocal audible, so it is meant for rush jobs.
+
+    With a scheduler (src/scheduler.py), model_size is the best Whisper size
+    allowed and the Whisper size, Demucs shifts and synth backend are picked
+    to meet its latency target given queue_depth; the choices go in the EDL.
+    A plan with 0 shifts means dsp.
+
+    With refine, segment edges are snapped to the vocal stem after separation
+    (src/boundary_refine.py), which makes the smaller Whisper models' word
+    times precise enough. It needs a stem, so it does nothing with dsp.
+    """
+    started = time.perf_counter()
+    audio_seconds = get_audio_duration(input_path)
     print(f"Processing: {input_path}")
-    
+    lines = load_lyrics(lyrics) if lyrics else None
+    if lines is not None and not text_cuss_words(lines):
+        print("No cuss words in the supplied lyrics! Song is already clean.")
+        if word_index:
+            # Indexed with line times (or 0) so a later dictionary change still finds the song.
+            _index_track(word_index, input_path, output_path, lyric_words(lines), model_size, vad, checkpoint_dir,
+                         lyrics, {"use_synth": use_synth, "bitrate": bitrate, "passthrough": passthrough,
+                                  "patch": patch, "stem_format": stem_format, "edl_path": edl_path, "repeats": repeats,
+                                  "dsp": dsp, "refine": refine})
+        if passthrough:
+            return write_unedited(input_path, output_path, bitrate)
+        return None
+    plan = None
+    if scheduler:
+        plan = scheduler.plan(audio_seconds, queue_depth)
+        model_size = plan["whisper"]
+        print(f"Scheduled Whisper {model_size} (estimated {plan['estimated_s']:.0f}s, budget {plan['budget_s']:.0f}s).")
+    checkpoint = SongCheckpoint(checkpoint_dir, input_path, model_size, vad, lyrics) if checkpoint_dir else None
+    if checkpoint and checkpoint.last_completed():
+        print(f"Resuming from checkpoint {checkpoint.dir} (last completed: {checkpoint.last_completed()})")
+
+    duplicate = fingerprints = None
+    fingerprint_key = content_hash(input_path) if fingerprint_index else None
+    if fingerprint_index:
+        fingerprints = FingerprintIndex(fingerprint_index)
+        hashes, frames, duplicate = run_fingerprint(input_path, fingerprints)
+        if duplicate is None and hashes is not None:
+            fingerprints.add_track(fingerprint_key, os.path.abspath(input_path), audio_seconds or 0.0, hashes, frames)
+        elif duplicate is not None:
+            # Only masters are indexed; results are read from the track this one duplicates.
+            fingerprint_key = None
+
     # 1. Transcribe
     print("--- Step 1: Transcription ---")
-    whisper_model = load_whisper_model(args.model_size)
-    lyrics_data = transcribe_audio(whisper_model, input_path)
-    
+    lyrics_data = checkpoint.get("transcription") if checkpoint else None
+    # Only a duplicate checked against its reference audio lends its transcript.
+    verified = duplicate and lines is None and duplicate["differs"] is not None
+    reference_words = duplicate["result"].get("words") if verified else None
+    if lyrics_data is None and reference_words is not None:
+        print(f"Reusing the transcript of {duplicate['input']}.")
+        stems = None
+        lyrics_data = shift_words(reference_words, duplicate["offset_s"], audio_seconds)
+        if duplicate["differs"]:
+            lyrics_data = run_retranscription(input_path, lyrics_data, duplicate["differs"], model_size,
+                                              audio_seconds=audio_seconds)
+        if checkpoint:
+            checkpoint.put("transcription", lyrics_data)
+    elif lyrics_data is None:
+        # Stems reused from an earlier run give the VAD a clean vocal track.
+        stems = run_separation(input_path, skip_separation=True) if vad and skip_separation else None
+        if lines is not None:
+            lyrics_data = run_alignment(
+                input_path, lines, model_size, audio_seconds=audio_seconds, vad=vad, vad_path=stems[0] if stems else None
+            )
+        else:
+            lyrics_data = run_transcription(
+                input_path, model_size, audio_seconds=audio_seconds, vad=vad, vad_path=stems[0] if stems else None,
+                repeats=repeats
+            )
+        if checkpoint:
+            checkpoint.put("transcription", lyrics_data)
+    else:
+        stems = None
+        print("Using checkpointed transcript.")
+    if fingerprint_key:
+        fingerprints.update_result(fingerprint_key, words=lyrics_data)
+    if word_index:
+        _index_track(word_index, input_path, output_path, lyrics_data, model_size, vad, checkpoint_dir, lyrics,
+                     {"use_synth": use_synth, "bitrate": bitrate, "passthrough": passthrough, "patch": patch,
+                      "stem_format": stem_format, "edl_path": edl_path, "repeats": repeats, "dsp": dsp,
+                      "refine": refine})
+
     # 2. Detect Cuss Words
+    # Always re-run (it takes milliseconds) so dictionary changes apply; later
+    # checkpoints are only reused when they were made for the same segments.
     print("--- Step 2: Cuss Word Detection ---")
-    cuss_segments = detect_cuss_words(lyrics_data)
+    cuss_segments = run_detection(lyrics_data)
+    if checkpoint and not segments_match(checkpoint.get("detection") or [], cuss_segments):
+        checkpoint.put("detection", cuss_segments)
     print(f"Found {len(cuss_segments)} cuss words.")
     for seg in cuss_segments:
         print(f"  - {seg['word']} -> {seg['replacement']} ({seg['start']:.2f}s - {seg['end']:.2f}s)")
-        
+
+    shifts = 5
+    if scheduler:
+        plan = scheduler.plan(audio_seconds, queue_depth, time.perf_counter() - started, len(cuss_segments), model_size)
+        shifts = plan["shifts"]
+        dsp = dsp or shifts == 0
+        use_synth = use_synth and plan["synth"] == "xtts"
+        metrics.current().emit("schedule", input=input_path, **plan)
+        if plan["degraded"]:
+            separation = "DSP vocal suppression" if dsp else f"{shifts} Demucs shifts"
+            print(f"Degraded to meet the latency target: {separation}, {plan['synth']} replacements.")
+
     if not cuss_segments:
         print("No cuss words found! Song is already clean.")
-        return
+        if passthrough:
+            return write_unedited(input_path, output_path, bitrate)
+        return None
 
     # 3. Source Separation
     print("--- Step 3: Source Separation ---")
-    if not args.skip_separation:
-        print("Separating vocals and instrumental...")
-        vocals_path, instrumental_path = separate_vocals(input_path)
-    else:
-        # Fallback for testing if files exist
-        filename = os.path.splitext(os.path.basename(input_path))[0]
-        vocals_path = f"data/separated/htdemucs/{filename}/vocals.wav"
-        instrumental_path = f"data/separated/htdemucs/{filename}/no_vocals.wav"
-        if not os.path.exists(vocals_path):
-             print("Error: separation skipped but files not found.")
-             sys.exit(1)
+    saved = checkpoint.get("separation") if checkpoint else None
+    if dsp:
+        # No stems: the mixer suppresses the vocals in the input itself.
+        print("Skipping source separation (DSP vocal suppression).")
+        saved, stems = None, (None, input_path)
+    elif saved:
+        print("Using checkpointed stems.")
+        stems = (saved["vocals"], saved["instrumental"])
+    elif duplicate and duplicate["aligned"] and all(
+            os.path.exists(duplicate["result"].get(stem) or "") for stem in ("vocals", "instrumental")):
+        print(f"Reusing the stems of {duplicate['input']}.")
+        stems = (duplicate["result"]["vocals"], duplicate["result"]["instrumental"])
+    vocals_path, instrumental_path = stems or run_separation(
+        input_path, skip_separation, audio_seconds, stem_format, shifts=shifts
+    )
+    if checkpoint and not saved and not dsp:
+        checkpoint.put(
+            "separation", {"vocals": vocals_path, "instrumental": instrumental_path}, refs=(vocals_path, instrumental_path)
+        )
+    if fingerprint_key and not skip_separation and not dsp:
+        fingerprints.update_result(fingerprint_key, vocals=os.path.abspath(vocals_path),
+                                   instrumental=os.path.abspath(instrumental_path))
+    if refine and vocals_path:
+        # Deterministic for a given stem, so checkpointed synth clips still match.
+        cuss_segments = run_refinement(cuss_segments, vocals_path)
 
     # 4. Voice Synthesis
     print("--- Step 4: Voice Synthesis ---")
-    if args.use_synth:
+    synth_dir = checkpoint.synth_dir if checkpoint else "data/synth"
+    saved = checkpoint.get("synthesis") if checkpoint else None
+    if saved is None and use_synth:
+        saved = _reusable_segments(duplicate, cuss_segments)
+    if saved is not None and segments_match(saved, cuss_segments) and bool(use_synth) == any("synth_path" in s for s in saved):
+        print("Using checkpointed synth clips.")
+        cuss_segments = saved
+    elif use_synth:
         try:
-            synth = VoiceSynthesizer()
-            synth_dir = "data/synth"
-            os.makedirs(synth_dir, exist_ok=True)
-            
-            for i, seg in enumerate(cuss_segments):
-                replacement = seg['replacement']
-                # Unique filename for this instance
-                output_name = f"{replacement}_{i}.wav"
-                output_path = os.path.join(synth_dir, output_name)
-                
-                # Check if already exists to save time (simple caching)
-                if not os.path.exists(output_path):
-                    # Calculate duration of the segment
-                    duration = seg['end'] - seg['start']
-                    
-                    synth.generate_speech(
-                        text=replacement,
-                        speaker_wav=vocals_path, # Use extracted vocals as reference
-                        output_path=output_path,
-                        duration=duration
-                    )
-                
-                # Store the specific path in the segment for the mixer
-                seg['synth_path'] = output_path
-                
+            # Without a vocal stem the full mix is the (noisier) speaker reference.
+            run_synthesis(cuss_segments, vocals_path or input_path, synth_dir=synth_dir)
+            if checkpoint:
+                checkpoint.put("synthesis", cuss_segments, refs=[seg.get("synth_path") for seg in cuss_segments])
+            if fingerprint_key:
+                fingerprints.update_result(fingerprint_key, segments=cuss_segments)
         except Exception as e:
             print(f"Warning: Voice synthesis failed or not set up correctly: {e}")
             print("Proceeding with instrumental-only replacement (silence for cuss words).")
     else:
         print("Voice synthesis disabled. Using silence for cuss words.")
+        if checkpoint:
+            checkpoint.put("synthesis", cuss_segments)
+
+    edl_path = edl_path or default_edl_path(output_path)
+    edl = build_edl(input_path, cuss_segments, vocals_path, instrumental_path, synth_dir=synth_dir, schedule=plan, dsp=dsp)
+    save_edl(edl, edl_path)
+    print(f"Edit decision list saved to: {edl_path}")
+    if checkpoint:
+        checkpoint.put("edl", {"path": os.path.abspath(edl_path)}, refs=(edl_path,))
+
+    if preview:
+        print("--- Step 5: Preview ---")
+        return render_preview(edl, output_path, layout=preview, bitrate=bitrate)
 
     # 5. Mixing
     print("--- Step 5: Mixing ---")
-    create_clean_version(
-        original_audio_path=input_path,
-        instrumental_path=instrumental_path,
-        cuss_segments=cuss_segments,
-        vocals_path=vocals_path,
-        output_path=args.output
+    output = run_mixing(
+        input_path,
+        output_path,
+        cuss_segments,
+        vocals_path,
+        instrumental_path,
+        audio_seconds=audio_seconds,
+        bitrate=bitrate,
+        passthrough=passthrough,
+        patch=patch,
+        synth_dir=synth_dir,
+        dsp=dsp
     )
-    
-    print(f"Done! Clean version saved to: {args.output}")
+    if checkpoint:
+        checkpoint.put("mixing", {"output": os.path.abspath(output)}, refs=(output,))
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CleanMusic: AI-powered song censorship.")
+    parser.add_argument("--input", required=True, help="Path to the input audio file.")
+    parser.add_argument("--output", default="data/clean_song.mp3", help="Path to the output clean audio. The format (wav, flac, mp3, m4a/aac, opus) follows the extension.")
+    parser.add_argument("--bitrate", default=None, help="Bitrate for lossy output, e.g. 192k (default depends on format).")
+    parser.add_argument("--passthrough", action="store_true", help="Copy unedited audio from the input where the format allows, and write clean songs unchanged.")
+    parser.add_argument("--patch", action="store_true", help="Patch a copy of the input, regenerating only the edited regions (same format as the input).")
+    parser.add_argument("--stem_format", default="stem", choices=["stem", "stem16", "wav"], help="How separated stems are stored: memory-mappable float32 (stem) or int16 (stem16) files, or wav.")
+    parser.add_argument("--vad", action="store_true", help="Only transcribe sections with vocals (voice activity detection).")
+    parser.add_argument("--reuse_repeats", action="store_true", help="Transcribe repeated sections (e.g. choruses) once and reuse the words.")
+    parser.add_argument("--lyrics", default=None, help="Known lyrics (plain text or .lrc): detect on the text and force-align instead of transcribing.")
+    parser.add_argument("--fingerprint_index", default=None, help="Reuse results of earlier encodes of the same song found in this fingerprint index (see src/fingerprint.py).")
+    parser.add_argument("--preview", nargs="?", const="sequential", default=None, choices=PREVIEW_LAYOUTS, help="Write review snippets around each edit (original then clean, or 'split' left/right) instead of the full song.")
+    parser.add_argument("--checkpoint_dir", default=None, help="Checkpoint every stage here and resume from the last completed one on rerun.")
+    parser.add_argument("--word_index", default=None, help="Add the transcript to this word index (see src/word_index.py).")
+    parser.add_argument("--edl", default=None, help="Where to save the edit decision list (default: <output>.edl.json).")
+    parser.add_argument("--model_size", default="base", help="Whisper model size (tiny, base, small, medium, large).")
+    parser.add_argument("--latency_target", type=float, default=None, help="Seconds the song should take; picks cheaper models/settings to meet it (--model_size is the best allowed).")
+    parser.add_argument("--min_model_size", default="tiny", help="Smallest Whisper model the latency target may fall back to.")
+    parser.add_argument("--queue_depth", type=int, default=0, help="Songs waiting behind this one, for --latency_target.")
+    parser.add_argument("--cost_metrics", nargs="*", default=None, help="Metrics JSONL files to fit stage costs from (default: --metrics_file).")
+    parser.add_argument("--dsp_suppress", action="store_true", help="Skip Demucs and suppress vocals with cheap DSP over the cuss regions only (fast, lower quality).")
+    parser.add_argument("--allow_dsp", action="store_true", help="Let --latency_target fall back to DSP vocal suppression as its cheapest plan.")
+    parser.add_argument("--refine_boundaries", action="store_true", help="Snap cuss word edges to the separated vocal stem (fixes Whisper timestamps that are 50-150 ms off).")
+    parser.add_argument("--skip_separation", action="store_true", help="Skip source separation (for testing mixing only).")
+    parser.add_argument(
+        "--use_synth",
+        action="store_true",
+        help="Enable voice synthesis for cuss words."
+    )
+    parser.add_argument(
+        "--no_use_synth",
+        dest="use_synth",
+        action="store_false",
+        help="Disable voice synthesis."
+    )
+    parser.add_argument("--metrics_file", default=None, help="Append per-stage metrics as JSON lines to this file.")
+    parser.add_argument("--log_level", default="WARNING", help="Logging level (DEBUG, INFO, WARNING, ERROR).")
+    parser.set_defaults(use_synth=True)
+
+
+    args = parser.parse_args()
+    metrics.configure_logging(args.log_level)
+
+    input_path = args.input
+    if not os.path.exists(input_path):
+        print(f"Error: Input file not found: {input_path}")
+        sys.exit(1)
+
+    scheduler = None
+    if args.latency_target:
+        cost_files = args.cost_metrics if args.cost_metrics is not None else [args.metrics_file] if args.metrics_file else []
+        try:
+            scheduler = Scheduler(
+                args.latency_target,
+                CostModel.from_metrics(path for path in cost_files if os.path.exists(path)),
+                max_model_size=args.model_size,
+                min_model_size=args.min_model_size,
+                use_synth=args.use_synth,
+                allow_dsp=args.allow_dsp
+            )
+        except ValueError as e:
+            parser.error(str(e))
+
+    run_metrics = metrics.PipelineMetrics(sink_path=args.metrics_file)
+    previous = metrics.activate(run_metrics)
+    try:
+        with run_metrics.stage("total", audio_seconds=get_audio_duration(input_path), input=input_path):
+            output_path = process_song(
+                input_path,
+                args.output,
+                model_size=args.model_size,
+                use_synth=args.use_synth,
+                skip_separation=args.skip_separation,
+                bitrate=args.bitrate,
+                passthrough=args.passthrough,
+                patch=args.patch,
+                stem_format=args.stem_format,
+                edl_path=args.edl,
+                vad=args.vad,
+                checkpoint_dir=args.checkpoint_dir,
+                word_index=args.word_index,
+                scheduler=scheduler,
+                queue_depth=args.queue_depth,
+                repeats=args.reuse_repeats,
+                lyrics=args.lyrics,
+                fingerprint_index=args.fingerprint_index,
+                preview=args.preview,
+                dsp=args.dsp_suppress,
+                refine=args.refine_boundaries
+            )
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        run_metrics.emit_summary()
+        metrics.activate(previous)
+
+    if output_path and not args.preview:
+        print(f"Done! Clean version saved to: {args.output}")
 
 if __name__ == "__main__":
     main()
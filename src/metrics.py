@@ -0,0 +1,153 @@
+# src/metrics.py
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def configure_logging(level: str = "WARNING"):
+    """
+    Configures leveled logging for the whole package. Debug output is off by
+    default; pass --log_level DEBUG on the command line to see the per-segment
+    mixer traces.
+    """
+    logging.basicConfig(
+        level=getattr(logging, str(level).upper(), logging.WARNING),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Returns the peak resident set size of this process in MiB, if available."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in KiB on Linux.
+        if sys.platform == "darwin":
+            return peak / (1024 * 1024)
+        return peak / 1024
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+
+
+class PipelineMetrics:
+    """
+    Collects per-stage timings and cache statistics for one run and emits
+    them as JSON lines. Stage totals are kept for the summary at the end of
+    the run. Every record is also kept in memory unless keep_records is
+    False, which long-running processes (the job server, queue workers) use
+    so memory doesn't grow with every job; their records are in the sink.
+    """
+
+    def __init__(self, sink_path: Optional[str] = None, run_id: Optional[str] = None, keep_records: bool = True):
+        self.sink_path = sink_path
+        self.run_id = run_id or f"{int(time.time())}-{os.getpid()}"
+        self.keep_records = keep_records
+        self.records = []
+        self.stage_totals: Dict[str, Dict[str, float]] = {}
+        self.cache_stats: Dict[str, Dict[str, int]] = {}
+
+    def emit(self, event: str, **fields) -> Dict:
+        record = {"event": event, "run_id": self.run_id, "time": time.time()}
+        record.update(fields)
+        if self.keep_records:
+            self.records.append(record)
+        if event == "stage":
+            entry = self.stage_totals.setdefault(record["stage"], {"wall_s": 0.0, "cpu_s": 0.0, "calls": 0})
+            entry["wall_s"] += record["wall_s"]
+            entry["cpu_s"] += record["cpu_s"]
+            entry["calls"] += 1
+        if self.sink_path:
+            sink_dir = os.path.dirname(self.sink_path)
+            if sink_dir:
+                os.makedirs(sink_dir, exist_ok=True)
+            with open(self.sink_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        logger.debug("metrics: %s", record)
+        return record
+
+    @contextmanager
+    def stage(self, name: str, audio_seconds: Optional[float] = None, **fields):
+        """
+        Times a pipeline stage. The yielded dict can be updated inside the block
+        (e.g. with audio_seconds once the duration is known).
+        """
+        extra = dict(fields)
+        if audio_seconds is not None:
+            extra["audio_seconds"] = audio_seconds
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        status = "ok"
+        try:
+            yield extra
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            wall = time.perf_counter() - wall_start
+            record = {
+                "stage": name,
+                "status": status,
+                "wall_s": round(wall, 6),
+                "cpu_s": round(time.process_time() - cpu_start, 6),
+                "peak_rss_mb": peak_rss_mb(),
+            }
+            record.update(extra)
+            seconds = record.get("audio_seconds")
+            if seconds and wall > 0:
+                record["audio_s_per_s"] = round(seconds / wall, 3)
+            self.emit("stage", **record)
+
+    def cache(self, name: str, hit: bool):
+        stats = self.cache_stats.setdefault(name, {"hits": 0, "misses": 0})
+        stats["hits" if hit else "misses"] += 1
+
+    def summary(self) -> Dict:
+        stages = {name: dict(entry) for name, entry in self.stage_totals.items()}
+        caches = {}
+        for name, stats in self.cache_stats.items():
+            total = stats["hits"] + stats["misses"]
+            caches[name] = dict(stats, hit_rate=stats["hits"] / total if total else 0.0)
+        return {"stages": stages, "caches": caches, "peak_rss_mb": peak_rss_mb()}
+
+    def emit_summary(self) -> Dict:
+        return self.emit("summary", **self.summary())
+
+
+class _NullMetrics(PipelineMetrics):
+    """Metrics sink used when nothing is being recorded; keeps call sites unconditional."""
+
+    def emit(self, event: str, **fields) -> Dict:
+        return {}
+
+    def cache(self, name: str, hit: bool):
+        pass
+
+
+_active: PipelineMetrics = _NullMetrics()
+
+
+def current() -> PipelineMetrics:
+    """Returns the metrics recorder for the running pipeline (a no-op one by default)."""
+    return _active
+
+
+def activate(metrics: Optional[PipelineMetrics]) -> PipelineMetrics:
+    """Installs metrics as the process-wide recorder and returns the previous one."""
+    global _active
+    previous = _active
+    _active = metrics if metrics is not None else _NullMetrics()
+    return previous
@@ -1,10 +1,25 @@
 # src/mixer.py
+import logging
 import os
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+import soundfile as sf
 from pydub import AudioSegment
 
-from src.audio_utils import load_audio, save_audio
+from src import metrics
+from src.audio_utils import fit_frames, load_audio, resample_array, save_audio
+from src.dsp_suppress import N_FFT as DSP_CONTEXT
+from src.dsp_suppress import suppress_vocals
+from src.encoder import encode_audio
+from src.patcher import changed_sample_ranges, patch_file
+from src.stem_store import is_stem_path, open_stem
+
+# Attenuation of the instrumental inside cuss regions when there is no vocal
+# stem, to drop any residual bleed substantially.
+FALLBACK_ATTENUATION_DB = 15
+
+logger = logging.getLogger(__name__)
 
 
 def _segment_bounds(segment: Dict) -> Tuple[int, int]:
@@ -25,6 +40,7 @@ def _load_synth_clip(
     if not synth_path or not os.path.exists(synth_path):
         return None
 
+    metrics.current().cache("mixer_synth_clip", synth_path in cache)
     if synth_path not in cache:
         cache[synth_path] = load_audio(synth_path)
 
@@ -48,14 +64,16 @@ def _build_clean_vocals(vocals: AudioSegment, cuss_segments: List[Dict], synth_d
     for i, seg in enumerate(cuss_segments):
         start_ms, end_ms = _segment_bounds(seg)
         duration = end_ms - start_ms
-        print(f"\nDEBUG: --- Vocal Segment {i+1}/{len(cuss_segments)} ---")
-        print(f"DEBUG: Original word '{seg.get('word')}' mapped to '{seg.get('replacement')}'")
-        print(f"DEBUG: Muting vocals from {start_ms}ms to {end_ms}ms (duration {duration}ms)")
+        logger.debug(
+            "Vocal segment %d/%d: '%s' -> '%s', muting %dms-%dms (duration %dms)",
+            i + 1, len(cuss_segments), seg.get('word'), seg.get('replacement'),
+            start_ms, end_ms, duration
+        )
 
         if start_ms > current_pos:
             safe_chunk = vocals[current_pos:start_ms]
             clean_vocals += safe_chunk
-            print(f"DEBUG: Added {len(safe_chunk)}ms of safe vocals before the cuss word.")
+            logger.debug("Added %dms of safe vocals before the cuss word.", len(safe_chunk))
 
         if duration <= 0:
             current_pos = end_ms
@@ -71,8 +89,8 @@ def _build_clean_vocals(vocals: AudioSegment, cuss_segments: List[Dict], synth_d
 
     remaining = vocals[current_pos:]
     clean_vocals += remaining
-    print(f"DEBUG: Added {len(remaining)}ms of tail vocals after last cuss word.")
-    print(f"DEBUG: Clean vocals total length: {len(clean_vocals)}ms")
+    logger.debug("Added %dms of tail vocals after last cuss word.", len(remaining))
+    logger.debug("Clean vocals total length: %dms", len(clean_vocals))
     return clean_vocals
 
 
@@ -93,8 +111,10 @@ def _fallback_mix(
     for i, seg in enumerate(cuss_segments):
         start_ms, end_ms = _segment_bounds(seg)
         duration = end_ms - start_ms
-        print(f"\nDEBUG: --- Fallback Segment {i+1}/{len(cuss_segments)} ---")
-        print(f"DEBUG: Muting original audio from {start_ms}ms to {end_ms}ms")
+        logger.debug(
+            "Fallback segment %d/%d: muting original audio from %dms to %dms",
+            i + 1, len(cuss_segments), start_ms, end_ms
+        )
 
         if start_ms > current_pos:
             safe_section = original[current_pos:start_ms]
@@ -108,7 +128,7 @@ def _fallback_mix(
         if len(inst_slice) < duration:
             inst_slice += AudioSegment.silent(duration - len(inst_slice))
 
-        replacement = inst_slice - 15  # drop any residual bleed substantially
+        replacement = inst_slice - FALLBACK_ATTENUATION_DB
         synth_clip = _load_synth_clip(seg, synth_dir, duration, synth_cache)
         if synth_clip:
             replacement = replacement.overlay(synth_clip)
@@ -126,29 +146,39 @@ def create_clean_version(
     cuss_segments,
     vocals_path: Optional[str] = None,
     synth_dir: str = "data/synth",
-    output_path: str = "data/clean_song.mp3"
+    output_path: str = "data/clean_song.mp3",
+    bitrate: Optional[str] = None,
+    passthrough: bool = False,
+    dsp: bool = False
 ):
     """
     Builds a clean song by muting the separated vocal stem over cuss regions,
     optionally overlaying synthesized replacements, and then re-mixing with the
-    instrumental stem.
+    instrumental stem. With passthrough, frames outside the cuss regions are
+    copied from the original file instead of the stem re-mix where possible.
+    With dsp there are no stems: the vocals are suppressed in the original
+    mix over the cuss regions only (see src/dsp_suppress.py).
     """
     print("Mixing clean version...")
-    print(f"DEBUG: Number of cuss segments to process: {len(cuss_segments)}")
-    print(f"DEBUG: Original audio path: {original_audio_path}")
-    print(f"DEBUG: Instrumental path: {instrumental_path}")
-    if vocals_path:
-        print(f"DEBUG: Vocals path: {vocals_path}")
-    print(f"DEBUG: Output path: {output_path}")
+    if dsp or (is_stem_path(instrumental_path) and is_stem_path(vocals_path) and os.path.exists(vocals_path)):
+        return _create_clean_from_stems(
+            original_audio_path, instrumental_path, cuss_segments, vocals_path,
+            synth_dir, output_path, bitrate, passthrough, dsp=dsp
+        )
+    logger.debug("Number of cuss segments to process: %d", len(cuss_segments))
+    logger.debug("Original audio path: %s", original_audio_path)
+    logger.debug("Instrumental path: %s", instrumental_path)
+    logger.debug("Vocals path: %s", vocals_path)
+    logger.debug("Output path: %s", output_path)
 
     original = load_audio(original_audio_path)
     instrumental = load_audio(instrumental_path)
     vocals = load_audio(vocals_path) if vocals_path and os.path.exists(vocals_path) else None
 
-    print(f"DEBUG: Original audio length: {len(original)}ms")
-    print(f"DEBUG: Instrumental audio length: {len(instrumental)}ms")
+    logger.debug("Original audio length: %dms", len(original))
+    logger.debug("Instrumental audio length: %dms", len(instrumental))
     if vocals:
-        print(f"DEBUG: Vocals audio length: {len(vocals)}ms")
+        logger.debug("Vocals audio length: %dms", len(vocals))
 
     cuss_segments.sort(key=lambda x: x['start'])
 
@@ -156,10 +186,264 @@ def create_clean_version(
         clean_vocals = _build_clean_vocals(vocals, cuss_segments, synth_dir)
         final_audio = instrumental.overlay(clean_vocals)
     else:
-        print("WARNING: Vocals track missing, falling back to destructive mute in the original mix.")
+        logger.warning("Vocals track missing, falling back to destructive mute in the original mix.")
         final_audio = _fallback_mix(original, instrumental, cuss_segments, synth_dir)
 
-    print(f"DEBUG: Final audio total length: {len(final_audio)}ms")
-    save_audio(final_audio, output_path)
-    print(f"DEBUG: Saved final audio to: {output_path}")
+    logger.debug("Final audio total length: %dms", len(final_audio))
+    changed_ranges = None
+    if passthrough:
+        rate = final_audio.frame_rate
+        changed_ranges = [
+            (start_ms * rate // 1000, end_ms * rate // 1000)
+            for start_ms, end_ms in map(_segment_bounds, cuss_segments)
+        ]
+    with metrics.current().stage("mixing.encode", audio_seconds=len(final_audio) / 1000.0):
+        save_audio(
+            final_audio,
+            output_path,
+            bitrate=bitrate,
+            passthrough_from=original_audio_path if passthrough else None,
+            changed_ranges=changed_ranges
+        )
+    logger.debug("Saved final audio to: %s", output_path)
+    return output_path
+
+
+def _read_region(path: str, start: int, stop: int, sample_rate: int, channels: int) -> np.ndarray:
+    """
+    Reads [start, stop) of an audio file at sample_rate, resampling only that
+    slice if needed. Float32 .stem files at the same rate come back as views.
+    """
+    if is_stem_path(path):
+        stem = open_stem(path)
+        if stem.sample_rate == sample_rate:
+            data = stem.read(start, stop)
+        else:
+            ratio = stem.sample_rate / sample_rate
+            data = stem.read(int(start * ratio), int(np.ceil(stop * ratio)) + 1)
+            data = resample_array(data, stem.sample_rate, sample_rate)
+        return fit_frames(data, stop - start, channels)
+
+    info = sf.info(path)
+    if info.samplerate == sample_rate:
+        data, _ = sf.read(path, start=start, stop=stop, dtype="float32", always_2d=True)
+    else:
+        ratio = info.samplerate / sample_rate
+        data, _ = sf.read(
+            path, start=int(start * ratio), stop=int(np.ceil(stop * ratio)) + 1,
+            dtype="float32", always_2d=True
+        )
+        data = resample_array(data, info.samplerate, sample_rate)
+    return fit_frames(data, stop - start, channels)
+
+
+def _load_synth_array(
+    seg: Dict,
+    synth_dir: str,
+    sample_rate: int,
+    channels: int,
+    cache: Dict[str, np.ndarray]
+) -> Optional[np.ndarray]:
+    replacement_word = seg.get('replacement', 'clean')
+    synth_path = seg.get('synth_path') or os.path.join(synth_dir, f"{replacement_word}.wav")
+    if not synth_path or not os.path.exists(synth_path):
+        return None
+
+    metrics.current().cache("mixer_synth_clip", synth_path in cache)
+    if synth_path not in cache:
+        data, rate = sf.read(synth_path, dtype="float32", always_2d=True)
+        data = resample_array(data, rate, sample_rate)
+        cache[synth_path] = fit_frames(data, len(data), channels)
+    return cache[synth_path]
+
+
+def _fade_weights(seg_start: int, seg_stop: int, lo: int, hi: int, fade: int) -> np.ndarray:
+    """Per-sample weight of the replacement: linear ramps at both edges of the segment."""
+    if fade <= 0:
+        return np.ones(hi - lo, dtype=np.float32)
+    pos = np.arange(lo, hi, dtype=np.float32) + 0.5
+    ramp = np.minimum(pos - seg_start, seg_stop - pos) / fade
+    return np.clip(ramp, 0.0, 1.0).astype(np.float32)
+
+
+def render_clean_region(
+    start: int,
+    stop: int,
+    original: np.ndarray,
+    sample_rate: int,
+    cuss_segments: List[Dict],
+    instrumental_path: str,
+    has_vocals: bool = True,
+    synth_dir: str = "data/synth",
+    synth_cache: Optional[Dict[str, np.ndarray]] = None,
+    fade_ms: float = 0,
+    dsp: bool = False
+) -> np.ndarray:
+    """
+    Renders the clean samples for [start, stop) of the song as a float buffer.
+    Inside each cuss region the vocals are replaced by silence (plus the synth
+    clip, if any) over the instrumental stem; everything else is the original.
+    Segments may carry their own 'fade_ms' (edge crossfade) and 'gain_db'
+    (synth clip gain).
+
+    With dsp there is no stem: instrumental_path is the original mix, and
+    the vocals are suppressed in it with src/dsp_suppress.py.
+    """
+    synth_cache = {} if synth_cache is None else synth_cache
+    channels = original.shape[1]
+    out = np.array(original, dtype=np.float32, copy=True)
+    gain = 1.0 if has_vocals or dsp else 10 ** (-FALLBACK_ATTENUATION_DB / 20)
+    instrumental = None
+
+    for seg in cuss_segments:
+        start_ms, end_ms = _segment_bounds(seg)
+        seg_start = start_ms * sample_rate // 1000
+        seg_stop = end_ms * sample_rate // 1000
+        lo, hi = max(seg_start, start), min(seg_stop, stop)
+        if hi <= lo:
+            continue
+        if instrumental is None and dsp:
+            # Read a frame of context on both sides so the STFT has no edge effects.
+            context = DSP_CONTEXT if start >= DSP_CONTEXT else start
+            region = _read_region(instrumental_path, start - context, stop + DSP_CONTEXT, sample_rate, channels)
+            instrumental = suppress_vocals(region, sample_rate)[context:context + stop - start]
+        elif instrumental is None:
+            instrumental = _read_region(instrumental_path, start, stop, sample_rate, channels)
+
+        replacement = instrumental[lo - start:hi - start] * gain
+        clip = _load_synth_array(seg, synth_dir, sample_rate, channels, synth_cache)
+        if clip is not None:
+            clip = clip[lo - seg_start:hi - seg_start] * np.float32(10 ** (seg.get('gain_db', 0.0) / 20))
+            replacement[:len(clip)] += clip
+
+        fade = int(seg.get('fade_ms', fade_ms) * sample_rate / 1000)
+        weights = _fade_weights(seg_start, seg_stop, lo, hi, fade)[:, None]
+        region = out[lo - start:hi - start]
+        out[lo - start:hi - start] = region + (replacement - region) * weights
+    return out
+
+
+def patch_clean_version(
+    original_audio_path: str,
+    instrumental_path: str,
+    cuss_segments,
+    vocals_path: Optional[str] = None,
+    synth_dir: str = "data/synth",
+    output_path: str = "data/clean_song.mp3",
+    fade_ms: float = 0,
+    dsp: bool = False
+):
+    """
+    Writes the clean song by patching a copy of the original file: only the
+    samples overlapping cuss regions are regenerated (see src.patcher), so a
+    mostly clean song costs O(edits) instead of a full re-encode. The output
+    must use the same container as the input.
+    """
+    print("Patching clean version...")
+    try:
+        info = sf.info(original_audio_path)
+        sample_rate, total_frames = info.samplerate, info.frames
+    except RuntimeError:
+        sample_rate, total_frames = load_audio(original_audio_path).frame_rate, None
+
+    cuss_segments.sort(key=lambda x: x['start'])
+    ranges = changed_sample_ranges(cuss_segments, sample_rate, total_frames)
+    logger.debug("Patching %d sample ranges: %s", len(ranges), ranges)
+
+    has_vocals = bool(vocals_path and os.path.exists(vocals_path))
+    synth_cache: Dict[str, np.ndarray] = {}
+
+    def render(start, stop, original):
+        return render_clean_region(
+            start, stop, original, sample_rate, cuss_segments, instrumental_path,
+            has_vocals=has_vocals, synth_dir=synth_dir, synth_cache=synth_cache, fade_ms=fade_ms, dsp=dsp
+        )
+
+    edited_seconds = sum(stop - start for start, stop in ranges) / sample_rate
+    with metrics.current().stage("mixing.patch", audio_seconds=edited_seconds, ranges=len(ranges)):
+        patch_file(original_audio_path, output_path, ranges, render)
+    return output_path
+
+
+def _audio_info(path: str) -> Tuple[int, int, int]:
+    """(sample_rate, frames, channels) of a .stem or soundfile-readable file."""
+    if is_stem_path(path):
+        stem = open_stem(path)
+        return stem.sample_rate, stem.frames, stem.channels
+    info = sf.info(path)
+    return info.samplerate, info.frames, info.channels
+
+
+def render_clean_array(
+    original_audio_path: str,
+    instrumental_path: str,
+    cuss_segments,
+    vocals_path: Optional[str] = None,
+    synth_dir: str = "data/synth",
+    fade_ms: float = 0,
+    dsp: bool = False
+) -> Tuple[np.ndarray, int, List[Tuple[int, int]]]:
+    """
+    Float-buffer version of create_clean_version. The stems are summed into one
+    buffer (read from memory-mapped .stem files where possible) and only the
+    cuss regions are re-rendered. Without a vocal stem the original mix is used
+    as the base, as in _fallback_mix; with dsp, it is also the source the
+    vocals are suppressed from (see render_clean_region).
+    Returns (samples, sample_rate, changed sample ranges).
+    """
+    if dsp:
+        instrumental_path = original_audio_path
+    sample_rate, frames, channels = _audio_info(instrumental_path)
+    has_vocals = not dsp and bool(vocals_path and os.path.exists(vocals_path))
+    if has_vocals:
+        final_audio = np.array(_read_region(instrumental_path, 0, frames, sample_rate, channels), dtype=np.float32)
+        final_audio += _read_region(vocals_path, 0, frames, sample_rate, channels)
+    else:
+        final_audio = np.array(_read_region(original_audio_path, 0, frames, sample_rate, channels), dtype=np.float32)
+
+    cuss_segments.sort(key=lambda x: x['start'])
+    synth_cache: Dict[str, np.ndarray] = {}
+    changed_ranges = []
+    for seg in cuss_segments:
+        start_ms, end_ms = _segment_bounds(seg)
+        start = min(len(final_audio), start_ms * sample_rate // 1000)
+        stop = min(len(final_audio), end_ms * sample_rate // 1000)
+        if stop <= start:
+            continue
+        final_audio[start:stop] = render_clean_region(
+            start, stop, final_audio[start:stop], sample_rate, [seg], instrumental_path,
+            has_vocals=has_vocals, synth_dir=synth_dir, synth_cache=synth_cache, fade_ms=fade_ms, dsp=dsp
+        )
+        changed_ranges.append((start, stop))
+    return final_audio, sample_rate, changed_ranges
+
+
+def _create_clean_from_stems(
+    original_audio_path: str,
+    instrumental_path: str,
+    cuss_segments,
+    vocals_path: str,
+    synth_dir: str,
+    output_path: str,
+    bitrate: Optional[str],
+    passthrough: bool,
+    dsp: bool = False
+):
+    """
+    create_clean_version for memory-mapped stems (or DSP suppression): the two
+    stems are summed straight from their mappings and only the cuss regions
+    are re-rendered, without decoding anything through pydub.
+    """
+    final_audio, sample_rate, changed_ranges = render_clean_array(
+        original_audio_path, instrumental_path, cuss_segments, vocals_path, synth_dir, dsp=dsp
+    )
+    with metrics.current().stage("mixing.encode", audio_seconds=len(final_audio) / sample_rate):
+        encode_audio(
+            final_audio,
+            sample_rate,
+            output_path,
+            bitrate=bitrate,
+            passthrough_from=original_audio_path if passthrough else None,
+            changed_ranges=changed_ranges if passthrough else None
+        )
     return output_path
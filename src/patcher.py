@@ -0,0 +1,424 @@
+# src/patcher.py
+"""
+Surgical output: instead of re-encoding the whole song, copy the original file
+and regenerate only the sample ranges that overlap cuss regions.
+
+WAV-like containers are patched by overwriting samples in place, FLAC by
+rewriting samples block-wise, and MP3 by splicing freshly encoded frames over
+the affected frame span.
+"""
+import logging
+import os
+import shutil
+import struct
+import subprocess
+import sys
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from src.encoder import _ffmpeg_binary, infer_format
+
+logger = logging.getLogger(__name__)
+
+# Containers libsndfile can open in read/write mode for in-place sample overwrite.
+IN_PLACE_FORMATS = {"WAV", "WAVEX", "W64", "RF64", "AIFF", "CAF"}
+
+# Renders the clean samples for [start, stop) given the original samples there.
+RegionRenderer = Callable[[int, int, np.ndarray], np.ndarray]
+
+
+def changed_sample_ranges(
+    cuss_segments: Sequence[Dict],
+    sample_rate: int,
+    total_frames: Optional[int] = None,
+    margin_ms: int = 20
+) -> List[Tuple[int, int]]:
+    """Returns sorted, merged [start, stop) sample ranges covering every segment plus a margin."""
+    if total_frames is None:
+        total_frames = sys.maxsize
+    margin = margin_ms * sample_rate // 1000
+    ranges = []
+    for seg in cuss_segments:
+        start_ms = max(0, int(seg['start'] * 1000))
+        end_ms = max(start_ms, int(seg['end'] * 1000))
+        start = max(0, start_ms * sample_rate // 1000 - margin)
+        stop = min(total_frames, end_ms * sample_rate // 1000 + margin)
+        if stop > start:
+            ranges.append((start, stop))
+
+    merged: List[Tuple[int, int]] = []
+    for start, stop in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+
+def can_patch(input_path: str, output_path: str) -> bool:
+    """Patching needs the output to stay in the input's container."""
+    fmt = infer_format(input_path, default="")
+    return fmt in ("wav", "flac", "mp3") and fmt == infer_format(output_path)
+
+
+def _patch_pcm(original_path: str, output_path: str, ranges: List[Tuple[int, int]], render: RegionRenderer):
+    info = sf.info(original_path)
+    if info.format in IN_PLACE_FORMATS:
+        if os.path.abspath(original_path) != os.path.abspath(output_path):
+            shutil.copyfile(original_path, output_path)
+        with sf.SoundFile(output_path, "r+") as f:
+            for start, stop in ranges:
+                f.seek(start)
+                original = f.read(stop - start, dtype="float32", always_2d=True)
+                f.seek(start)
+                f.write(np.clip(render(start, stop, original), -1.0, 1.0))
+        return
+
+    # Compressed lossless (FLAC): libsndfile can't seek-and-write, so stream the
+    # samples through and overwrite the edited ranges on the way.
+    tmp_path = output_path + ".patch.tmp"
+    with sf.SoundFile(original_path) as src, sf.SoundFile(
+        tmp_path, "w", samplerate=src.samplerate, channels=src.channels,
+        format=src.format, subtype=src.subtype
+    ) as dst:
+        pos = 0
+        for start, stop in ranges:
+            while pos < start:
+                block = src.read(min(1 << 16, start - pos), dtype="float32", always_2d=True)
+                dst.write(block)
+                pos += len(block)
+            original = src.read(stop - start, dtype="float32", always_2d=True)
+            dst.write(np.clip(render(start, stop, original), -1.0, 1.0))
+            pos = stop
+        for block in src.blocks(blocksize=1 << 16, dtype="float32", always_2d=True):
+            dst.write(block)
+    os.replace(tmp_path, output_path)
+
+
+# --- MP3 -----------------------------------------------------------------
+
+_MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+# LAME encoder delay plus the MP3 decoder's own 529-sample delay.
+LAME_ENCODER_DELAY = 576
+DECODER_DELAY = 529
+# Frames re-encoded before an edit so the encoder's start-up is thrown away.
+PREROLL_FRAMES = 3
+# How far past an edit we look for a clean splice point when the borrowed
+# reservoir bytes don't fit into the last re-encoded frame.
+MAX_RESERVOIR_SEARCH = 400
+
+
+class Mp3Frame:
+    __slots__ = (
+        "offset", "size", "bitrate_index", "bitrate", "sample_rate", "channels", "samples",
+        "mpeg1", "protected", "side_offset", "side_len", "main_data_begin", "is_info",
+    )
+
+    def __init__(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+
+    @property
+    def payload_offset(self) -> int:
+        return self.side_offset + self.side_len
+
+    @property
+    def payload_len(self) -> int:
+        return self.offset + self.size - self.payload_offset
+
+
+def _skip_id3v2(data: bytes) -> int:
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _parse_frame(data: bytes, offset: int) -> Optional[Mp3Frame]:
+    if offset + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[offset:offset + 4]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 3
+    layer = (b1 >> 1) & 3
+    bitrate_idx = b2 >> 4
+    rate_idx = (b2 >> 2) & 3
+    if version == 1 or layer != 1 or bitrate_idx in (0, 15) or rate_idx == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _MP3_BITRATES[1 if mpeg1 else 2][bitrate_idx] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][rate_idx]
+    padding = (b2 >> 1) & 1
+    channels = 1 if (b3 >> 6) == 3 else 2
+    size = (144 if mpeg1 else 72) * bitrate // sample_rate + padding
+
+    protected = not (b1 & 1)
+    side = offset + 4 + (2 if protected else 0)
+    side_len = (32 if channels == 2 else 17) if mpeg1 else (17 if channels == 2 else 9)
+    if side + side_len > len(data):
+        return None
+    word = (data[side] << 8) | data[side + 1]
+    main_data_begin = word >> 7 if mpeg1 else word >> 8
+
+    tag = data[side + side_len:side + side_len + 4]
+    return Mp3Frame(
+        offset=offset, size=size, bitrate_index=bitrate_idx, bitrate=bitrate,
+        sample_rate=sample_rate, channels=channels, samples=1152 if mpeg1 else 576,
+        mpeg1=mpeg1, protected=protected, side_offset=side, side_len=side_len,
+        main_data_begin=main_data_begin, is_info=tag in (b"Xing", b"Info"),
+    )
+
+
+def parse_mp3_frames(data: bytes) -> Tuple[List[Mp3Frame], Optional[Mp3Frame]]:
+    """Returns (audio frames, Xing/Info frame or None)."""
+    frames = []
+    info = None
+    offset = _skip_id3v2(data)
+    while offset + 4 <= len(data):
+        frame = _parse_frame(data, offset)
+        if frame is None:
+            if data[offset:offset + 3] == b"TAG":  # ID3v1 trailer
+                break
+            offset += 1
+            continue
+        if frame.is_info and not frames and info is None:
+            info = frame
+        else:
+            frames.append(frame)
+        offset += frame.size
+    return frames, info
+
+
+def _lame_delay(data: bytes, info: Optional[Mp3Frame]) -> Optional[int]:
+    """Encoder delay stored in the LAME extension of the Info frame, if any."""
+    if info is None:
+        return None
+    body = data[info.offset:info.offset + info.size]
+    tag = max(body.find(b"Xing"), body.find(b"Info"))
+    flags = struct.unpack(">I", body[tag + 4:tag + 8])[0]
+    pos = tag + 8 + (4 if flags & 1 else 0) + (4 if flags & 2 else 0) + (100 if flags & 4 else 0) + (4 if flags & 8 else 0)
+    if pos + 24 > len(body):
+        return None
+    return (body[pos + 21] << 4) | (body[pos + 22] >> 4)
+
+
+def _main_data_size(data: bytes, frame: Mp3Frame) -> int:
+    """Bytes of main data a frame actually uses, from the part2_3_length fields of its side info."""
+    bits = int.from_bytes(data[frame.side_offset:frame.payload_offset], "big")
+    total_bits = frame.side_len * 8
+    if frame.mpeg1:
+        pos = 9 + (5 if frame.channels == 1 else 3) + 4 * frame.channels
+        granules, per_channel = 2, 59
+    else:
+        pos = 8 + (1 if frame.channels == 1 else 2)
+        granules, per_channel = 1, 63
+    used = 0
+    for _ in range(granules * frame.channels):
+        used += (bits >> (total_bits - pos - 12)) & 0xFFF
+        pos += per_channel
+    return -(-used // 8)
+
+
+def _reservoir_reach(frames: List[Mp3Frame], k: int) -> int:
+    """
+    How many payload bytes before frame k the main data of frames k, k+1, ...
+    reaches back into. Zero means frame k is a clean splice point.
+    """
+    reach = consumed = 0
+    for frame in frames[k:k + 32]:
+        reach = max(reach, frame.main_data_begin - consumed)
+        consumed += frame.payload_len
+        if consumed >= 512:
+            break
+    return reach
+
+
+def _payload_tail(data: bytes, frames: List[Mp3Frame], k: int, nbytes: int) -> bytes:
+    """The last nbytes of the main-data byte stream that precedes frame k."""
+    chunks = []
+    for frame in reversed(frames[:k]):
+        if nbytes <= 0:
+            break
+        payload = data[frame.payload_offset:frame.offset + frame.size]
+        chunks.append(payload[-nbytes:])
+        nbytes -= len(payload)
+    return b"".join(reversed(chunks))
+
+
+def _carry_reservoir(encoded: bytes, frame: Mp3Frame, tail: bytes) -> Optional[bytes]:
+    """
+    Rebuilds a reservoir-free encoded frame at the smallest bitrate that also
+    fits tail as trailing ancillary data, so the next original frame finds the
+    bits it borrows right where it expects them. Returns None if nothing fits.
+    """
+    if frame.protected:
+        return None
+    own = _main_data_size(encoded, frame)
+    head_len = frame.payload_offset - frame.offset
+    coeff = 144 if frame.mpeg1 else 72
+    table = _MP3_BITRATES[1 if frame.mpeg1 else 2]
+    for index in range(frame.bitrate_index, 15):
+        payload_len = coeff * table[index] * 1000 // frame.sample_rate - head_len
+        if payload_len < own + len(tail):
+            continue
+        header = bytearray(encoded[frame.offset:frame.payload_offset])
+        header[2] = (index << 4) | (header[2] & 0x0D)  # new bitrate, padding bit cleared
+        main = encoded[frame.payload_offset:frame.payload_offset + own]
+        return bytes(header) + main + bytes(payload_len - own - len(tail)) + tail
+    return None
+
+
+def _decode_mp3(path: str, channels: int) -> np.ndarray:
+    cmd = [_ffmpeg_binary(), "-loglevel", "error", "-i", path, "-f", "f32le", "-ac", str(channels), "pipe:1"]
+    raw = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True).stdout
+    return np.frombuffer(raw, dtype=np.float32).reshape(-1, channels)
+
+
+def _encode_mp3_frames(samples: np.ndarray, sample_rate: int, bitrate: int) -> bytes:
+    """Encodes without the bit reservoir so every output frame is self-contained."""
+    cmd = [
+        _ffmpeg_binary(), "-loglevel", "error",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", str(samples.shape[1]), "-i", "pipe:0",
+        "-c:a", "libmp3lame", "-b:a", str(bitrate), "-reservoir", "0",
+        "-write_xing", "0", "-id3v2_version", "0", "-f", "mp3", "pipe:1",
+    ]
+    result = subprocess.run(
+        cmd, input=np.ascontiguousarray(samples, dtype=np.float32).tobytes(),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+    )
+    return result.stdout
+
+
+def _patch_mp3(original_path: str, output_path: str, ranges: List[Tuple[int, int]], render: RegionRenderer):
+    with open(original_path, "rb") as f:
+        data = f.read()
+    frames, info = parse_mp3_frames(data)
+    if not frames:
+        raise ValueError(f"No MPEG layer III frames found in {original_path}")
+
+    spf = frames[0].samples
+    sample_rate = frames[0].sample_rate
+    channels = frames[0].channels
+    delay = _lame_delay(data, info)
+    # Offset between the gapless decoded timeline and raw frame positions.
+    skip = delay + DECODER_DELAY if delay is not None else 0
+    timeline = _decode_mp3(original_path, channels)
+
+    # Map each edited sample range onto a span of frames [first, last), with
+    # one frame of margin either side for the MDCT overlap.
+    spans: List[List[int]] = []
+    for start, stop in ranges:
+        first = max(0, (start + skip) // spf - 1)
+        last = min(len(frames), -(-(stop + skip) // spf) + 1)
+        if spans and first <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], last)
+        else:
+            spans.append([first, last])
+
+    # Apply the clean render to the decoded timeline for every edited range.
+    patched = timeline.copy()
+    for start, stop in ranges:
+        stop = min(stop, len(patched))
+        if stop > start:
+            patched[start:stop] = render(start, stop, timeline[start:stop])
+
+    pieces = []
+    cursor = 0
+    encoder_delay = LAME_ENCODER_DELAY + DECODER_DELAY
+    i = 0
+    while i < len(spans):
+        first, last = spans[i]
+        count = last - first
+        # Encoded frame j stands in for original frame (first - PREROLL_FRAMES + j),
+        # so feed the encoder the timeline shifted by its own delay.
+        t0 = (first - PREROLL_FRAMES) * spf - skip + encoder_delay
+        n = (count + PREROLL_FRAMES + 2) * spf
+        source = np.zeros((n, channels), dtype=np.float32)
+        lo, hi = max(0, t0), min(len(patched), t0 + n)
+        if hi > lo:
+            source[lo - t0:hi - t0] = patched[lo:hi]
+
+        bitrate = max(frame.bitrate for frame in frames[first:last])
+        encoded = _encode_mp3_frames(source, sample_rate, bitrate)
+        new_frames, _ = parse_mp3_frames(encoded)
+        kept = new_frames[PREROLL_FRAMES:PREROLL_FRAMES + count]
+        if len(kept) < count:
+            raise RuntimeError("MP3 re-encode produced fewer frames than the span it replaces")
+        chunks = [encoded[fr.offset:fr.offset + fr.size] for fr in kept]
+
+        # Our frames never borrow bits, but the original frames after the span
+        # may borrow from the frames we replace: carry those bytes along.
+        reach = _reservoir_reach(frames, last) if last < len(frames) else 0
+        if reach:
+            carried = _carry_reservoir(encoded, kept[-1], _payload_tail(data, frames, last, reach))
+            if carried is None:
+                # No room for the borrowed bytes: grow the span to the next clean
+                # splice point (or the end of the stream) and re-encode.
+                limit = min(len(frames), last + MAX_RESERVOIR_SEARCH)
+                last += 1
+                while last < limit and _reservoir_reach(frames, last):
+                    last += 1
+                if last == limit and _reservoir_reach(frames, last if last < len(frames) else 0):
+                    last = len(frames)
+                spans[i][1] = last
+                while i + 1 < len(spans) and spans[i + 1][0] <= last:
+                    spans[i][1] = max(last, spans.pop(i + 1)[1])
+                continue
+            chunks[-1] = carried
+
+        pieces.append(data[cursor:frames[first].offset])
+        pieces.extend(chunks)
+        cursor = frames[last].offset if last < len(frames) else frames[-1].offset + frames[-1].size
+        logger.debug("Re-encoded MP3 frames %d-%d (%d frames, %d reservoir bytes carried)", first, last, count, reach)
+        i += 1
+
+    pieces.append(data[cursor:])
+    out = b"".join(pieces)
+    if info is not None:
+        out = _update_info_bytes(out, info, len(out) - info.offset)
+
+    tmp_path = output_path + ".patch.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(out)
+    os.replace(tmp_path, output_path)
+
+
+def _update_info_bytes(data: bytes, info: Mp3Frame, stream_bytes: int) -> bytes:
+    """Keeps the Xing/Info byte count in sync after spliced frames change size."""
+    body = data[info.offset:info.offset + info.size]
+    tag = max(body.find(b"Xing"), body.find(b"Info"))
+    flags = struct.unpack(">I", body[tag + 4:tag + 8])[0]
+    if not flags & 2:
+        return data
+    pos = info.offset + tag + 8 + (4 if flags & 1 else 0)
+    return data[:pos] + struct.pack(">I", stream_bytes) + data[pos + 4:]
+
+
+def patch_file(original_path: str, output_path: str, ranges: List[Tuple[int, int]], render: RegionRenderer) -> str:
+    """
+    Writes output_path as a copy of original_path in which only the given
+    sample ranges are regenerated by render(start, stop, original_samples).
+    """
+    out_dir = os.path.dirname(output_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    if not ranges:
+        if os.path.abspath(original_path) != os.path.abspath(output_path):
+            shutil.copyfile(original_path, output_path)
+        return output_path
+
+    if infer_format(original_path) == "mp3":
+        _patch_mp3(original_path, output_path, ranges, render)
+    else:
+        _patch_pcm(original_path, output_path, ranges, render)
+    return output_path
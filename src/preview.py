@@ -0,0 +1,123 @@
+# src/preview.py
+"""
+QA previews: only a few seconds around each edit are rendered, from the EDL's
+cached stems and synth clips, instead of mixing and encoding the whole song.
+
+    python src/render.py --edl data/clean_song.edl.json --output review.wav --preview
+    python src/main.py --input song.mp3 --output review.wav --preview
+
+Nearby edits share one snippet. The "sequential" layout plays each snippet
+twice, original then clean, with a short gap between them and a longer one
+before the next snippet. Snippet positions are written as an Audacity label
+track (<output>.labels.txt) so reviewers can jump between them. The "split"
+layout plays each snippet once, with the original (mono) on the left and the
+clean version on the right.
+"""
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from src import metrics
+from src.edl import edl_segments
+from src.encoder import encode_audio
+from src.mixer import _audio_info, _read_region, render_clean_region
+
+CONTEXT_S = 2.0
+GAP_S = 0.4
+SNIPPET_GAP_S = 1.0
+LAYOUTS = ("sequential", "split")
+
+
+def preview_windows(segments: List[Dict], duration: float, context_s: float = CONTEXT_S) -> List[Tuple[float, float, List[Dict]]]:
+    """[(start, end, segments)] in seconds: context_s around each edit, overlapping windows merged."""
+    windows: List[Tuple[float, float, List[Dict]]] = []
+    for seg in sorted(segments, key=lambda s: s["start"]):
+        start, end = max(0.0, seg["start"] - context_s), min(duration, seg["end"] + context_s)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], max(windows[-1][1], end), windows[-1][2] + [seg])
+        else:
+            windows.append((start, end, [seg]))
+    return windows
+
+
+def default_labels_path(output_path: str) -> str:
+    return os.path.splitext(output_path)[0] + ".labels.txt"
+
+
+def _label(window_segments: List[Dict]) -> str:
+    return ", ".join(f"{seg.get('word', '')} -> {seg.get('replacement', '')} @ {seg['start']:.2f}s" for seg in window_segments)
+
+
+def render_preview(
+    edl: Dict,
+    output_path: str,
+    context_s: float = CONTEXT_S,
+    layout: str = "sequential",
+    bitrate=None,
+    fade_ms=None,
+    synth_gain_db=None
+) -> str:
+    """
+    Renders the review file for an EDL dict and returns its path. The label
+    track is saved next to it.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown preview layout {layout!r} (expected one of {', '.join(LAYOUTS)})")
+    source = edl["source"]["path"]
+    stems = edl["stems"]
+    mix = edl["mix"]
+    segments = edl_segments(edl, fade_ms=fade_ms, synth_gain_db=synth_gain_db)
+    fade = mix.get("fade_ms", 0) if fade_ms is None else fade_ms
+    vocals = stems.get("vocals")
+    dsp = mix.get("mode") == "dsp"
+    has_vocals = not dsp and bool(vocals and os.path.exists(vocals))
+    sample_rate, frames, channels = _audio_info(stems["instrumental"])
+
+    pieces, labels = [], []
+    position = 0
+    synth_cache: Dict[str, np.ndarray] = {}
+    windows = preview_windows(segments, frames / sample_rate, context_s)
+    gap = np.zeros((int(GAP_S * sample_rate), channels), dtype=np.float32)
+    snippet_gap = np.zeros((int(SNIPPET_GAP_S * sample_rate), channels), dtype=np.float32)
+    rendered_seconds = 0.0
+    with metrics.current().stage("preview", segments=len(segments), snippets=len(windows)) as extra:
+        for start_s, end_s, window_segments in windows:
+            lo, hi = int(start_s * sample_rate), int(end_s * sample_rate)
+            original = _read_region(source, lo, hi, sample_rate, channels)
+            if has_vocals:
+                # The clean render's base is the stem sum, exactly as in a full render.
+                base = np.array(_read_region(stems["instrumental"], lo, hi, sample_rate, channels), dtype=np.float32)
+                base += _read_region(vocals, lo, hi, sample_rate, channels)
+            else:
+                base = original
+            clean = render_clean_region(
+                lo, hi, base, sample_rate, window_segments, stems["instrumental"],
+                has_vocals=has_vocals, synth_dir=mix.get("synth_dir", "data/synth"),
+                synth_cache=synth_cache, fade_ms=fade, dsp=dsp
+            )
+            rendered_seconds += end_s - start_s
+            label = _label(window_segments)
+            if layout == "split":
+                pieces.append(np.stack([original.mean(axis=1), clean.mean(axis=1)], axis=1))
+                labels.append((position, position + len(original), label))
+                position += len(original)
+                pieces.append(np.zeros((len(snippet_gap), 2), dtype=np.float32))
+                position += len(snippet_gap)
+                continue
+            labels.append((position, position + len(original), f"original: {label}"))
+            position += len(original) + len(gap)
+            labels.append((position, position + len(clean), f"clean: {label}"))
+            position += len(clean) + len(snippet_gap)
+            pieces.extend([original, gap, clean, snippet_gap])
+        extra["audio_seconds"] = rendered_seconds
+
+    samples = np.concatenate(pieces) if pieces else np.zeros((0, 2 if layout == "split" else channels), dtype=np.float32)
+    with metrics.current().stage("mixing.encode", audio_seconds=len(samples) / sample_rate):
+        encode_audio(samples, sample_rate, output_path, bitrate=bitrate)
+    labels_path = default_labels_path(output_path)
+    with open(labels_path, "w", encoding="utf-8") as f:
+        for begin, end, text in labels:
+            f.write(f"{begin / sample_rate:.3f}\t{end / sample_rate:.3f}\t{text}\n")
+    print(f"Preview of {len(windows)} snippets ({rendered_seconds:.1f}s of the song) saved to: {output_path}")
+    return output_path
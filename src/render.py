@@ -0,0 +1,115 @@
+# src/render.py
+"""
+Model-free re-render of a clean version from an edit decision list.
+
+    python src/render.py --edl data/clean_song.edl.json --output data/clean_v2.mp3 --fade_ms 15
+    python src/render.py --edl data/clean_song.edl.json --output review.wav --preview   # snippets only, see src/preview.py
+"""
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import metrics
+from src.edl import edl_segments, load_edl
+from src.encoder import encode_audio
+from src.mixer import patch_clean_version, render_clean_array
+from src.patcher import can_patch
+from src.preview import LAYOUTS, render_preview
+
+
+def render_edl(edl, output_path, patch=False, bitrate=None, passthrough=False, fade_ms=None, synth_gain_db=None):
+    """Renders the clean song described by an EDL dict. Only the mixer and encoder run."""
+    source = edl["source"]["path"]
+    stems = edl["stems"]
+    mix = edl["mix"]
+    segments = edl_segments(edl, fade_ms=fade_ms, synth_gain_db=synth_gain_db)
+    fade = mix.get("fade_ms", 0) if fade_ms is None else fade_ms
+
+    if patch and can_patch(source, output_path):
+        return patch_clean_version(
+            original_audio_path=source,
+            instrumental_path=stems["instrumental"],
+            cuss_segments=segments,
+            vocals_path=stems.get("vocals"),
+            synth_dir=mix.get("synth_dir", "data/synth"),
+            output_path=output_path,
+            fade_ms=fade,
+            dsp=mix.get("mode") == "dsp"
+        )
+
+    with metrics.current().stage("render", segments=len(segments)):
+        samples, sample_rate, changed_ranges = render_clean_array(
+            source,
+            stems["instrumental"],
+            segments,
+            vocals_path=stems.get("vocals"),
+            synth_dir=mix.get("synth_dir", "data/synth"),
+            fade_ms=fade,
+            dsp=mix.get("mode") == "dsp"
+        )
+    with metrics.current().stage("mixing.encode", audio_seconds=len(samples) / sample_rate):
+        encode_audio(
+            samples,
+            sample_rate,
+            output_path,
+            bitrate=bitrate,
+            passthrough_from=source if passthrough else None,
+            changed_ranges=changed_ranges if passthrough else None
+        )
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CleanMusic: re-render a clean version from an edit decision list.")
+    parser.add_argument("--edl", required=True, help="Path to the .edl.json written by src/main.py.")
+    parser.add_argument("--output", required=True, help="Path to the output clean audio (format follows the extension).")
+    parser.add_argument("--fade_ms", type=float, default=None, help="Override the crossfade at segment edges.")
+    parser.add_argument("--synth_gain_db", type=float, default=None, help="Override the gain of synthesized replacements.")
+    parser.add_argument("--bitrate", default=None, help="Bitrate for lossy output, e.g. 192k.")
+    parser.add_argument("--passthrough", action="store_true", help="Copy unedited frames from the source where the format allows.")
+    parser.add_argument("--patch", action="store_true", help="Patch a copy of the source instead of rendering the whole song.")
+    parser.add_argument("--preview", action="store_true", help="Render only snippets around each edit, original then clean, for review.")
+    parser.add_argument("--preview_context", type=float, default=2.0, help="Seconds of context before and after each edit in --preview.")
+    parser.add_argument("--preview_layout", default="sequential", choices=LAYOUTS, help="Original then clean (sequential) or original left / clean right (split).")
+    parser.add_argument("--metrics_file", default=None, help="Append render metrics as JSON lines to this file.")
+    parser.add_argument("--log_level", default="WARNING", help="Logging level (DEBUG, INFO, WARNING, ERROR).")
+    args = parser.parse_args()
+    metrics.configure_logging(args.log_level)
+
+    try:
+        edl = load_edl(args.edl)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    run_metrics = metrics.PipelineMetrics(sink_path=args.metrics_file)
+    previous = metrics.activate(run_metrics)
+    try:
+        if args.preview:
+            render_preview(
+                edl,
+                args.output,
+                context_s=args.preview_context,
+                layout=args.preview_layout,
+                bitrate=args.bitrate,
+                fade_ms=args.fade_ms,
+                synth_gain_db=args.synth_gain_db
+            )
+        else:
+            render_edl(
+                edl,
+                args.output,
+                patch=args.patch,
+                bitrate=args.bitrate,
+                passthrough=args.passthrough,
+                fade_ms=args.fade_ms,
+                synth_gain_db=args.synth_gain_db
+            )
+    finally:
+        run_metrics.emit_summary()
+        metrics.activate(previous)
+    if not args.preview:
+        print(f"Done! Clean version saved to: {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+# src/repetition.py
+"""
+Repeated-section detection so a chorus is transcribed once and its words
+(and synth clips) are reused for every repeat.
+
+Each 100 ms frame gets a chroma vector (harmony) and MFCCs (timbre), both
+z-scored over the song. The cosine self-similarity matrix is one matrix
+product, and a repeat shows up as a stripe parallel to its main diagonal:
+lag L is the time between the two occurrences. Stripes at least
+min_section_s long are kept, strongest first, so no region is both the source
+of one repeat and the copy in another.
+
+Harmony and timbre also match when a verse is sung over the same backing as
+an earlier one. So every candidate is verified on the speech-band energy
+envelope from src/vad.py (15 ms frames here): the two occurrences must
+correlate at min_correlation or better once the offset is refined to that
+resolution.
+Only verified repeats are skipped by Whisper.
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import dct
+
+from src.vad import HOP as VAD_HOP
+from src.vad import frame_features, load_mono
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 22050
+N_FFT = 4096
+HOP = 2205  # 100 ms
+N_MELS = 40
+N_MFCC = 13
+BLOCK_FRAMES = 1024
+# Words this close to a repeat's edges are decoded normally, so Whisper has
+# context and a word straddling the boundary is never lost.
+EDGE_S = 0.5
+
+
+def _chroma_filter(sample_rate: int, n_fft: int) -> np.ndarray:
+    """(12, bins) matrix summing FFT bins between 55 Hz and 5 kHz into pitch classes."""
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    fb = np.zeros((12, len(freqs)), dtype=np.float32)
+    valid = (freqs >= 55.0) & (freqs <= 5000.0)
+    pitch_class = np.round(12 * np.log2(freqs[valid] / 440.0)).astype(int) % 12
+    fb[pitch_class, np.flatnonzero(valid)] = 1.0
+    return fb
+
+
+def _mel_filter(sample_rate: int, n_fft: int, n_mels: int = N_MELS, fmin: float = 60.0, fmax: float = 8000.0) -> np.ndarray:
+    """(n_mels, bins) triangular mel filterbank."""
+    def to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def to_hz(mel):
+        return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+    freqs = np.fft.rfftfreq(n_fft, 1.0 / sample_rate)
+    edges = to_hz(np.linspace(to_mel(fmin), to_mel(min(fmax, sample_rate / 2)), n_mels + 2))
+    lower, center, upper = edges[:-2, None], edges[1:-1, None], edges[2:, None]
+    rising = (freqs - lower) / (center - lower)
+    falling = (upper - freqs) / (upper - center)
+    return np.maximum(0.0, np.minimum(rising, falling)).astype(np.float32)
+
+
+def section_features(mono: np.ndarray, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    (frames, 12 + N_MFCC) chroma and MFCC features per HOP-sample frame,
+    z-scored per dimension. Frames are transformed BLOCK_FRAMES at a time.
+    """
+    if len(mono) < N_FFT:
+        return np.zeros((0, 12 + N_MFCC), dtype=np.float32)
+    frames = sliding_window_view(mono, N_FFT)[::HOP]
+    window = np.hanning(N_FFT).astype(np.float32)
+    chroma_fb = _chroma_filter(sample_rate, N_FFT)
+    mel_fb = _mel_filter(sample_rate, N_FFT)
+
+    features = np.empty((len(frames), 12 + N_MFCC), dtype=np.float32)
+    for start in range(0, len(frames), BLOCK_FRAMES):
+        block = frames[start:start + BLOCK_FRAMES] * window
+        power = np.abs(np.fft.rfft(block, axis=1)).astype(np.float32) ** 2
+        chroma = power @ chroma_fb.T
+        chroma /= chroma.sum(axis=1, keepdims=True) + 1e-10
+        mfcc = dct(np.log(power @ mel_fb.T + 1e-10), type=2, axis=1, norm="ortho")[:, :N_MFCC]
+        features[start:start + len(block)] = np.hstack([chroma, mfcc])
+    features -= features.mean(axis=0)
+    features /= features.std(axis=0) + 1e-6
+    return features
+
+
+def self_similarity(features: np.ndarray) -> np.ndarray:
+    """Cosine similarity between every pair of frames."""
+    unit = features / (np.linalg.norm(features, axis=1, keepdims=True) + 1e-10)
+    return unit @ unit.T
+
+
+def _runs(active: np.ndarray) -> List[Tuple[int, int]]:
+    edges = np.diff(np.concatenate([[0], active.astype(np.int8), [0]]))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def _overlaps(span: Tuple[float, float], spans: List[Tuple[float, float]]) -> bool:
+    return any(span[0] < end and start < span[1] for start, end in spans)
+
+
+def find_repeats(
+    similarity: np.ndarray,
+    hop_s: float = HOP / SAMPLE_RATE,
+    min_section_s: float = 8.0,
+    threshold: float = 0.6,
+    max_gap_s: float = 1.0
+) -> List[Dict]:
+    """
+    Repeated sections from a self-similarity matrix, strongest first:
+    [{"source": (start, end), "repeat": (start, end), "offset": seconds,
+    "similarity": mean}], where the repeat is the source moved by offset.
+    """
+    n = len(similarity)
+    min_frames = max(1, int(round(min_section_s / hop_s)))
+    gap = int(round(max_gap_s / hop_s))
+    smooth = np.ones(gap + 1, dtype=np.float32) / (gap + 1)
+    candidates = []
+    for lag in range(min_frames, n - min_frames + 1):
+        diagonal = np.diagonal(similarity, lag)
+        # Smoothing along the stripe bridges short dips (a fill, a breath).
+        active = np.convolve(diagonal, smooth, mode="same") >= threshold
+        for start, stop in _runs(active):
+            # Source and repeat may not overlap: lyrics in the overlap would never be decoded.
+            stop = min(stop, start + lag)
+            if stop - start < min_frames:
+                continue
+            candidates.append((float(diagonal[start:stop].mean()) * (stop - start), lag, start, stop))
+
+    repeats: List[Dict] = []
+    sources: List[Tuple[float, float]] = []
+    copies: List[Tuple[float, float]] = []
+    for score, lag, start, stop in sorted(candidates, reverse=True):
+        source = (round(start * hop_s, 3), round(stop * hop_s, 3))
+        repeat = (round((start + lag) * hop_s, 3), round((stop + lag) * hop_s, 3))
+        if _overlaps(repeat, copies) or _overlaps(repeat, sources) or _overlaps(source, copies):
+            continue
+        repeats.append({
+            "source": source,
+            "repeat": repeat,
+            "offset": round(lag * hop_s, 3),
+            "similarity": round(score / (stop - start), 4),
+        })
+        sources.append(source)
+        copies.append(repeat)
+    return repeats
+
+
+def verify_repeat(
+    envelope: np.ndarray,
+    hop_s: float,
+    repeat: Dict,
+    max_shift_s: float = 0.3,
+    min_correlation: float = 0.9
+) -> Optional[float]:
+    """
+    Refines a repeat's offset on a fine envelope (one value per hop_s) and
+    returns it, or None if the two occurrences don't match closely enough.
+    """
+    start, stop = int(repeat["source"][0] / hop_s), int(repeat["source"][1] / hop_s)
+    lag = int(round(repeat["offset"] / hop_s))
+    max_shift = int(max_shift_s / hop_s)
+    source = envelope[start:stop]
+    if len(source) < 2 or np.std(source) == 0:
+        return None
+    best, best_lag = -1.0, lag
+    for candidate in range(lag - max_shift, lag + max_shift + 1):
+        target = envelope[start + candidate:stop + candidate]
+        if start + candidate < 0 or len(target) != len(source) or np.std(target) == 0:
+            continue
+        correlation = float(np.corrcoef(source, target)[0, 1])
+        if correlation > best:
+            best, best_lag = correlation, candidate
+    logger.debug("Repeat %.1fs -> %.1fs: envelope correlation %.3f", repeat["source"][0], repeat["repeat"][0], best)
+    return best_lag * hop_s if best >= min_correlation else None
+
+
+def detect_repeats(
+    path: str,
+    min_section_s: float = 8.0,
+    threshold: float = 0.6,
+    min_correlation: float = 0.9
+) -> Tuple[List[Dict], float]:
+    """
+    Finds and verifies the repeated sections of a song (or vocal stem).
+    Returns (repeats sorted by repeat start, duration in seconds).
+    """
+    mono = load_mono(path, SAMPLE_RATE)
+    duration = len(mono) / SAMPLE_RATE
+    candidates = find_repeats(self_similarity(section_features(mono)), HOP / SAMPLE_RATE, min_section_s, threshold)
+
+    # The VAD framing at this rate: 23 ms frames every 14.5 ms.
+    energy, _ = frame_features(mono, SAMPLE_RATE)
+    hop_s = VAD_HOP / SAMPLE_RATE
+    repeats = []
+    for candidate in candidates:
+        offset = verify_repeat(energy, hop_s, candidate, min_correlation=min_correlation)
+        if offset is None:
+            continue
+        source = candidate["source"]
+        offset = round(offset, 3)
+        repeats.append(dict(candidate, offset=offset, repeat=(round(source[0] + offset, 3), round(source[1] + offset, 3))))
+    logger.debug("%s: %d candidate repeats, %d verified", path, len(candidates), len(repeats))
+    return sorted(repeats, key=lambda r: r["repeat"][0]), duration
+
+
+def decode_intervals(
+    repeats: List[Dict],
+    duration: float,
+    voiced: Optional[List[Tuple[float, float]]] = None,
+    edge_s: float = EDGE_S
+) -> List[Tuple[float, float]]:
+    """
+    The parts of the song Whisper still has to decode: voiced (default: the
+    whole song) minus the inner part of every repeat.
+    """
+    skipped = sorted((r["repeat"][0] + edge_s, r["repeat"][1] - edge_s) for r in repeats)
+    intervals = []
+    for begin, end in voiced if voiced is not None else [(0.0, duration)]:
+        for skip_begin, skip_end in skipped:
+            if skip_end <= begin or skip_begin >= end or skip_end <= skip_begin:
+                continue
+            if skip_begin > begin:
+                intervals.append((begin, skip_begin))
+            begin = max(begin, skip_end)
+        if end > begin:
+            intervals.append((begin, end))
+    return intervals
+
+
+def apply_repeats(words: List[Dict], repeats: List[Dict], edge_s: float = EDGE_S) -> List[Dict]:
+    """
+    Adds a copy of every word inside each repeat's source (away from its
+    edges), moved by the repeat's offset and marked with repeat_offset.
+    """
+    result = list(words)
+    for repeat in repeats:
+        low, high = repeat["source"][0] + edge_s, repeat["source"][1] - edge_s
+        for word in words:
+            if word["start"] >= low and word["end"] <= high:
+                result.append(dict(
+                    word,
+                    start=word["start"] + repeat["offset"],
+                    end=word["end"] + repeat["offset"],
+                    repeat_offset=repeat["offset"],
+                ))
+    return sorted(result, key=lambda w: w["start"])
@@ -0,0 +1,135 @@
+# src/resample.py
+"""
+The one resampler used across the pipeline: Demucs input (44.1 kHz), Whisper
+and VAD input (16 kHz), stems and synth clips read back at the mix rate, and
+live streams.
+
+It is a polyphase FIR filter with the same design as scipy's resample_poly
+default: a Kaiser-windowed sinc (beta 5) with 10 zero crossings per side at
+the lower of the two rates. The kernel is built once per (src, dst) rate pair
+and cached, instead of on every call. This matters for the many short
+regions the mixer and streaming paths resample, for example 48 kHz or
+22.05 kHz clips into a 44.1 kHz mix.
+
+- resample(data, src_rate, dst_rate) converts a whole buffer.
+- StreamResampler converts block by block. Its concatenated output equals
+  resample() on the whole signal, with a delay of about ZERO_CROSSINGS
+  samples at the lower of the two rates.
+"""
+from functools import lru_cache
+from math import gcd
+from typing import Tuple
+
+import numpy as np
+from scipy.signal import upfirdn
+
+KAISER_BETA = 5.0
+ZERO_CROSSINGS = 10
+
+
+def _ratio(src_rate: int, dst_rate: int) -> Tuple[int, int]:
+    g = gcd(int(src_rate), int(dst_rate))
+    return int(dst_rate) // g, int(src_rate) // g
+
+
+@lru_cache(maxsize=32)
+def _kernel(up: int, down: int) -> np.ndarray:
+    """Low-pass at the lower Nyquist of the two rates, at the upsampled rate, with gain up."""
+    max_rate = max(up, down)
+    half_len = ZERO_CROSSINGS * max_rate
+    taps = np.sinc(np.arange(-half_len, half_len + 1) / max_rate) * np.kaiser(2 * half_len + 1, KAISER_BETA)
+    kernel = (taps * (up / taps.sum())).astype(np.float32)
+    kernel.setflags(write=False)
+    return kernel
+
+
+@lru_cache(maxsize=32)
+def _shifted_kernel(up: int, down: int) -> Tuple[np.ndarray, int]:
+    """The kernel zero-padded in front so upfirdn's output, after skipping outputs, is centred."""
+    half_len = (len(_kernel(up, down)) - 1) // 2
+    skip = -(-half_len // down)
+    kernel = np.concatenate([np.zeros(skip * down - half_len, dtype=np.float32), _kernel(up, down)])
+    kernel.setflags(write=False)
+    return kernel, skip
+
+
+def output_length(frames: int, src_rate: int, dst_rate: int) -> int:
+    up, down = _ratio(src_rate, dst_rate)
+    return -(-frames * up // down)
+
+
+def resample(data: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """Resamples a (frames,) or (frames, channels) float buffer; returns float32."""
+    data = np.asarray(data, dtype=np.float32)
+    if src_rate == dst_rate or len(data) == 0:
+        return data
+    up, down = _ratio(src_rate, dst_rate)
+    kernel, skip = _shifted_kernel(up, down)
+    frames = output_length(len(data), src_rate, dst_rate)
+    out = upfirdn(kernel, data, up, down, axis=0)[skip:skip + frames]
+    if len(out) < frames:
+        # Only zero taps were left for the last outputs.
+        out = np.concatenate([out, np.zeros((frames - len(out),) + out.shape[1:], dtype=out.dtype)])
+    return out.astype(np.float32, copy=False)
+
+
+class StreamResampler:
+    """
+    Block-wise resample(): feed blocks of (frames,) or (frames, channels) to
+    process() and call flush() once at the end for the tail. produced counts
+    the output frames returned so far.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        self.src_rate, self.dst_rate = int(src_rate), int(dst_rate)
+        self.up, self.down = _ratio(src_rate, dst_rate)
+        self.consumed = 0
+        self.produced = 0
+        self._buffer = None
+        # Input index of _buffer[0], kept a multiple of down so every output
+        # lands on upfirdn's grid. Negative indices are zeros before the stream.
+        self._base = 0
+        if self.src_rate != self.dst_rate:
+            self._kernel, self._skip = _shifted_kernel(self.up, self.down)
+            self._half_len = (len(_kernel(self.up, self.down)) - 1) // 2
+            self._taps = -(-len(_kernel(self.up, self.down)) // self.up)
+
+    def _first_input(self, output: int) -> int:
+        """Input index of the first tap output uses."""
+        return -((self._half_len - output * self.down) // self.up)
+
+    def _emit(self, stop: int) -> np.ndarray:
+        count = max(0, stop - self.produced)
+        offset = self.produced - self._base * self.up // self.down + self._skip
+        out = upfirdn(self._kernel, self._buffer, self.up, self.down, axis=0)[offset:offset + count]
+        self.produced += count
+        # Inputs before the next output's first tap are no longer needed.
+        drop = (self._first_input(self.produced) // self.down * self.down) - self._base
+        if drop > 0:
+            self._buffer = self._buffer[drop:]
+            self._base += drop
+        return out.astype(np.float32, copy=False)
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        block = np.asarray(block, dtype=np.float32)
+        self.consumed += len(block)
+        if self.src_rate == self.dst_rate:
+            self.produced += len(block)
+            return block
+        if self._buffer is None:
+            self._base = self._first_input(0) // self.down * self.down
+            self._buffer = np.zeros((-self._base,) + block.shape[1:], dtype=np.float32)
+        self._buffer = np.concatenate([self._buffer, block])
+        available = self._base + len(self._buffer)
+        # Outputs whose taps have all arrived.
+        return self._emit(((available - self._taps) * self.up + self._half_len) // self.down + 1)
+
+    def flush(self) -> np.ndarray:
+        """The remaining outputs, with the input zero-padded after its end."""
+        if self.src_rate == self.dst_rate or self._buffer is None:
+            return np.zeros((0,), dtype=np.float32) if self._buffer is None else self._buffer[:0]
+        stop = output_length(self.consumed, self.src_rate, self.dst_rate)
+        needed = self._first_input(stop - 1) + self._taps - (self._base + len(self._buffer))
+        if needed > 0:
+            self._buffer = np.concatenate([self._buffer, np.zeros((needed,) + self._buffer.shape[1:], dtype=np.float32)])
+        return self._emit(stop)
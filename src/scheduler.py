@@ -0,0 +1,206 @@
+# src/scheduler.py
+"""
+Deadline-aware quality selection. Given a latency target, the number of jobs
+queued behind a song and per-stage cost models fitted from the metrics JSONL
+(see src/metrics.py), picks the best Whisper size, Demucs shift count and
+synth backend that still lets the backlog clear in time.
+
+Plans are tried from best to cheapest: fewer Demucs shifts first, then
+smaller Whisper models, and synthesis (silence instead of XTTS) last. With
+allow_dsp, a final rung skips Demucs (shifts 0) and suppresses the vocals
+with src/dsp_suppress.py. A plan fits when
+
+    (1 + queue_depth / workers) * estimated_cost <= latency_target - elapsed
+
+i.e. when the jobs behind this one, running similar plans, would also meet
+the target. If nothing fits, the cheapest plan is used.
+"""
+import json
+import logging
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WHISPER_SIZES = ("tiny", "base", "small", "medium", "large")
+# Whisper variants outside the ladder's names, by the rung they run on.
+WHISPER_VARIANTS = {"turbo": "large"}
+# Separation profiles by Demucs shift count (separate_vocals' shifts).
+SEPARATION_PROFILES = {"high": 5, "balanced": 2, "fast": 1}
+
+# Seconds of work per second of audio (per synthesized clip for synthesis),
+# used until the metrics have samples for a stage. Rough CPU figures.
+DEFAULT_COSTS = {
+    "transcription:tiny": 0.04,
+    "transcription:base": 0.08,
+    "transcription:small": 0.25,
+    "transcription:medium": 0.7,
+    "transcription:large": 1.5,
+    "separation:0": 0.0,
+    "separation:1": 0.3,
+    "separation:2": 0.6,
+    "separation:5": 1.5,
+    "synthesis:xtts": 4.0,
+    "mixing": 0.03,
+}
+
+
+def _median(values: List[float]) -> float:
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+
+def ladder_size(model_size: str) -> str:
+    """
+    The WHISPER_SIZES rung of a Whisper model name: English-only (base.en)
+    and versioned (large-v3, large-v3-turbo) variants run on their size's
+    rung. Raises ValueError for names it doesn't know.
+    """
+    size = model_size.split(".")[0].split("-")[0]
+    size = WHISPER_VARIANTS.get(size, size)
+    if size not in WHISPER_SIZES:
+        raise ValueError(f"Unknown Whisper model size {model_size!r} (expected one of {', '.join(WHISPER_SIZES)}, "
+                         "an .en variant, a versioned large model or turbo)")
+    return size
+
+
+class CostModel:
+    """Per-stage costs: seconds per audio second, or per clip for synthesis."""
+
+    def __init__(self, costs: Optional[Dict[str, float]] = None):
+        self.costs = dict(DEFAULT_COSTS, **(costs or {}))
+
+    @classmethod
+    def from_metrics(cls, paths: Iterable[str]) -> "CostModel":
+        """Fits the costs as medians over the successful stage records in metrics JSONL files."""
+        samples: Dict[str, List[float]] = {}
+        for path in paths:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    lines = f.readlines()
+            except OSError as e:
+                logger.warning("Skipping cost metrics %s: %s", path, e)
+                continue
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("event") != "stage" or record.get("status") != "ok":
+                    continue
+                key, amount = cls._sample_key(record)
+                if key and amount:
+                    samples.setdefault(key, []).append(record["wall_s"] / amount)
+        return cls({key: _median(values) for key, values in samples.items()})
+
+    @staticmethod
+    def _sample_key(record: Dict):
+        stage, seconds = record.get("stage"), record.get("audio_seconds")
+        if stage == "transcription.inference" and record.get("model"):
+            return f"transcription:{record['model']}", seconds
+        if stage == "separation" and record.get("shifts"):
+            return f"separation:{record['shifts']}", seconds
+        if stage == "synthesis.inference":
+            return "synthesis:xtts", 1
+        if stage == "mixing":
+            return "mixing", seconds
+        return None, None
+
+    def separation(self, shifts: int) -> float:
+        key = f"separation:{shifts}"
+        if key in self.costs:
+            return self.costs[key]
+        # Demucs runs the model once per shift.
+        return self.costs["separation:1"] * shifts
+
+    def transcription(self, model_size: str) -> float:
+        key = f"transcription:{model_size}"
+        if key in self.costs:
+            return self.costs[key]
+        # A variant without samples of its own costs about what its size does.
+        return self.costs[f"transcription:{ladder_size(model_size)}"]
+
+    def estimate(self, plan: Dict, audio_seconds: float, cuss_words: int, transcribed: bool = False) -> float:
+        """Seconds plan takes for one song; without transcription once that has run."""
+        cost = 0.0 if transcribed else self.transcription(plan["whisper"]) * audio_seconds
+        if cuss_words:
+            cost += self.separation(plan["shifts"]) * audio_seconds
+            cost += self.costs["mixing"] * audio_seconds
+            if plan["synth"] == "xtts":
+                cost += self.costs["synthesis:xtts"] * cuss_words
+        return cost
+
+
+class Scheduler:
+    def __init__(
+        self,
+        latency_target: float,
+        cost_model: Optional[CostModel] = None,
+        max_model_size: str = "base",
+        min_model_size: str = "tiny",
+        use_synth: bool = True,
+        workers: int = 1,
+        expected_cuss_words: int = 6,
+        allow_dsp: bool = False
+    ):
+        self.latency_target = latency_target
+        self.cost_model = cost_model or CostModel()
+        self.workers = max(1, workers)
+        self.use_synth = use_synth
+        self.expected_cuss_words = expected_cuss_words
+        self.allow_dsp = allow_dsp
+        top, bottom = (WHISPER_SIZES.index(ladder_size(size)) for size in (max_model_size, min_model_size))
+        if top < bottom:
+            top, bottom = bottom, top
+            max_model_size, min_model_size = min_model_size, max_model_size
+        sizes = list(WHISPER_SIZES[bottom:top + 1][::-1])
+        # The ends are the models asked for (e.g. large-v3), the rungs in between plain sizes.
+        sizes[-1] = min_model_size
+        sizes[0] = max_model_size
+        self.whisper_sizes = tuple(sizes)
+
+    def ladder(self, whisper: Optional[str] = None) -> List[Dict]:
+        """Every plan, best first. With whisper, only plans using that model."""
+        plans = []
+        for size in (whisper,) if whisper else self.whisper_sizes:
+            profiles = SEPARATION_PROFILES.items() if size == (whisper or self.whisper_sizes[0]) else [("fast", 1)]
+            for profile, shifts in profiles:
+                plans.append({"whisper": size, "separation": profile, "shifts": shifts, "synth": "xtts"})
+        if self.use_synth:
+            plans.append(dict(plans[-1], synth="silence"))
+        else:
+            plans = [dict(plan, synth="silence") for plan in plans]
+        if self.allow_dsp:
+            plans.append(dict(plans[-1], separation="dsp", shifts=0, synth="silence"))
+        return plans
+
+    def plan(
+        self,
+        audio_seconds: Optional[float],
+        queue_depth: int = 0,
+        elapsed: float = 0.0,
+        cuss_words: Optional[int] = None,
+        whisper: Optional[str] = None
+    ) -> Dict:
+        """
+        Best plan that fits the remaining budget. Call it before transcription,
+        then again after detection with the elapsed time, the word count and
+        the Whisper size used, to settle separation and synthesis.
+        """
+        audio_seconds = audio_seconds or 0.0
+        words = self.expected_cuss_words if cuss_words is None else cuss_words
+        budget = self.latency_target - elapsed
+        load = 1 + queue_depth / self.workers
+        ladder = self.ladder(whisper)
+        for rank, plan in enumerate(ladder):
+            estimate = self.cost_model.estimate(plan, audio_seconds, words, transcribed=whisper is not None)
+            if load * estimate <= budget or rank == len(ladder) - 1:
+                break
+        best = self.ladder()[0]
+        return dict(
+            plan,
+            estimated_s=round(estimate, 3),
+            budget_s=round(budget, 3),
+            queue_depth=queue_depth,
+            degraded=any(plan[key] != best[key] for key in ("whisper", "shifts", "synth")),
+        )
@@ -1,31 +1,53 @@
 import torch
-import torchaudio
 import soundfile as sf
 from demucs.pretrained import get_model
 from demucs.apply import apply_model
 import os
+import random
 
-def separate_vocals(audio_path, output_dir="data/separated"):
-    """
-    Uses Demucs to separate vocals using the Python API.
-    Returns path to vocals and no_vocals (instrumental).
-    """
-    print(f"Separating vocals for {audio_path}...")
-    
-    # Ensure output directory exists
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # 1. Load Model
-    # Use htdemucs as it's efficient
-    model = get_model('htdemucs')
-    
-    # 2. Load Audio using soundfile
+from src import metrics
+from src.cache import song_dir_name
+from src.resample import resample
+from src.stem_store import STEM_EXTENSION, write_stem
+
+# stem_format -> (extension, stem dtype); "wav" keeps the old soundfile output.
+STEM_FORMATS = {
+    "stem": (STEM_EXTENSION, "float32"),
+    "stem16": (STEM_EXTENSION, "int16"),
+    "wav": (".wav", None),
+}
+
+def _save_stem(save_dir, name, data, sr, stem_format):
+    """Writes a (time, channels) stem and returns its path."""
+    extension, dtype = STEM_FORMATS[stem_format]
+    path = os.path.join(save_dir, name + extension)
+    if dtype:
+        write_stem(path, data, sr, dtype=dtype)
+    else:
+        sf.write(path, data, sr)
+    return path
+
+def load_demucs_model(name="htdemucs"):
+    """Loads a pretrained Demucs model. Use htdemucs as it's efficient."""
+    with metrics.current().stage("separation.model_load", model=name):
+        return get_model(name)
+
+DEMUCS_SAMPLE_RATE = 44100
+
+def _load_for_demucs(audio_path, target_sr=DEMUCS_SAMPLE_RATE):
+    """Reads a song as a [channels, time] float tensor at the model's rate (mono is duplicated to stereo)."""
     # sf.read returns data, samplerate
-    data, sr = sf.read(audio_path)
-    
+    data, sr = sf.read(audio_path, dtype="float32")
+
+    # RESAMPLE if needed
+    # Demucs (htdemucs) expects 44100 Hz
+    if sr != target_sr:
+        print(f"  Resampling input from {sr} Hz to {target_sr} Hz for Demucs...")
+        data = resample(data, sr, target_sr)
+
     # Convert to torch tensor
     wav = torch.from_numpy(data).float()
-    
+
     # Handle dimensions: Demucs expects [channels, time]
     if wav.ndim == 1:
         # Mono: [time] -> [1, time]
@@ -35,54 +57,159 @@ def separate_vocals(audio_path, output_dir="data/separated"):
     else:
         # Stereo/Multi: [time, channels] -> [channels, time]
         wav = wav.t()
-        
-    # RESAMPLE if needed
-    # Demucs (htdemucs) expects 44100 Hz
-    target_sr = 44100
-    if sr != target_sr:
-        print(f"  Resampling input from {sr} Hz to {target_sr} Hz for Demucs...")
-        wav = torchaudio.functional.resample(wav, sr, target_sr)
-        sr = target_sr
-        
-    # Add batch dimension: [1, channels, time]
-    wav_input = wav.unsqueeze(0)
-    
-    # 3. Apply Model with proper normalization
-    # Demucs expects normalized input
-    ref = wav_input.mean(0)
-    wav_input = (wav_input - ref.mean()) / ref.std()
-    
-    # shifts=10 for better quality, split=True for chunking, overlap=0.25 for smooth recombination
-    sources = apply_model(model, wav_input, shifts=5, split=True, overlap=0.25, progress=True)
-    # sources: [batch, sources, channels, time]
-    
-    # Denormalize the output
-    sources = sources * ref.std() + ref.mean()
-    
-    # 4. Save Outputs
-    filename = os.path.splitext(os.path.basename(audio_path))[0]
-    save_dir = os.path.join(output_dir, filename)
+    return wav
+
+def _save_sources(sources, source_names, audio_path, output_dir, sr, stem_format):
+    """Writes vocals and the sum of the other sources ([sources, channels, time]) for one song."""
+    # Keyed by content too: songs separated together may share a file name.
+    save_dir = os.path.join(output_dir, song_dir_name(audio_path))
     os.makedirs(save_dir, exist_ok=True)
-    
-    vocals_idx = model.sources.index('vocals')
-    
+
+    vocals_idx = source_names.index('vocals')
+
     # Extract vocals
-    # sources is [1, 4, 2, time]
-    vocals_wav = sources[0, vocals_idx] # [2, time]
-    vocals_path = os.path.join(save_dir, "vocals.wav")
-    
-    # Save using soundfile at TARGET sample rate (44100)
+    vocals_wav = sources[vocals_idx] # [2, time]
+
+    # Save at TARGET sample rate (44100)
     print(f"  Saving vocals at {sr} Hz")
-    sf.write(vocals_path, vocals_wav.t().numpy(), sr)
-    
+    vocals_path = _save_stem(save_dir, "vocals", vocals_wav.t().numpy(), sr, stem_format)
+
     # Extract Instrumental (sum of all other sources)
-    other_sources = [sources[0, i] for i in range(sources.shape[1]) if i != vocals_idx]
+    other_sources = [sources[i] for i in range(sources.shape[0]) if i != vocals_idx]
     instrumental_wav = torch.stack(other_sources).sum(0) # [2, time]
-    
-    no_vocals_path = os.path.join(save_dir, "no_vocals.wav")
+
     print(f"  Saving instrumental at {sr} Hz")
-    sf.write(no_vocals_path, instrumental_wav.t().numpy(), sr)
-    
+    no_vocals_path = _save_stem(save_dir, "no_vocals", instrumental_wav.t().numpy(), sr, stem_format)
+
     print(f"Separation complete. Saved to {save_dir}")
-        
     return vocals_path, no_vocals_path
+
+def _normalization(wav):
+    """
+    (mean, std) that Demucs normalizes a [channels, time] song by: those of its
+    channel average, as demucs.separate does. Used by the single and batch
+    paths alike so a song gets the same stems either way.
+    """
+    ref = wav.mean(0)
+    return ref.mean(), ref.std()
+
+def separate_vocals(audio_path, output_dir="data/separated", model=None, stem_format="stem", shifts=5):
+    """
+    Uses Demucs to separate vocals using the Python API.
+    Returns path to vocals and no_vocals (instrumental).
+    Pass an already loaded model to skip the model load. Stems are written as
+    memory-mappable .stem files (see src.stem_store) unless stem_format="wav".
+    """
+    print(f"Separating vocals for {audio_path}...")
+    
+    # Ensure output directory exists
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # 1. Load Model
+    if model is None:
+        model = load_demucs_model()
+    
+    # 2. Load Audio using soundfile
+    wav = _load_for_demucs(audio_path)
+    sr = DEMUCS_SAMPLE_RATE
+        
+    # 3. Apply Model with proper normalization
+    # Demucs expects normalized input; add batch dimension: [1, channels, time]
+    mean, std = _normalization(wav)
+    wav_input = ((wav - mean) / std).unsqueeze(0)
+    
+    # more shifts for better quality, split=True for chunking, overlap=0.25 for smooth recombination
+    with metrics.current().stage("separation.inference", audio_seconds=wav.shape[-1] / sr):
+        sources = apply_model(model, wav_input, shifts=shifts, split=True, overlap=0.25, progress=True)
+    # sources: [batch, sources, channels, time]
+    
+    # Denormalize the output
+    sources = sources * std + mean
+    
+    # 4. Save Outputs
+    return _save_sources(sources[0], model.sources, audio_path, output_dir, sr, stem_format)
+
+def _segment_seconds(model):
+    """Longest chunk every model in a bag accepts (htdemucs: 7.8 s)."""
+    models = getattr(model, "models", [model])
+    return min(float(m.segment) for m in models)
+
+def plan_chunks(lengths, segment, overlap=0.25, shifts=1, seed=0):
+    """
+    Chunk grid for a set of songs: a list of (song index, start sample). Each
+    shift re-runs the grid from a random offset of up to half a second, like
+    apply_model's shift trick; starts may be negative (zero-padded).
+    """
+    stride = max(1, int((1 - overlap) * segment))
+    max_shift = DEMUCS_SAMPLE_RATE // 2
+    rng = random.Random(seed)
+    chunks = []
+    for song, length in enumerate(lengths):
+        offsets = [0] if shifts <= 1 else [rng.randint(0, max_shift) for _ in range(shifts)]
+        for offset in offsets:
+            chunks.extend((song, start) for start in range(-offset, length, stride))
+    return chunks
+
+def _chunk_weight(segment, transition_power=1.0):
+    """Triangular overlap-add window, as in demucs.apply."""
+    half = segment // 2
+    weight = torch.cat([torch.arange(1, half + 1), torch.arange(segment - half, 0, -1)]).float()
+    return (weight / weight.max()) ** transition_power
+
+def separate_vocals_batch(
+    audio_paths,
+    output_dir="data/separated",
+    model=None,
+    stem_format="stem",
+    batch_size=8,
+    shifts=5,
+    overlap=0.25
+):
+    """
+    Separates several songs at once. Every song is cut into model-length
+    chunks, chunks from all songs are packed into batches of batch_size for
+    one forward pass each, and the outputs are overlap-added back into
+    per-song buffers. Returns [(vocals_path, no_vocals_path), ...] in input order.
+    """
+    if model is None:
+        model = load_demucs_model()
+    sr = DEMUCS_SAMPLE_RATE
+    segment = int(_segment_seconds(model) * sr)
+    source_count = len(model.sources)
+
+    songs, stats = [], []
+    for path in audio_paths:
+        print(f"Separating vocals for {path}...")
+        wav = _load_for_demucs(path)
+        mean, std = _normalization(wav)
+        songs.append((wav - mean) / std)
+        stats.append((mean, std))
+
+    outputs = [torch.zeros(source_count, wav.shape[0], wav.shape[-1]) for wav in songs]
+    totals = [torch.zeros(wav.shape[-1]) for wav in songs]
+    weight = _chunk_weight(segment)
+    chunks = plan_chunks([wav.shape[-1] for wav in songs], segment, overlap, shifts)
+
+    audio_seconds = sum(wav.shape[-1] for wav in songs) / sr
+    with metrics.current().stage("separation.inference", audio_seconds=audio_seconds, songs=len(songs), chunks=len(chunks)):
+        for first in range(0, len(chunks), batch_size):
+            group = chunks[first:first + batch_size]
+            batch = torch.zeros(len(group), songs[0].shape[0], segment)
+            for row, (song, start) in enumerate(group):
+                lo, hi = max(0, start), min(songs[song].shape[-1], start + segment)
+                batch[row, :, lo - start:hi - start] = songs[song][:, lo:hi]
+
+            estimates = apply_model(model, batch, shifts=0, split=False, progress=False)
+            # estimates: [chunks, sources, channels, segment]
+
+            for row, (song, start) in enumerate(group):
+                lo, hi = max(0, start), min(songs[song].shape[-1], start + segment)
+                w = weight[lo - start:hi - start]
+                outputs[song][..., lo:hi] += estimates[row, ..., lo - start:hi - start] * w
+                totals[song][lo:hi] += w
+
+    results = []
+    for path, sources, total, (mean, std) in zip(audio_paths, outputs, totals, stats):
+        sources = sources / total.clamp_min(1e-8) * std + mean
+        results.append(_save_sources(sources, model.sources, path, output_dir, sr, stem_format))
+    return results
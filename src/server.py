@@ -0,0 +1,425 @@
+# src/server.py
+"""
+Long-running local job server. Whisper, Demucs and XTTS are loaded once at
+startup and shared by every job, so a submitted song only pays for inference.
+
+    python src/server.py --port 8765 --workers 2
+
+Endpoints (HTTP/1.1 on localhost, JSON bodies):
+    POST /jobs               {"input": "song.mp3", "output": "clean.mp3", ...}
+                             -> 202 {"id": ...}, or 503 when the queue is full
+    GET  /jobs/<id>          status, current stage and per-stage timings
+    GET  /jobs/<id>/result   output and EDL paths plus detected words once done
+    GET  /health             model and queue state
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import main as pipeline
+from src import metrics
+from src.audio_utils import get_audio_duration
+from src.edl import build_edl, default_edl_path, save_edl
+from src.scheduler import CostModel, Scheduler
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("transcription", "separation", "synthesis", "mixing")
+DEFAULT_CONCURRENCY = {"transcription": 1, "separation": 1, "synthesis": 1, "mixing": 2}
+# Stages that run the one shared Whisper, Demucs or XTTS model. These models
+# aren't safe to call from several threads (Whisper installs kv-cache hooks on
+# the shared module), so each of these stages takes one job at a time.
+MODEL_STAGES = ("transcription", "separation", "synthesis")
+JOB_OPTIONS = ("use_synth", "bitrate", "passthrough", "patch", "stem_format", "edl", "vad", "refine_boundaries")
+MAX_BODY_BYTES = 64 * 1024
+MAX_FINISHED_JOBS = 1000
+
+_REASONS = {
+    200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+
+class JobServer:
+    """
+    Queue of song jobs processed by a fixed set of workers. Each stage is
+    guarded by its own semaphore, so e.g. one song can be separated while the
+    next is transcribed without two jobs sharing a model at once.
+    """
+
+    def __init__(
+        self,
+        model_size: str = "base",
+        use_synth: bool = True,
+        workers: int = 2,
+        queue_size: int = 16,
+        concurrency: Optional[Dict[str, int]] = None,
+        work_dir: str = "data/jobs",
+        models: Optional[Dict] = None,
+        scheduler: Optional[Scheduler] = None
+    ):
+        self.model_size = model_size
+        self.use_synth = use_synth
+        self.workers = workers
+        self.work_dir = work_dir
+        self.concurrency = dict(DEFAULT_CONCURRENCY, **(concurrency or {}))
+        for stage in MODEL_STAGES:
+            if self.concurrency[stage] > 1:
+                print(f"Warning: {stage} shares one model between jobs; running it one job at a time.")
+                self.concurrency[stage] = 1
+        self.models = models
+        # With a scheduler, each job's Whisper size, Demucs shifts and synth
+        # backend are picked from its deadline and the queue depth.
+        self.scheduler = scheduler
+        self.jobs: Dict[str, Dict] = {}
+        self.queue: Optional[asyncio.Queue] = None
+        self.queue_size = queue_size
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._tasks = []
+        self._server = None
+
+    # --- Models -----------------------------------------------------------
+
+    def load_models(self) -> Dict:
+        """Loads every model once. Synthesis is optional, as in process_song."""
+        from src.separator import load_demucs_model
+
+        models = {"whisper": pipeline.load_whisper_model(self.model_size)}
+        if self.scheduler:
+            models["whisper_models"] = {self.model_size: models["whisper"]}
+            for size in self.scheduler.whisper_sizes:
+                if size not in models["whisper_models"]:
+                    models["whisper_models"][size] = pipeline.load_whisper_model(size)
+        models["demucs"] = load_demucs_model()
+        models["synthesizer"] = None
+        if self.use_synth:
+            try:
+                models["synthesizer"] = pipeline.VoiceSynthesizer()
+            except Exception as e:
+                print(f"Warning: Voice synthesis unavailable, jobs will use silence: {e}")
+        return models
+
+    # --- Lifecycle --------------------------------------------------------
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765):
+        if self.models is None:
+            with metrics.current().stage("server.model_load", model=self.model_size):
+                self.models = await asyncio.to_thread(self.load_models)
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self._limits = {stage: asyncio.Semaphore(max(1, self.concurrency[stage])) for stage in STAGES}
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    # --- Jobs -------------------------------------------------------------
+
+    def submit(self, request: Dict) -> Tuple[int, Dict]:
+        input_path = request.get("input")
+        if not input_path or not os.path.exists(input_path):
+            return 400, {"error": f"Input file not found: {input_path}"}
+
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "id": job_id,
+            "status": "queued",
+            "stage": None,
+            "input": input_path,
+            "output": request.get("output") or os.path.join(self.work_dir, job_id, "clean.mp3"),
+            "options": {key: request[key] for key in JOB_OPTIONS if key in request},
+            "submitted": time.time(),
+            "stages": {},
+            "error": None,
+        }
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            return 503, {"error": "Job queue is full, retry later.", "queued": self.queue.qsize()}
+        self.jobs[job_id] = job
+        self._prune()
+        return 202, {"id": job_id, "status": "queued", "position": self.queue.qsize()}
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if job["status"] in ("done", "failed")]
+        for job in sorted(finished, key=lambda j: j["finished"])[:-MAX_FINISHED_JOBS]:
+            del self.jobs[job["id"]]
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            job["status"] = "running"
+            job["started"] = time.time()
+            try:
+                job["result"] = await self._run_job(job)
+                job["status"] = "done"
+            except Exception as e:
+                logger.exception("Job %s failed", job["id"])
+                job["status"] = "failed"
+                job["error"] = str(e)
+            finally:
+                job["stage"] = None
+                job["finished"] = time.time()
+                self.queue.task_done()
+
+    async def _stage(self, job: Dict, name: str, func, *args, **kwargs):
+        """Runs a blocking stage function in a thread, within that stage's concurrency limit."""
+        job["stage"] = f"waiting:{name}"
+        async with self._limits[name]:
+            job["stage"] = name
+            start = time.perf_counter()
+            result = await asyncio.to_thread(func, *args, **kwargs)
+        job["stages"][name] = round(time.perf_counter() - start, 3)
+        return result
+
+    async def _run_job(self, job: Dict) -> Dict:
+        options = job["options"]
+        input_path, output_path = job["input"], job["output"]
+        job_dir = os.path.join(self.work_dir, job["id"])
+        audio_seconds = get_audio_duration(input_path)
+        use_synth = options.get("use_synth", self.use_synth)
+
+        model_size, whisper_model = self.model_size, self.models["whisper"]
+        if self.scheduler:
+            plan = self.scheduler.plan(audio_seconds, self.queue.qsize(), time.time() - job["submitted"])
+            whisper_models = self.models.get("whisper_models") or {}
+            if plan["whisper"] in whisper_models:
+                model_size, whisper_model = plan["whisper"], whisper_models[plan["whisper"]]
+            job["schedule"] = plan
+        lyrics_data = await self._stage(
+            job, "transcription", pipeline.run_transcription, input_path, model_size,
+            whisper_model=whisper_model, audio_seconds=audio_seconds,
+            vad=options.get("vad", False)
+        )
+        cuss_segments = pipeline.run_detection(lyrics_data)
+
+        shifts = 5
+        if self.scheduler:
+            plan = self.scheduler.plan(
+                audio_seconds, self.queue.qsize(), time.time() - job["submitted"], len(cuss_segments), model_size
+            )
+            shifts = plan["shifts"]
+            use_synth = use_synth and plan["synth"] == "xtts"
+            job["schedule"] = plan
+            metrics.current().emit("schedule", job=job["id"], **plan)
+
+        if not cuss_segments:
+            if not options.get("passthrough"):
+                return {"output": None, "edl": None, "cuss_words": []}
+            await self._stage(job, "mixing", pipeline.write_unedited, input_path, output_path, options.get("bitrate"))
+            return {"output": output_path, "edl": None, "cuss_words": []}
+
+        dsp = shifts == 0
+        if dsp:
+            # The scheduler's cheapest plan: no stems, the mixer suppresses the vocals itself.
+            vocals_path, instrumental_path = None, input_path
+        else:
+            vocals_path, instrumental_path = await self._stage(
+                job, "separation", pipeline.run_separation, input_path,
+                audio_seconds=audio_seconds,
+                stem_format=options.get("stem_format", "stem"),
+                model=self.models["demucs"],
+                output_dir=os.path.join(job_dir, "separated"),
+                shifts=shifts
+            )
+            if options.get("refine_boundaries"):
+                # Reads the vocal stem: off the event loop, but holding no model.
+                cuss_segments = await asyncio.to_thread(pipeline.run_refinement, cuss_segments, vocals_path)
+
+        # Each job synthesizes into its own directory: clip names are only unique per song.
+        synth_dir = os.path.join(job_dir, "synth")
+        synthesizer = self.models.get("synthesizer")
+        if use_synth and synthesizer is not None:
+            try:
+                await self._stage(
+                    job, "synthesis", pipeline.run_synthesis, cuss_segments, vocals_path or input_path,
+                    synth_dir=synth_dir, synthesizer=synthesizer
+                )
+            except Exception as e:
+                print(f"Warning: Voice synthesis failed for job {job['id']}: {e}")
+
+        edl_path = options.get("edl") or default_edl_path(output_path)
+        save_edl(
+            build_edl(
+                input_path, cuss_segments, vocals_path, instrumental_path,
+                synth_dir=synth_dir, schedule=job.get("schedule"), dsp=dsp
+            ),
+            edl_path
+        )
+
+        await self._stage(
+            job, "mixing", pipeline.run_mixing, input_path, output_path, cuss_segments,
+            vocals_path, instrumental_path,
+            audio_seconds=audio_seconds,
+            bitrate=options.get("bitrate"),
+            passthrough=options.get("passthrough", False),
+            patch=options.get("patch", False),
+            synth_dir=synth_dir,
+            dsp=dsp
+        )
+        words = [{key: seg[key] for key in ("word", "replacement", "start", "end")} for seg in cuss_segments]
+        return {"output": output_path, "edl": edl_path, "cuss_words": words}
+
+    # --- HTTP -------------------------------------------------------------
+
+    def health(self) -> Dict:
+        running = sum(1 for job in self.jobs.values() if job["status"] == "running")
+        return {
+            "status": "ok",
+            "models": sorted(name for name, model in (self.models or {}).items() if model is not None),
+            "queued": self.queue.qsize() if self.queue else 0,
+            "queue_size": self.queue_size,
+            "running": running,
+            "concurrency": self.concurrency,
+        }
+
+    def route(self, method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        parts = [part for part in path.split("/") if part]
+        if parts == ["health"]:
+            return (200, self.health()) if method == "GET" else (405, {"error": "Use GET"})
+
+        if parts == ["jobs"]:
+            if method != "POST":
+                return 405, {"error": "Use POST to submit a job"}
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError:
+                return 400, {"error": "Body must be JSON"}
+            if not isinstance(request, dict):
+                return 400, {"error": "Body must be a JSON object"}
+            return self.submit(request)
+
+        if len(parts) in (2, 3) and parts[0] == "jobs":
+            if method != "GET":
+                return 405, {"error": "Use GET"}
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return 404, {"error": f"Unknown job {parts[1]}"}
+            if len(parts) == 2:
+                return 200, {key: value for key, value in job.items() if key != "result"}
+            if parts[2] == "result":
+                if job["status"] == "failed":
+                    return 200, {"id": job["id"], "status": "failed", "error": job["error"]}
+                if job["status"] != "done":
+                    return 409, {"id": job["id"], "status": job["status"], "error": "Job has not finished"}
+                return 200, dict(job["result"], id=job["id"], status="done")
+
+        return 404, {"error": f"No route for {path}"}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        headers = {}
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                key, _, value = line.decode("latin-1").partition(":")
+                headers[key.strip().lower()] = value.strip()
+            length = int(headers.get("content-length") or 0)
+            if length > MAX_BODY_BYTES:
+                status, payload = 413, {"error": "Request body too large"}
+            else:
+                body = await reader.readexactly(length) if length else b""
+                status, payload = self.route(method.upper(), target.split("?", 1)[0], body)
+        except (ValueError, asyncio.IncompleteReadError):
+            status, payload = 400, {"error": "Malformed request"}
+
+        data = json.dumps(payload).encode("utf-8")
+        head = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(data)}",
+            "Connection: close",
+        ]
+        if status == 503:
+            head.append("Retry-After: 5")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+async def serve(server: JobServer, host: str, port: int):
+    port = await server.start(host, port)
+    print(f"CleanMusic job server listening on http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CleanMusic: local job server with warm models.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (keep this on localhost).")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    parser.add_argument("--workers", type=int, default=2, help="Songs processed at once (across all stages).")
+    parser.add_argument("--queue_size", type=int, default=16, help="Queued jobs before submissions get 503.")
+    parser.add_argument(
+        "--mixing_concurrency", type=int, default=DEFAULT_CONCURRENCY["mixing"],
+        help="Jobs allowed in the mixing stage at once (the model stages take one at a time)."
+    )
+    parser.add_argument("--work_dir", default="data/jobs", help="Per-job stems, synth clips and default outputs.")
+    parser.add_argument("--model_size", default="base", help="Whisper model size (tiny, base, small, medium, large).")
+    parser.add_argument("--latency_target", type=float, default=None, help="Seconds from submission each job should take; degrades quality under load to meet it.")
+    parser.add_argument("--min_model_size", default="tiny", help="Smallest Whisper model the latency target may fall back to.")
+    parser.add_argument("--cost_metrics", nargs="*", default=None, help="Metrics JSONL files to fit stage costs from (default: --metrics_file).")
+    parser.add_argument("--allow_dsp", action="store_true", help="Let --latency_target fall back to DSP vocal suppression (no Demucs) under heavy load.")
+    parser.add_argument("--no_use_synth", dest="use_synth", action="store_false", help="Disable voice synthesis.")
+    parser.add_argument("--metrics_file", default=None, help="Append per-stage metrics as JSON lines to this file.")
+    parser.add_argument("--log_level", default="WARNING", help="Logging level (DEBUG, INFO, WARNING, ERROR).")
+    parser.set_defaults(use_synth=True)
+    args = parser.parse_args()
+    metrics.configure_logging(args.log_level)
+
+    scheduler = None
+    if args.latency_target:
+        cost_files = args.cost_metrics if args.cost_metrics is not None else [args.metrics_file] if args.metrics_file else []
+        try:
+            scheduler = Scheduler(
+                args.latency_target,
+                CostModel.from_metrics(path for path in cost_files if os.path.exists(path)),
+                max_model_size=args.model_size,
+                min_model_size=args.min_model_size,
+                use_synth=args.use_synth,
+                workers=args.workers,
+                allow_dsp=args.allow_dsp
+            )
+        except ValueError as e:
+            parser.error(str(e))
+
+    metrics.activate(metrics.PipelineMetrics(sink_path=args.metrics_file, run_id="server", keep_records=False))
+    server = JobServer(
+        model_size=args.model_size,
+        use_synth=args.use_synth,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        concurrency={"mixing": args.mixing_concurrency},
+        work_dir=args.work_dir,
+        scheduler=scheduler,
+    )
+    try:
+        asyncio.run(serve(server, args.host, args.port))
+    except KeyboardInterrupt:
+        print("Shutting down.")
+    finally:
+        metrics.current().emit_summary()
+
+if __name__ == "__main__":
+    main()
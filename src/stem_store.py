@@ -0,0 +1,100 @@
+# src/stem_store.py
+"""
+Raw, memory-mappable stem files.
+
+A .stem file is a 64-byte little-endian header followed by interleaved
+(frames, channels) samples as float32 or int16. Opening one maps it read-only,
+so readers get zero-copy views, only touch the pages they slice, and every
+process reading the same cached stem shares the OS page cache.
+"""
+import os
+import struct
+from typing import Optional
+
+import numpy as np
+
+STEM_EXTENSION = ".stem"
+MAGIC = b"CMSTEM\x00\x00"
+VERSION = 1
+HEADER_SIZE = 64
+# magic, version, dtype code, channels, sample rate, frames
+_HEADER = struct.Struct("<8sHHIIQ")
+
+_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<i2")}
+_DTYPE_CODES = {"float32": 1, "int16": 2}
+_INT16_SCALE = 32768.0
+
+
+def is_stem_path(path: Optional[str]) -> bool:
+    return bool(path) and str(path).lower().endswith(STEM_EXTENSION)
+
+
+class Stem:
+    """A read-only memory-mapped stem. data is a (frames, channels) view of the file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) < _HEADER.size:
+            raise ValueError(f"Truncated stem file: {path}")
+        magic, version, dtype_code, channels, sample_rate, frames = _HEADER.unpack_from(header)
+        if magic != MAGIC or version != VERSION or dtype_code not in _DTYPES:
+            raise ValueError(f"Not a CleanMusic stem file: {path}")
+
+        self.path = path
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.frames = frames
+        self.dtype = _DTYPES[dtype_code]
+        if frames:
+            self.data = np.memmap(path, dtype=self.dtype, mode="r", offset=HEADER_SIZE, shape=(frames, channels))
+        else:
+            self.data = np.zeros((0, channels), dtype=self.dtype)
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.sample_rate if self.sample_rate else 0.0
+
+    def read(self, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Returns frames [start, stop) as float32. For float32 stems this is a
+        view into the mapping; int16 stems are converted (a copy of the slice only).
+        """
+        view = self.data[max(0, start):stop]
+        if self.dtype.kind == "f":
+            return view
+        return view.astype(np.float32) / _INT16_SCALE
+
+
+def open_stem(path: str) -> Stem:
+    return Stem(path)
+
+
+def write_stem(path: str, data: np.ndarray, sample_rate: int, dtype: str = "float32") -> str:
+    """
+    Writes a (frames, channels) or (frames,) float buffer as a stem file.
+    The file is written next to its final name and renamed into place, so
+    readers sharing a cache directory never see a partial stem.
+    """
+    if dtype not in _DTYPE_CODES:
+        raise ValueError(f"Unsupported stem dtype: {dtype}")
+    samples = np.asarray(data, dtype=np.float32)
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    frames, channels = samples.shape
+
+    if dtype == "int16":
+        samples = np.clip(np.round(samples * _INT16_SCALE), -32768, 32767).astype("<i2")
+    else:
+        samples = samples.astype("<f4", copy=False)
+
+    header = _HEADER.pack(MAGIC, VERSION, _DTYPE_CODES[dtype], channels, int(sample_rate), frames)
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header.ljust(HEADER_SIZE, b"\x00"))
+        f.write(np.ascontiguousarray(samples).tobytes())
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,369 @@
+# src/streaming.py
+"""
+Broadcast-delay censoring for live audio. Raw PCM is read in fixed blocks,
+held in a delay line (7 s by default) and written out exactly that much
+later. Meanwhile a background thread transcribes a rolling window of the
+input every step_s seconds, and detected cuss words are muted (or replaced
+with a pre-rendered clip) inside the delay line before they are emitted.
+
+    ffmpeg -i <live source> -f s16le -ar 44100 -ac 2 - \\
+        | python src/streaming.py --delay 7 --model_size tiny \\
+        | ffmpeg -f s16le -ar 44100 -ac 2 -i - <live sink>
+
+Output latency is fixed at the delay whatever the model does. If transcription
+falls behind, stale windows are skipped (only the newest one waits), so the
+backlog stays bounded. A word whose edit arrives after it was emitted is
+counted as late. For a word to be caught, step_s plus the window's
+transcription time plus the word's length must stay under the delay; see
+benchmarks/bench_streaming.py.
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.audio_utils import fit_frames, resample_array
+from src.censor_manager import detect_cuss_words
+from src.lyrics import WHISPER_SAMPLE_RATE
+from src.resample import StreamResampler
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_FORMATS = {"s16le": np.int16, "f32le": np.float32}
+
+
+class DelayLine:
+    """Fixed delay over (frames, channels) audio. Frames are addressed by their absolute input index."""
+
+    def __init__(self, delay_frames: int, channels: int):
+        self.delay_frames = delay_frames
+        self.buffer = np.zeros((delay_frames, channels), dtype=np.float32)
+        self.written = 0
+
+    @property
+    def oldest(self) -> int:
+        """Absolute index of the oldest frame still held (not yet emitted)."""
+        return max(0, self.written - self.delay_frames)
+
+    def push(self, block: np.ndarray) -> np.ndarray:
+        """Stores block and returns the frames that were delay_frames behind it (silence at first)."""
+        if len(block) > self.delay_frames:
+            raise ValueError("Blocks must be shorter than the delay.")
+        positions = (self.written + np.arange(len(block))) % self.delay_frames
+        out = self.buffer[positions]
+        self.buffer[positions] = block
+        self.written += len(block)
+        return out
+
+    def drain(self) -> np.ndarray:
+        """Everything still held, oldest first (end of stream)."""
+        held = min(self.written, self.delay_frames)
+        positions = (self.written - held + np.arange(held)) % self.delay_frames
+        return self.buffer[positions]
+
+    def _held(self, start: int, end: int) -> Tuple[int, int]:
+        return max(start, self.oldest), min(end, self.written)
+
+    def emitted(self, start: int, end: int) -> int:
+        """How many frames of [start, end) have already been emitted."""
+        return max(0, min(end, self.oldest) - start)
+
+    def scale(self, start: int, end: int, gain: Callable[[np.ndarray], np.ndarray]):
+        """Multiplies the held frames in [start, end) by gain(frame indices)."""
+        lo, hi = self._held(start, end)
+        if hi > lo:
+            frames = np.arange(lo, hi)
+            self.buffer[frames % self.delay_frames] *= gain(frames)[:, None]
+
+    def add(self, start: int, samples: np.ndarray):
+        lo, hi = self._held(start, start + len(samples))
+        if hi > lo:
+            self.buffer[np.arange(lo, hi) % self.delay_frames] += samples[lo - start:hi - start]
+
+
+def _mute_gain(start: int, end: int, fade: int) -> Callable[[np.ndarray], np.ndarray]:
+    """1 outside [start, end), 0 inside, with linear fade frames on both sides."""
+    def gain(frames: np.ndarray) -> np.ndarray:
+        if fade <= 0:
+            return ((frames < start) | (frames >= end)).astype(np.float32)
+        edge = np.minimum(frames - (start - fade), (end + fade) - frames) / fade
+        return 1.0 - np.clip(edge, 0.0, 1.0).astype(np.float32)
+    return gain
+
+
+def whisper_transcriber(model) -> Callable[[np.ndarray, float], List[Dict]]:
+    """Adapts a Whisper model to StreamCensor's transcribe(audio_16k, offset_s) callable."""
+    from src.lyrics import transcribe_array
+
+    return lambda audio, offset_s: transcribe_array(model, audio)
+
+
+class StreamCensor:
+    """
+    Delay line plus rolling-window transcription. Feed blocks to process()
+    in input order; it returns the delayed, censored output of the same
+    length. Call close() at the end of the stream for the tail.
+
+    transcribe(audio, offset_s) gets the window as mono float32 at 16 kHz
+    plus its start in stream seconds, and returns words with times relative
+    to the window.
+    """
+
+    def __init__(
+        self,
+        transcribe: Callable[[np.ndarray, float], List[Dict]],
+        sample_rate: int,
+        channels: int,
+        delay_s: float = 7.0,
+        window_s: float = 6.0,
+        step_s: float = 2.0,
+        mode: str = "mute",
+        fade_ms: float = 20.0,
+        pad_ms: float = 50.0,
+        clip_dir: Optional[str] = None
+    ):
+        if window_s < step_s:
+            raise ValueError("window_s must be at least step_s, or audio between windows is never transcribed.")
+        self.transcribe = transcribe
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.delay = DelayLine(int(delay_s * sample_rate), channels)
+        self.step = int(step_s * sample_rate)
+        self.mode = mode
+        self.fade = int(fade_ms * sample_rate / 1000)
+        self.pad = int(pad_ms * sample_rate / 1000)
+        self.clip_dir = clip_dir
+        self._clips: Dict[str, Optional[np.ndarray]] = {}
+
+        # Input is resampled to Whisper's rate once, as it arrives, rather than per (overlapping) window.
+        self._resampler = StreamResampler(sample_rate, WHISPER_SAMPLE_RATE)
+        self._whisper_window = int(window_s * WHISPER_SAMPLE_RATE)
+        self._history = np.zeros(self._whisper_window, dtype=np.float32)  # mono ring of the last window_s at 16 kHz
+        self._next_window = self.step
+        self._applied: List[Tuple[int, int, str]] = []
+        self._edits: List[Tuple[int, int, str]] = []
+        self._pending: Optional[Tuple[int, np.ndarray]] = None
+        self._busy = False
+        self._closing = False
+        self._cond = threading.Condition()
+        self.stats = {
+            "blocks": 0, "windows": 0, "skipped_windows": 0, "edits": 0, "late_edits": 0,
+            "late_frames": 0, "transcribe_s": 0.0, "transcribed_s": 0.0, "max_transcribe_s": 0.0,
+            "max_decision_lag_s": 0.0,
+        }
+        self._thread = threading.Thread(target=self._transcriber, daemon=True)
+        self._thread.start()
+
+    # --- Input side -------------------------------------------------------
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        block = fit_frames(block, len(block), self.channels)
+        self._apply_edits()
+        self._remember(block.mean(axis=1))
+        out = self.delay.push(block)
+        self.stats["blocks"] += 1
+        if self.delay.written >= self._next_window:
+            self._post_window()
+            self._next_window += self.step
+        return out
+
+    def close(self) -> np.ndarray:
+        """Transcribes the last window, waits for it, and returns everything still held."""
+        self._post_window()
+        with self._cond:
+            while self._pending is not None or self._busy:
+                self._cond.wait()
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._apply_edits()
+        return self.delay.drain()
+
+    def _remember(self, mono: np.ndarray):
+        mono = self._resampler.process(mono)[-self._whisper_window:]
+        self._history = np.concatenate([self._history[len(mono):], mono])
+
+    def _post_window(self):
+        # The resampler trails the input by a few samples; the window ends where its output does.
+        count = min(self._resampler.produced, self._whisper_window)
+        window = self._history[self._whisper_window - count:].copy()
+        start = int(round((self._resampler.produced - count) * self.sample_rate / WHISPER_SAMPLE_RATE))
+        with self._cond:
+            if self._pending is not None:
+                # The transcriber is behind; only the newest window is worth waiting for.
+                self.stats["skipped_windows"] += 1
+            self._pending = (start, window)
+            self._cond.notify_all()
+
+    # --- Transcription thread ---------------------------------------------
+
+    def _transcriber(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closing:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                start, window = self._pending
+                self._pending = None
+                self._busy = True
+            try:
+                self._transcribe_window(start, window)
+            except Exception:
+                logger.exception("Transcription of the window at %.1fs failed", start / self.sample_rate)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _transcribe_window(self, start: int, window: np.ndarray):
+        offset_s = start / self.sample_rate
+        began = time.perf_counter()
+        words = self.transcribe(window, offset_s)
+        elapsed = time.perf_counter() - began
+
+        edits = []
+        for seg in detect_cuss_words(words):
+            edit_start = start + int(round(seg["start"] * self.sample_rate)) - self.pad
+            edit_end = start + int(round(seg["end"] * self.sample_rate)) + self.pad
+            edits.append((max(0, edit_start), edit_end, seg["replacement"]))
+        with self._cond:
+            self._edits.extend(edits)
+            self.stats["windows"] += 1
+            self.stats["transcribe_s"] += elapsed
+            self.stats["transcribed_s"] += len(window) / WHISPER_SAMPLE_RATE
+            self.stats["max_transcribe_s"] = max(self.stats["max_transcribe_s"], elapsed)
+
+    # --- Edits ------------------------------------------------------------
+
+    def _apply_edits(self):
+        with self._cond:
+            edits, self._edits = self._edits, []
+        for start, end, replacement in edits:
+            # Overlapping windows find the same word again.
+            if any(start < a_end and a_start < end and replacement == a_rep for a_start, a_end, a_rep in self._applied):
+                continue
+            self._applied.append((start, end, replacement))
+            self._applied = self._applied[-256:]
+            late = self.delay.emitted(start, end)
+            self.delay.scale(start - self.fade, end + self.fade, _mute_gain(start, end, self.fade))
+            clip = self._clip(replacement, end - start) if self.mode == "replace" else None
+            if clip is not None:
+                self.delay.add(start, clip)
+            self.stats["edits"] += 1
+            self.stats["max_decision_lag_s"] = max(
+                self.stats["max_decision_lag_s"], (self.delay.written - end) / self.sample_rate
+            )
+            if late:
+                self.stats["late_edits"] += 1
+                self.stats["late_frames"] += late
+                logger.warning("Edit for '%s' at %.2fs arrived %.2fs too late", replacement,
+                               start / self.sample_rate, late / self.sample_rate)
+
+    def _clip(self, replacement: str, frames: int) -> Optional[np.ndarray]:
+        """<clip_dir>/<replacement>.wav at the stream's rate, fitted to frames with a short fade-out."""
+        if replacement not in self._clips:
+            path = os.path.join(self.clip_dir or "", f"{replacement}.wav")
+            clip = None
+            if self.clip_dir and os.path.exists(path):
+                data, rate = sf.read(path, dtype="float32", always_2d=True)
+                clip = resample_array(data, rate, self.sample_rate)
+            self._clips[replacement] = clip
+        clip = self._clips[replacement]
+        if clip is None:
+            return None
+        fitted = fit_frames(clip, frames, self.channels).copy()
+        fade = min(self.fade, frames)
+        if fade:
+            fitted[-fade:] *= np.linspace(1.0, 0.0, fade, dtype=np.float32)[:, None]
+        return fitted
+
+
+def _decode(raw: bytes, sample_format: str, channels: int) -> np.ndarray:
+    data = np.frombuffer(raw, dtype=SAMPLE_FORMATS[sample_format]).reshape(-1, channels)
+    if sample_format == "s16le":
+        return data.astype(np.float32) / 32768.0
+    return data.astype(np.float32)
+
+
+def _encode(block: np.ndarray, sample_format: str) -> bytes:
+    if sample_format == "s16le":
+        return (np.clip(block, -1.0, 1.0) * 32767.0).astype(np.int16).tobytes()
+    return block.astype(np.float32).tobytes()
+
+
+def run_stream(censor: StreamCensor, source, sink, sample_format: str = "s16le", block_ms: float = 100.0) -> Dict:
+    """Pumps raw PCM from source to sink (binary file objects) through censor until EOF. Returns its stats."""
+    frame_bytes = np.dtype(SAMPLE_FORMATS[sample_format]).itemsize * censor.channels
+    block_bytes = int(censor.sample_rate * block_ms / 1000) * frame_bytes
+    pending = b""
+    while True:
+        chunk = source.read(block_bytes - len(pending))
+        if not chunk:
+            break
+        pending += chunk
+        if len(pending) < block_bytes:
+            continue
+        sink.write(_encode(censor.process(_decode(pending, sample_format, censor.channels)), sample_format))
+        sink.flush()
+        pending = b""
+    usable = len(pending) - len(pending) % frame_bytes
+    if usable:
+        sink.write(_encode(censor.process(_decode(pending[:usable], sample_format, censor.channels)), sample_format))
+    sink.write(_encode(censor.close(), sample_format))
+    sink.flush()
+    return censor.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CleanMusic: broadcast-delay censoring of a live PCM stream (stdin -> stdout).")
+    parser.add_argument("--sample_rate", type=int, default=44100, help="Input sample rate.")
+    parser.add_argument("--channels", type=int, default=2, help="Input channel count.")
+    parser.add_argument("--format", default="s16le", choices=sorted(SAMPLE_FORMATS), help="Raw sample format in and out.")
+    parser.add_argument("--delay", type=float, default=7.0, help="Broadcast delay in seconds.")
+    parser.add_argument("--window", type=float, default=6.0, help="Seconds of audio per transcription window.")
+    parser.add_argument("--step", type=float, default=2.0, help="Seconds between transcription windows.")
+    parser.add_argument("--block_ms", type=float, default=100.0, help="Read/write block size.")
+    parser.add_argument("--mode", default="mute", choices=["mute", "replace"], help="Mute cuss words, or lay <clip_dir>/<replacement>.wav over them.")
+    parser.add_argument("--clip_dir", default=None, help="Pre-rendered replacement clips for --mode replace.")
+    parser.add_argument("--fade_ms", type=float, default=20.0, help="Fade in/out around each edit.")
+    parser.add_argument("--model_size", default="tiny", help="Whisper model size (tiny, base, small, medium, large).")
+    parser.add_argument("--log_level", default="WARNING", help="Logging level (DEBUG, INFO, WARNING, ERROR).")
+    args = parser.parse_args()
+
+    from src import metrics
+    from src.lyrics import load_whisper_model
+    metrics.configure_logging(args.log_level)
+
+    # stdout carries the audio, so every message goes to stderr: text printed
+    # by the model loader (or any library) would otherwise land in the stream.
+    audio_out = sys.stdout.buffer
+    with contextlib.redirect_stdout(sys.stderr):
+        censor = StreamCensor(
+            whisper_transcriber(load_whisper_model(args.model_size)),
+            args.sample_rate,
+            args.channels,
+            delay_s=args.delay,
+            window_s=args.window,
+            step_s=args.step,
+            mode=args.mode,
+            fade_ms=args.fade_ms,
+            clip_dir=args.clip_dir
+        )
+        print(f"Streaming with a {args.delay:.1f}s delay...")
+        try:
+            stats = run_stream(censor, sys.stdin.buffer, audio_out, args.format, args.block_ms)
+        except (KeyboardInterrupt, BrokenPipeError):
+            stats = censor.stats
+        print(f"Stream ended: {stats}")
+
+if __name__ == "__main__":
+    main()
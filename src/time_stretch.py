@@ -0,0 +1,109 @@
+# src/time_stretch.py
+"""
+Time-scale modification for the replacement clips: XTTS says the word at
+its own pace, and the clip has to fill exactly the cussed word's slot.
+
+Two backends:
+- "wsola" (default): waveform-similarity overlap-add in NumPy. Short frames
+  are copied from the input at the stretched positions. Each frame is
+  shifted by up to TOLERANCE_MS to the offset that best continues the
+  previous one, so pitch periods line up and nothing is resynthesized. For
+  sub-second words this is faster than the phase vocoder and sounds less
+  phasey.
+- "phase_vocoder": STFT, torchaudio's TimeStretch and ISTFT (needs torch).
+
+Both take (channels, frames) or (frames,) float arrays and return exactly
+target_samples frames.
+"""
+from typing import Dict
+
+import numpy as np
+
+BACKENDS = ("wsola", "phase_vocoder")
+
+FRAME_MS = 30.0
+# Search range around each frame's nominal position; covers one pitch period down to 100 Hz.
+TOLERANCE_MS = 10.0
+
+N_FFT = 1024
+HOP_LENGTH = 512
+_stretchers: Dict[int, object] = {}
+
+
+def _fit(samples: np.ndarray, target_samples: int) -> np.ndarray:
+    """Trims or zero-pads the last axis to target_samples."""
+    if samples.shape[-1] >= target_samples:
+        return samples[..., :target_samples]
+    pad = [(0, 0)] * (samples.ndim - 1) + [(0, target_samples - samples.shape[-1])]
+    return np.pad(samples, pad)
+
+
+def wsola_stretch(samples: np.ndarray, sample_rate: int, target_samples: int) -> np.ndarray:
+    """WSOLA time stretch of samples to target_samples frames, keeping the pitch."""
+    samples = np.asarray(samples, dtype=np.float32)
+    mono_input = samples.ndim == 1
+    audio = samples[None, :] if mono_input else samples
+    frames = audio.shape[-1]
+    if frames == 0 or target_samples <= 0:
+        out = np.zeros((audio.shape[0], max(0, target_samples)), dtype=np.float32)
+        return out[0] if mono_input else out
+
+    length = max(4, int(sample_rate * FRAME_MS / 1000) // 2 * 2)
+    synthesis_hop = length // 2
+    tolerance = max(1, int(sample_rate * TOLERANCE_MS / 1000))
+    analysis_hop = synthesis_hop * frames / target_samples
+    window = np.hanning(length + 1)[:-1].astype(np.float32)  # periodic: sums to 1 at half overlap
+
+    count = target_samples // synthesis_hop + 2
+    # Zero padding lets every frame (and its search range) read past both ends.
+    padded = np.pad(audio, ((0, 0), (tolerance, length + tolerance + int(count * analysis_hop) - frames + synthesis_hop)))
+    guide = padded.mean(axis=0)
+    out = np.zeros((audio.shape[0], (count - 1) * synthesis_hop + length), dtype=np.float32)
+    weight = np.zeros(out.shape[-1], dtype=np.float32)
+
+    position = tolerance  # frame 0 starts at the input's first sample
+    for k in range(count):
+        if k:
+            nominal = tolerance + int(round(k * analysis_hop))
+            # The frame that would naturally follow the previous one, and where the best match for it is.
+            continuation = guide[position + synthesis_hop:position + synthesis_hop + length]
+            region = guide[nominal - tolerance:nominal + tolerance + length]
+            position = nominal - tolerance + int(np.argmax(np.correlate(region, continuation, mode="valid")))
+        start = k * synthesis_hop
+        out[:, start:start + length] += padded[:, position:position + length] * window
+        weight[start:start + length] += window
+
+    out = out[:, :target_samples] / np.maximum(weight[:target_samples], 1e-3)
+    return out[0] if mono_input else out
+
+
+def phase_vocoder_stretch(samples: np.ndarray, sample_rate: int, target_samples: int) -> np.ndarray:
+    """Phase-vocoder time stretch (torch STFT + torchaudio TimeStretch)."""
+    import torch
+    import torchaudio
+
+    samples = np.asarray(samples, dtype=np.float32)
+    waveform = torch.from_numpy(samples[None, :] if samples.ndim == 1 else samples)
+    rate = waveform.shape[-1] / target_samples
+    # Pad if too short for one STFT frame
+    if waveform.shape[-1] < N_FFT:
+        waveform = torch.nn.functional.pad(waveform, (0, N_FFT - waveform.shape[-1]))
+    window = torch.hann_window(N_FFT)
+    stft = torch.stft(waveform, n_fft=N_FFT, hop_length=HOP_LENGTH, window=window, return_complex=True)
+    stretcher = _stretchers.get(HOP_LENGTH)
+    if stretcher is None:
+        stretcher = _stretchers[HOP_LENGTH] = torchaudio.transforms.TimeStretch(hop_length=HOP_LENGTH, n_freq=N_FFT // 2 + 1)
+    stretched = stretcher(stft, rate)
+    out = torch.istft(stretched, n_fft=N_FFT, hop_length=HOP_LENGTH, window=window, length=target_samples).numpy()
+    return out[0] if samples.ndim == 1 else out
+
+
+def stretch(samples: np.ndarray, sample_rate: int, target_samples: int, backend: str = "wsola") -> np.ndarray:
+    """Time-stretches samples to exactly target_samples frames with the given backend."""
+    if backend == "wsola":
+        out = wsola_stretch(samples, sample_rate, target_samples)
+    elif backend == "phase_vocoder":
+        out = phase_vocoder_stretch(samples, sample_rate, target_samples)
+    else:
+        raise ValueError(f"Unknown time stretch backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+    return _fit(out, target_samples)
@@ -0,0 +1,185 @@
+# src/vad.py
+"""
+Cheap voice-activity detection so Whisper only decodes sections with vocals.
+
+Frames are scored from the energy and spectral flux of the 150 Hz - 4 kHz band
+at 16 kHz, all vectorized with NumPy. On a separated vocal stem energy alone
+is reliable. On the full mix the gate is deliberately conservative: it only
+drops near-silent and spectrally static stretches (silence, held pads, long
+fades), because a missed word costs far more than a few extra seconds decoded.
+"""
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.audio_utils import resample_array
+from src.stem_store import is_stem_path, open_stem
+
+logger = logging.getLogger(__name__)
+
+VAD_SAMPLE_RATE = 16000
+FRAME = 512  # 32 ms
+HOP = 320    # 20 ms
+BAND_HZ = (150.0, 4000.0)
+BLOCK_FRAMES = 2048
+
+# Per-source gate parameters: levels in dB relative to the loudest/quietest frames,
+# and a minimum normalized flux (about 0 for held tones, 0.2+ for voice or noise).
+SOURCE_PARAMS = {
+    "vocals": {"range_db": 40.0, "floor_margin_db": 10.0, "min_flux": 0.0},
+    "mix": {"range_db": 30.0, "floor_margin_db": 0.0, "min_flux": 0.05},
+}
+
+
+def load_mono(path: str, sample_rate: int = VAD_SAMPLE_RATE) -> np.ndarray:
+    """Reads an audio file or .stem as mono float32 at sample_rate."""
+    if is_stem_path(path):
+        stem = open_stem(path)
+        data, source_rate = stem.read(), stem.sample_rate
+    else:
+        data, source_rate = sf.read(path, dtype="float32", always_2d=True)
+    mono = np.asarray(data, dtype=np.float32).mean(axis=1)
+    return resample_array(mono, source_rate, sample_rate)
+
+
+def frame_features(
+    mono: np.ndarray,
+    sample_rate: int = VAD_SAMPLE_RATE,
+    frame: int = FRAME,
+    hop: int = HOP,
+    band_hz: Tuple[float, float] = BAND_HZ
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (band energy in dB, normalized spectral flux) per hop-sample frame.
+    Frames are transformed BLOCK_FRAMES at a time to bound memory on long songs.
+    """
+    if len(mono) < frame:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+    frames = sliding_window_view(mono, frame)[::hop]
+    window = np.hanning(frame).astype(np.float32)
+    freqs = np.fft.rfftfreq(frame, 1.0 / sample_rate)
+    band = (freqs >= band_hz[0]) & (freqs <= band_hz[1])
+
+    energy = np.empty(len(frames), dtype=np.float32)
+    flux = np.empty(len(frames), dtype=np.float32)
+    previous = None
+    for start in range(0, len(frames), BLOCK_FRAMES):
+        block = frames[start:start + BLOCK_FRAMES] * window
+        magnitude = np.abs(np.fft.rfft(block, axis=1))[:, band].astype(np.float32)
+        energy[start:start + len(block)] = 10.0 * np.log10(np.mean(magnitude ** 2, axis=1) + 1e-10)
+
+        shifted = np.vstack([magnitude[:1] if previous is None else previous, magnitude[:-1]])
+        rise = np.maximum(magnitude - shifted, 0.0).sum(axis=1)
+        flux[start:start + len(block)] = rise / (magnitude.sum(axis=1) + 1e-6)
+        previous = magnitude[-1:]
+    return energy, flux
+
+
+def _runs(active: np.ndarray) -> List[Tuple[int, int]]:
+    """[start, stop) frame runs where active is True."""
+    edges = np.diff(np.concatenate([[0], active.astype(np.int8), [0]]))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def voiced_intervals(
+    mono: np.ndarray,
+    sample_rate: int = VAD_SAMPLE_RATE,
+    source: str = "mix",
+    min_speech_ms: float = 200,
+    min_silence_ms: float = 1000,
+    pad_ms: float = 400
+) -> List[Tuple[float, float]]:
+    """
+    Returns sorted, non-overlapping (start, end) seconds that likely contain
+    vocals. Gaps shorter than min_silence_ms are bridged, runs shorter than
+    min_speech_ms dropped, and every interval padded by pad_ms.
+    """
+    params = SOURCE_PARAMS[source]
+    energy, flux = frame_features(mono, sample_rate)
+    if len(energy) == 0:
+        return []
+
+    peak_db = np.percentile(energy, 99)
+    floor_db = np.percentile(energy, 10)
+    threshold = max(peak_db - params["range_db"], floor_db + params["floor_margin_db"])
+    active = energy > threshold
+    if params["min_flux"]:
+        # Smooth over ~200 ms so syllable-rate changes count, not single onsets.
+        smoothed = np.convolve(flux, np.ones(10, dtype=np.float32) / 10, mode="same")
+        active &= smoothed > params["min_flux"]
+
+    hop_s = HOP / sample_rate
+    merged: List[List[float]] = []
+    for start, stop in _runs(active):
+        begin, end = start * hop_s, (stop - 1) * hop_s + FRAME / sample_rate
+        if merged and begin - merged[-1][1] < min_silence_ms / 1000.0:
+            merged[-1][1] = end
+        else:
+            merged.append([begin, end])
+
+    duration = len(mono) / sample_rate
+    intervals: List[Tuple[float, float]] = []
+    for begin, end in merged:
+        if end - begin < min_speech_ms / 1000.0:
+            continue
+        begin = max(0.0, begin - pad_ms / 1000.0)
+        end = min(duration, end + pad_ms / 1000.0)
+        if intervals and begin <= intervals[-1][1]:
+            intervals[-1] = (intervals[-1][0], end)
+        else:
+            intervals.append((begin, end))
+    return intervals
+
+
+def detect_voiced_intervals(path: str, source: str = "mix") -> Tuple[List[Tuple[float, float]], float]:
+    """Runs the VAD on a file. Returns (intervals, song duration in seconds)."""
+    mono = load_mono(path)
+    intervals = voiced_intervals(mono, VAD_SAMPLE_RATE, source=source)
+    duration = len(mono) / VAD_SAMPLE_RATE
+    logger.debug("VAD on %s (%s): %d intervals, %.1fs of %.1fs voiced",
+                 path, source, len(intervals), sum(e - s for s, e in intervals), duration)
+    return intervals, duration
+
+
+def gather_intervals(
+    audio: np.ndarray,
+    sample_rate: int,
+    intervals: List[Tuple[float, float]],
+    gap_s: float = 0.5
+) -> Tuple[np.ndarray, List[Tuple[float, float, float]]]:
+    """
+    Concatenates the voiced intervals of a mono buffer into one clip with
+    gap_s of silence between pieces (so Whisper does not run words together).
+    Returns (clip, spans) where each span is (clip_start, song_start, length) in seconds.
+    """
+    gap = np.zeros(int(gap_s * sample_rate), dtype=np.float32)
+    pieces, spans = [], []
+    position = 0
+    for begin, end in intervals:
+        piece = audio[int(begin * sample_rate):int(end * sample_rate)]
+        if len(piece) == 0:
+            continue
+        if pieces:
+            pieces.append(gap)
+            position += len(gap)
+        spans.append((position / sample_rate, begin, len(piece) / sample_rate))
+        pieces.append(piece)
+        position += len(piece)
+    clip = np.concatenate(pieces).astype(np.float32) if pieces else np.zeros(0, dtype=np.float32)
+    return clip, spans
+
+
+def remap_time(t: float, spans: List[Tuple[float, float, float]]) -> float:
+    """Maps a timestamp in the gathered clip back to song time (gap times snap to the previous piece's end)."""
+    chosen: Optional[Tuple[float, float, float]] = None
+    for span in spans:
+        if span[0] > t:
+            break
+        chosen = span
+    if chosen is None:
+        return spans[0][1] if spans else t
+    clip_start, song_start, length = chosen
+    return song_start + min(max(t - clip_start, 0.0), length)
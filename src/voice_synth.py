@@ -2,8 +2,12 @@ import os
 os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
 import torch
 import torchaudio
+import numpy as np
 import soundfile as sf
 
+from src.stem_store import is_stem_path, open_stem
+from src.time_stretch import stretch
+
 # === FIX FOR PYTORCH 2.6+ ===
 # Coqui TTS uses older pickle formats that are blocked by the new 'weights_only=True' default.
 # We override torch.load to use 'weights_only=False' by default before importing TTS.
@@ -23,6 +27,11 @@ torch.load = load_wrapper
 # It also ignores the 'backend' argument.
 # We monkeypatch torchaudio.load to use soundfile directly.
 def custom_load(uri, **kwargs):
+    if is_stem_path(uri):
+        # Memory-mapped stem from the separator (used as the speaker reference)
+        stem = open_stem(uri)
+        return torch.from_numpy(stem.read().T.copy()), stem.sample_rate
+
     # soundfile.read returns (data, samplerate)
     # data is (time, channels) or (time,)
     data, samplerate = sf.read(uri)
@@ -49,7 +58,12 @@ torchaudio.load = custom_load
 from TTS.api import TTS
 
 class VoiceSynthesizer:
-    def __init__(self, model_name="tts_models/multilingual/multi-dataset/xtts_v2"):
+    # Time stretch backend for _match_duration: "wsola" or "phase_vocoder" (see src/time_stretch.py).
+    stretch_backend = "wsola"
+
+    def __init__(self, model_name="tts_models/multilingual/multi-dataset/xtts_v2", stretch_backend=None):
+        if stretch_backend:
+            self.stretch_backend = stretch_backend
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         print(f"Initializing TTS with model {model_name} on {self.device}...")
         
@@ -127,8 +141,9 @@ class VoiceSynthesizer:
 
     def _match_duration(self, waveform, sample_rate, target_duration):
         """
-        Stretches/compresses the waveform to match the target duration 
-        without changing pitch, using Phase Vocoder.
+        Stretches/compresses the waveform to match the target duration
+        without changing pitch, with the stretch_backend from src/time_stretch.py
+        (WSOLA by default, or the phase vocoder).
         """
         current_samples = waveform.shape[-1]
         target_samples = int(target_duration * sample_rate)
@@ -148,36 +163,5 @@ class VoiceSynthesizer:
                 return torch.nn.functional.pad(waveform, (0, target_samples - current_samples))
             return waveform
 
-        # Rate for TimeStretch: 
-        # rate > 1.0 speeds up (shorter)
-        # rate < 1.0 slows down (longer)
-        rate = current_duration / target_duration
-        
-        # STFT parameters
-        n_fft = 1024
-        hop_length = 512
-        # Ensure we have enough samples for at least one frame
-        if current_samples < n_fft:
-             # Pad if too short for STFT
-             pad_amt = n_fft - current_samples
-             waveform = torch.nn.functional.pad(waveform, (0, pad_amt))
-        
-        # Complex Spectrogram: (..., F, T)
-        # return_complex=True is required for PhaseVocoder/TimeStretch in newer torch
-        stft = torch.stft(waveform, n_fft=n_fft, hop_length=hop_length, return_complex=True)
-        
-        # TimeStretch expects complex input
-        stretcher = torchaudio.transforms.TimeStretch(hop_length=hop_length, n_freq=n_fft//2 + 1, fixed_rate=rate)
-        
-        stretched_stft = stretcher(stft)
-        
-        # Inverse STFT
-        new_waveform = torch.istft(stretched_stft, n_fft=n_fft, hop_length=hop_length, length=target_samples)
-        
-        # Ensure exact length
-        if new_waveform.shape[-1] > target_samples:
-            new_waveform = new_waveform[:, :target_samples]
-        elif new_waveform.shape[-1] < target_samples:
-            new_waveform = torch.nn.functional.pad(new_waveform, (0, target_samples - new_waveform.shape[-1]))
-            
-        return new_waveform
\ No newline at end of file
+        stretched = stretch(waveform.numpy(), sample_rate, target_samples, backend=self.stretch_backend)
+        return torch.from_numpy(np.ascontiguousarray(stretched, dtype=np.float32))
@@ -0,0 +1,381 @@
+# src/word_index.py
+"""
+Catalog-wide inverted index from normalized transcript words to the tracks
+(and timestamps) they occur in, so a dictionary change only re-renders the
+songs it affects.
+
+    # tracks are indexed as they are processed
+    python src/main.py --input song.mp3 --checkpoint_dir data/checkpoints --word_index data/words.db
+    # or backfilled from existing checkpoints
+    python src/word_index.py index --index data/words.db --checkpoint_dir data/checkpoints
+    # after editing CUSS_MAPPING
+    python src/word_index.py affected --index data/words.db
+    python src/word_index.py rerender --index data/words.db
+
+The index remembers the dictionary its tracks were last rendered with;
+affected/rerender diff that snapshot (or --old_dictionary) against the
+current CUSS_MAPPING. Only words whose resolved replacement changed count,
+so slang forms ("fuckin") follow their dictionary entry ("fucking").
+
+Tracks queued with rerender --queue stay pending, with the dictionary they
+were rendered with, until their job is done. A track whose job failed is
+affected again on the next run even though the snapshot has moved on.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.cache import content_hash
+from src.censor_manager import CUSS_MAPPING, _normalize_word, _resolve_cuss_key
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracks (
+    track TEXT PRIMARY KEY,
+    input TEXT NOT NULL,
+    output TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS words (
+    word TEXT NOT NULL,
+    track TEXT NOT NULL,
+    start REAL NOT NULL,
+    end REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS words_word ON words (word);
+CREATE INDEX IF NOT EXISTS words_track ON words (track);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pending (
+    track TEXT PRIMARY KEY,
+    queue TEXT NOT NULL,
+    job INTEGER NOT NULL,
+    dictionary TEXT NOT NULL
+);
+"""
+
+
+# process_song keyword arguments a track is re-rendered with.
+RENDER_OPTIONS = ("model_size", "use_synth", "bitrate", "passthrough", "patch", "stem_format", "vad", "checkpoint_dir", "edl_path", "repeats", "lyrics",
+                  "dsp", "refine")
+
+
+def track_key(input_path: str, model_size: str = "base", vad: bool = False, lyrics_path: Optional[str] = None) -> str:
+    """Same key as src/checkpoint.py: transcripts differ per model, VAD setting and supplied lyrics."""
+    key = f"{content_hash(input_path)}-{model_size}" + ("-vad" if vad else "")
+    return key + (f"-lyrics{content_hash(lyrics_path)[:8]}" if lyrics_path else "")
+
+
+def _replacement(word: str, mapping: Dict[str, str]) -> Optional[str]:
+    key = _resolve_cuss_key(word, mapping)
+    return mapping[key] if key else None
+
+
+class WordIndex:
+    """Inverted word index in a SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=60.0)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def add_track(self, track: str, input_path: str, output_path: str, words: Iterable[Dict],
+                  options: Optional[Dict] = None):
+        """Replaces everything indexed for track with this transcript."""
+        rows = []
+        for item in words:
+            word = _normalize_word(item.get("word", ""))
+            if word:
+                rows.append((word, track, float(item["start"]), float(item["end"])))
+        with self._db:
+            self._db.execute("DELETE FROM words WHERE track = ?", (track,))
+            self._db.execute(
+                "INSERT OR REPLACE INTO tracks (track, input, output, options, updated) VALUES (?, ?, ?, ?, ?)",
+                (track, input_path, output_path, json.dumps(options or {}), time.time())
+            )
+            self._db.executemany("INSERT INTO words (word, track, start, end) VALUES (?, ?, ?, ?)", rows)
+            # The first tracks were rendered with the dictionary in use now.
+            self._db.execute(
+                "INSERT OR IGNORE INTO meta (name, value) VALUES ('dictionary', ?)", (json.dumps(CUSS_MAPPING),)
+            )
+
+    def remove_track(self, track: str):
+        with self._db:
+            self._db.execute("DELETE FROM words WHERE track = ?", (track,))
+            self._db.execute("DELETE FROM tracks WHERE track = ?", (track,))
+            self._db.execute("DELETE FROM pending WHERE track = ?", (track,))
+
+    def tracks(self) -> List[Dict]:
+        rows = self._db.execute("SELECT * FROM tracks ORDER BY track")
+        return [dict(row, options=json.loads(row["options"])) for row in rows]
+
+    def vocabulary(self) -> List[str]:
+        return [row["word"] for row in self._db.execute("SELECT DISTINCT word FROM words")]
+
+    def dictionary(self) -> Optional[Dict[str, str]]:
+        """The dictionary the indexed tracks were last rendered with."""
+        row = self._db.execute("SELECT value FROM meta WHERE name = 'dictionary'").fetchone()
+        return json.loads(row["value"]) if row else None
+
+    def set_dictionary(self, mapping: Dict[str, str]):
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('dictionary', ?)", (json.dumps(mapping),)
+            )
+
+    def mark_pending(self, track: str, queue_path: str, job_id: int, mapping: Dict[str, str]):
+        """Records that track was queued as job_id and is still rendered with mapping."""
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pending (track, queue, job, dictionary) VALUES (?, ?, ?, ?)",
+                (track, os.path.abspath(queue_path), job_id, json.dumps(mapping))
+            )
+
+    def clear_pending(self, track: str):
+        with self._db:
+            self._db.execute("DELETE FROM pending WHERE track = ?", (track,))
+
+    def pending(self) -> List[Dict]:
+        rows = self._db.execute("SELECT * FROM pending ORDER BY track")
+        return [dict(row, dictionary=json.loads(row["dictionary"])) for row in rows]
+
+    def settle_pending(self) -> Tuple[List[str], List[Dict]]:
+        """
+        Checks the queued jobs of pending tracks. Done jobs clear their track.
+        Returns (tracks whose job is still queued or running, pending rows
+        whose job failed or can no longer be found).
+        """
+        from src.work_queue import WorkQueue
+
+        in_flight, failed = [], []
+        by_queue: Dict[str, List[Dict]] = {}
+        for row in self.pending():
+            by_queue.setdefault(row["queue"], []).append(row)
+        for queue_path, rows in by_queue.items():
+            queue = WorkQueue(queue_path) if os.path.exists(queue_path) else None
+            for row in rows:
+                job = queue.get(row["job"]) if queue else None
+                if job and job["status"] == "done":
+                    self.clear_pending(row["track"])
+                elif job and job["status"] in ("queued", "running"):
+                    in_flight.append(row["track"])
+                else:
+                    failed.append(row)
+            if queue:
+                queue.close()
+        return in_flight, failed
+
+    def changed_words(self, old_mapping: Dict[str, str], new_mapping: Dict[str, str]) -> List[str]:
+        """Indexed words whose replacement differs between the two dictionaries (added, removed or changed)."""
+        return sorted(
+            word for word in self.vocabulary()
+            if _replacement(word, old_mapping) != _replacement(word, new_mapping)
+        )
+
+    def lookup(self, words: Iterable[str]) -> List[Dict]:
+        """
+        Tracks containing any of the (normalized) words, each with its hits:
+        [{"track", "input", "output", "options", "hits": [(word, start, end), ...]}].
+        """
+        words = list(words)
+        by_track = {}
+        # Stay well under SQLite's bound-parameter limit.
+        for first in range(0, len(words), 500):
+            chunk = words[first:first + 500]
+            rows = self._db.execute(
+                f"SELECT word, track, start, end FROM words WHERE word IN ({','.join('?' * len(chunk))}) "
+                "ORDER BY track, start",
+                chunk
+            )
+            for row in rows:
+                by_track.setdefault(row["track"], []).append((row["word"], row["start"], row["end"]))
+
+        affected = []
+        for track, hits in sorted(by_track.items()):
+            row = self._db.execute("SELECT * FROM tracks WHERE track = ?", (track,)).fetchone()
+            affected.append(dict(row, options=json.loads(row["options"]), hits=sorted(hits, key=lambda h: h[1])))
+        return affected
+
+    def affected_tracks(self, old_mapping: Optional[Dict[str, str]] = None,
+                        new_mapping: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """Tracks whose edits change going from old_mapping (default: the stored snapshot) to new_mapping (default: CUSS_MAPPING)."""
+        if old_mapping is None:
+            old_mapping = self.dictionary() or CUSS_MAPPING
+        return self.lookup(self.changed_words(old_mapping, CUSS_MAPPING if new_mapping is None else new_mapping))
+
+
+def index_checkpoints(index: WordIndex, checkpoint_dir: str) -> int:
+    """Backfills the index from src/checkpoint.py directories that have a transcript. Returns the track count."""
+    count = 0
+    for manifest_path in sorted(glob.glob(os.path.join(checkpoint_dir, "*", "manifest.json"))):
+        song_dir = os.path.dirname(manifest_path)
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        stages = manifest.get("stages", {})
+        if "transcription" not in stages:
+            continue
+        with open(os.path.join(song_dir, stages["transcription"]["file"]), encoding="utf-8") as f:
+            words = json.load(f)
+        output = ""
+        if "mixing" in stages:
+            with open(os.path.join(song_dir, stages["mixing"]["file"]), encoding="utf-8") as f:
+                output = json.load(f).get("output") or ""
+        key = os.path.basename(song_dir)
+        # Rerunning needs the settings the checkpoint key was made from.
+        model_size, vad = manifest.get("model_size"), manifest.get("vad")
+        if model_size is None:
+            # Older manifests: parse <hash>-<model>[-vad][-lyrics<hash>]; model sizes may contain "-".
+            settings = re.sub(r"-lyrics[0-9a-f]+$", "", key).split("-", 1)[-1]
+            vad = settings.endswith("-vad")
+            model_size = settings[:-len("-vad")] if vad else settings
+        options = {"model_size": model_size, "vad": bool(vad), "checkpoint_dir": os.path.abspath(checkpoint_dir)}
+        if manifest.get("lyrics"):
+            options["lyrics"] = manifest["lyrics"]
+        index.add_track(key, manifest["input"], output, words, options)
+        count += 1
+    return count
+
+
+def rerender(tracks: List[Dict], queue_path: Optional[str] = None, index: Optional[WordIndex] = None,
+             old_mapping: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Re-runs each track with the options it was indexed with: locally through
+    process_song (its checkpoints skip transcription and separation), or by
+    queueing it for src/worker.py. Returns the inputs that failed or were
+    skipped.
+
+    With index, queued tracks are marked pending with the dictionary they
+    are still rendered with (their own pending one, else old_mapping), and
+    tracks re-rendered here are cleared.
+    """
+    failed = []
+    if queue_path:
+        from src.work_queue import WorkQueue
+        queue = WorkQueue(queue_path)
+        queued = 0
+        for track in tracks:
+            if not track["output"]:
+                print(f"Skipping {track['input']}: no output path recorded.")
+                failed.append(track["input"])
+                continue
+            options = {k: v for k, v in track["options"].items() if k not in ("model_size", "checkpoint_dir", "edl_path")}
+            job_id = queue.enqueue(track["input"], track["output"], options)
+            queued += 1
+            if index:
+                index.mark_pending(track["track"], queue_path, job_id,
+                                   track.get("pending_dictionary") or old_mapping or index.dictionary() or CUSS_MAPPING)
+        queue.close()
+        print(f"Queued {queued} tracks in {queue_path}.")
+        return failed
+
+    from src.main import process_song
+    for track in tracks:
+        options = {k: v for k, v in track["options"].items() if k in RENDER_OPTIONS}
+        if not track["output"] or not os.path.exists(track["input"]):
+            print(f"Skipping {track['input']}: input missing or no output path recorded.")
+            failed.append(track["input"])
+            continue
+        try:
+            process_song(track["input"], track["output"], **options)
+        except Exception as e:
+            print(f"Error: re-rendering {track['input']} failed: {e}")
+            failed.append(track["input"])
+            continue
+        if index:
+            index.clear_pending(track["track"])
+    return failed
+
+
+def with_failed_jobs(index: WordIndex, tracks: List[Dict], failed_jobs: List[Dict]) -> List[Dict]:
+    """
+    Adds the pending tracks whose queued job failed to tracks, with the hits
+    that differ between the dictionary they are still rendered with and
+    CUSS_MAPPING. Tracks with no such hits are cleared instead.
+    """
+    tracks = list(tracks)
+    listed = {track["track"]: track for track in tracks}
+    for row in failed_jobs:
+        matches = [t for t in index.lookup(index.changed_words(row["dictionary"], CUSS_MAPPING))
+                   if t["track"] == row["track"]]
+        if not matches:
+            index.clear_pending(row["track"])
+            continue
+        track = listed.get(row["track"])
+        if track is None:
+            track = listed[row["track"]] = matches[0]
+            tracks.append(track)
+        track["pending_dictionary"] = row["dictionary"]
+    return sorted(tracks, key=lambda t: t["track"])
+
+
+def _load_old_dictionary(index: WordIndex, path: Optional[str]) -> Optional[Dict[str, str]]:
+    if not path:
+        return index.dictionary()
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _print_affected(tracks: List[Dict]):
+    for track in tracks:
+        hits = ", ".join(f"{word}@{start:.2f}s" for word, start, _ in track["hits"])
+        print(f"{track['input']} -> {track['output'] or '?'}: {hits}")
+    print(f"{len(tracks)} tracks affected.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CleanMusic: inverted word index for incremental re-censoring.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index = commands.add_parser("index", help="Index the transcripts of existing checkpoints.")
+    index.add_argument("--index", required=True, help="Word index database.")
+    index.add_argument("--checkpoint_dir", required=True, help="Checkpoint directory used with src/main.py.")
+
+    for name, help_text in (("affected", "List tracks affected by dictionary changes."),
+                            ("rerender", "Re-render tracks affected by dictionary changes.")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--index", required=True, help="Word index database.")
+        command.add_argument("--old_dictionary", default=None, help="JSON dictionary to diff against (default: the one last rendered).")
+        if name == "rerender":
+            command.add_argument("--queue", default=None, help="Queue the tracks for src/worker.py instead of rendering here.")
+
+    args = parser.parse_args()
+    word_index = WordIndex(args.index)
+    if args.command == "index":
+        print(f"Indexed {index_checkpoints(word_index, args.checkpoint_dir)} tracks.")
+        return
+
+    old_mapping = _load_old_dictionary(word_index, args.old_dictionary) or CUSS_MAPPING
+    changed = word_index.changed_words(old_mapping, CUSS_MAPPING)
+    print(f"{len(changed)} indexed words changed: {', '.join(changed)}")
+    in_flight, failed_jobs = word_index.settle_pending()
+    tracks = with_failed_jobs(word_index, word_index.lookup(changed), failed_jobs)
+    if in_flight:
+        print(f"{len(in_flight)} tracks are still queued from an earlier rerender; skipping them.")
+        tracks = [track for track in tracks if track["track"] not in in_flight]
+    _print_affected(tracks)
+    if args.command == "rerender":
+        failed = rerender(tracks, args.queue, word_index, old_mapping)
+        if failed:
+            print(f"{len(failed)} tracks failed; the dictionary snapshot was not updated.")
+            sys.exit(1)
+        # Queued tracks keep their old dictionary as pending until their job is done.
+        word_index.set_dictionary(CUSS_MAPPING)
+
+if __name__ == "__main__":
+    main()
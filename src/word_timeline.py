@@ -0,0 +1,137 @@
+# src/word_timeline.py
+"""
+Columnar transcripts: interned word ids plus NumPy start/end/confidence
+arrays, instead of one dict per word. An hour of lyrics is a few hundred
+kilobytes rather than tens of megabytes of dicts, and detection is a single
+array lookup.
+
+Word strings are interned in a Vocabulary. Each distinct word is resolved
+against a dictionary mapping once (normalization, slang and
+stretched-spelling rules included), and the result is cached per mapping,
+for the MAX_LOOKUPS most recently used mappings. A timeline gets its own
+vocabulary unless one is passed in, so nothing outlives the transcript.
+Callers scanning many transcripts in one run (a catalog rescan after a
+dictionary change) can share a vocabulary, and only resolve the words it
+hasn't seen.
+
+    timeline = WordTimeline.from_words(transcribe_audio(...))
+    segments = timeline.detect()          # same output as detect_cuss_words
+    words = timeline.to_words()           # back to the dict format
+"""
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from src.censor_manager import CUSS_MAPPING, _resolve_cuss_key
+
+# Lookup tables kept per vocabulary; the least recently used mapping's goes first.
+MAX_LOOKUPS = 4
+
+class Vocabulary:
+    """Interned word strings with per-mapping lookup tables. Thread-safe."""
+
+    def __init__(self):
+        self.words: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._lookups: Dict[Tuple, Tuple[np.ndarray, List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def intern_all(self, words: Iterable[str]) -> np.ndarray:
+        """Ids of words (int32), adding the ones not seen yet."""
+        with self._lock:
+            ids, table = self._ids, self.words
+            out = []
+            for word in words:
+                word_id = ids.get(word)
+                if word_id is None:
+                    word_id = ids[word] = len(table)
+                    table.append(word)
+                out.append(word_id)
+        return np.array(out, dtype=np.int32)
+
+    def replacement_codes(self, mapping: Dict[str, str]) -> Tuple[np.ndarray, List[str]]:
+        """
+        (codes, replacements) for mapping: codes[word id] indexes replacements,
+        or is -1 for words that aren't cuss words.
+        """
+        key = tuple(mapping.items())
+        with self._lock:
+            codes, replacements = self._lookups.pop(key, (np.zeros(0, dtype=np.int32), list(mapping.values())))
+            if len(codes) < len(self.words):
+                position = {word: index for index, word in enumerate(mapping)}
+                new = [position.get(_resolve_cuss_key(word, mapping), -1) for word in self.words[len(codes):]]
+                codes = np.concatenate([codes, np.array(new, dtype=np.int32)])
+            self._lookups[key] = (codes, replacements)
+            while len(self._lookups) > MAX_LOOKUPS:
+                del self._lookups[next(iter(self._lookups))]
+        return codes, replacements
+
+
+
+class WordTimeline:
+    """
+    A transcript as columns: ids (into vocabulary.words), start and end
+    (seconds) and confidence (NaN where the words had none).
+    """
+
+    def __init__(self, ids: np.ndarray, start: np.ndarray, end: np.ndarray, confidence: np.ndarray,
+                 vocabulary: Optional[Vocabulary] = None):
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.start = np.asarray(start, dtype=np.float64)
+        self.end = np.asarray(end, dtype=np.float64)
+        self.confidence = np.asarray(confidence, dtype=np.float64)
+        self.vocabulary = Vocabulary() if vocabulary is None else vocabulary
+
+    @classmethod
+    def from_words(cls, words: Iterable[Dict], vocabulary: Optional[Vocabulary] = None) -> "WordTimeline":
+        """
+        Builds a timeline from transcript dicts (word, start, end, optional
+        confidence), interning into vocabulary if given, else a new one.
+        """
+        words = list(words)
+        vocabulary = Vocabulary() if vocabulary is None else vocabulary
+        count = len(words)
+        return cls(
+            vocabulary.intern_all(item.get("word", "") for item in words),
+            np.fromiter((item["start"] for item in words), dtype=np.float64, count=count),
+            np.fromiter((item["end"] for item in words), dtype=np.float64, count=count),
+            np.fromiter((item.get("confidence", math.nan) for item in words), dtype=np.float64, count=count),
+            vocabulary
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def to_words(self) -> List[Dict]:
+        """The transcript in transcribe_audio's dict format."""
+        table = self.vocabulary.words
+        words = []
+        for word_id, start, end, confidence in zip(self.ids.tolist(), self.start.tolist(), self.end.tolist(),
+                                                   self.confidence.tolist()):
+            item = {"word": table[word_id], "start": start, "end": end}
+            if not math.isnan(confidence):
+                item["confidence"] = confidence
+            words.append(item)
+        return words
+
+    def cuss_indices(self, mapping: Optional[Dict[str, str]] = None) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """(positions of cuss words, their replacement codes, replacements) for mapping (default CUSS_MAPPING)."""
+        codes, replacements = self.vocabulary.replacement_codes(CUSS_MAPPING if mapping is None else mapping)
+        word_codes = codes[self.ids] if len(self.ids) else np.zeros(0, dtype=np.int32)
+        positions = np.flatnonzero(word_codes >= 0)
+        return positions, word_codes[positions], replacements
+
+    def detect(self, mapping: Optional[Dict[str, str]] = None) -> List[Dict]:
+        """detect_cuss_words' output for this timeline."""
+        positions, codes, replacements = self.cuss_indices(mapping)
+        table = self.vocabulary.words
+        return [
+            {"word": table[self.ids[i]], "start": float(self.start[i]), "end": float(self.end[i]),
+             "replacement": replacements[code]}
+            for i, code in zip(positions.tolist(), codes.tolist())
+        ]
@@ -0,0 +1,243 @@
+# src/work_queue.py
+"""
+SQLite work queue for spreading a catalog over several worker processes or
+machines that share a filesystem.
+
+A worker claims a job by taking a lease on it, renews the lease with
+heartbeats while it runs, and completes or fails it. If a worker dies its
+lease expires and the job is handed to the next worker that asks, up to
+max_attempts times. All state changes run in IMMEDIATE transactions, so two
+workers can never hold the same job.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEASE_SECONDS = 300.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    input TEXT NOT NULL,
+    output TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    error TEXT,
+    result TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, lease_expires);
+"""
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict:
+    job = dict(row)
+    job["options"] = json.loads(job["options"] or "{}")
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+class WorkQueue:
+    """Jobs table in a SQLite file. Each process opens its own WorkQueue."""
+
+    def __init__(self, path: str, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        out_dir = os.path.dirname(path)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        # isolation_level=None: transactions are issued explicitly below.
+        self._db = sqlite3.connect(path, timeout=60.0, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript(_SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def _transaction(self):
+        return _Transaction(self._db)
+
+    def enqueue(self, input_path: str, output_path: str, options: Optional[Dict] = None,
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS) -> int:
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "INSERT INTO jobs (input, output, options, max_attempts, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (input_path, output_path, json.dumps(options or {}), max_attempts, now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """
+        Leases the oldest runnable job to worker_id: a queued job, or a running
+        one whose lease expired (its worker died). Jobs that used up their
+        attempts on expired leases are marked failed. Returns None when idle.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "UPDATE jobs SET status = 'failed', error = 'lease expired on final attempt', worker = NULL, updated = ? "
+                "WHERE status = 'running' AND lease_expires < ? AND attempts >= max_attempts",
+                (now, now)
+            )
+            row = db.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row["id"])
+            )
+            return _row_to_job(db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """Extends the lease. False means the lease was lost and another worker may own the job."""
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (now + self.lease_seconds, now, job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, result: Optional[Dict] = None) -> bool:
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (json.dumps(result or {}), time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str) -> bool:
+        """Records a failure; the job is queued again until it runs out of attempts."""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                "error = ?, worker = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND worker = ? AND status = 'running'",
+                (error, time.time(), job_id, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def get(self, job_id: int) -> Optional[Dict]:
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def jobs(self, status: Optional[str] = None) -> List[Dict]:
+        if status:
+            rows = self._db.execute("SELECT * FROM jobs WHERE status = ? ORDER BY id", (status,))
+        else:
+            rows = self._db.execute("SELECT * FROM jobs ORDER BY id")
+        return [_row_to_job(row) for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")
+        return {row["status"]: row["n"] for row in rows}
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK: takes the write lock up front so claims never race."""
+
+    def __init__(self, db: sqlite3.Connection):
+        self._db = db
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._db.execute("BEGIN IMMEDIATE")
+        return self._db
+
+    def __exit__(self, exc_type, exc, tb):
+        self._db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+class Heartbeat(threading.Thread):
+    """Renews a job's lease in the background (with its own connection) until stopped."""
+
+    def __init__(self, queue_path: str, lease_seconds: float, job_id: int, worker_id: str):
+        super().__init__(daemon=True)
+        self.queue_path = queue_path
+        self.lease_seconds = lease_seconds
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lost = False
+        self._stop_event = threading.Event()
+
+    def run(self):
+        queue = WorkQueue(self.queue_path, self.lease_seconds)
+        try:
+            while not self._stop_event.wait(self.lease_seconds / 3):
+                if not queue.heartbeat(self.job_id, self.worker_id):
+                    logger.warning("Lost the lease on job %s", self.job_id)
+                    self.lost = True
+                    return
+        finally:
+            queue.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def run_worker(
+    queue: WorkQueue,
+    handler: Callable[[Dict], Dict],
+    worker_id: Optional[str] = None,
+    poll_interval: float = 5.0,
+    exit_when_idle: bool = False,
+    max_jobs: Optional[int] = None
+) -> int:
+    """
+    Claims and runs jobs until max_jobs have run or, with exit_when_idle, no
+    job is queued or running anywhere. handler(job) returns the result dict;
+    an exception fails the job (it is retried while attempts remain).
+    Returns the number of jobs this worker ran.
+    """
+    worker_id = worker_id or default_worker_id()
+    ran = 0
+    while max_jobs is None or ran < max_jobs:
+        job = queue.claim(worker_id)
+        if job is None:
+            counts = queue.counts()
+            if exit_when_idle and not counts.get("queued") and not counts.get("running"):
+                break
+            time.sleep(poll_interval)
+            continue
+
+        print(f"[{worker_id}] job {job['id']} (attempt {job['attempts']}): {job['input']}")
+        heartbeat = Heartbeat(queue.path, queue.lease_seconds, job["id"], worker_id)
+        heartbeat.start()
+        try:
+            result = handler(job)
+        except Exception as e:
+            logger.exception("Job %s failed", job["id"])
+            queue.fail(job["id"], worker_id, f"{type(e).__name__}: {e}")
+        else:
+            if not queue.complete(job["id"], worker_id, result):
+                print(f"Warning: job {job['id']} finished after its lease was taken over; result discarded.")
+        finally:
+            heartbeat.stop()
+        ran += 1
+    return ran
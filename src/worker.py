@@ -0,0 +1,208 @@
+# src/worker.py
+"""
+Catalog processing across processes or machines sharing a filesystem.
+
+    # coordinator: queue a manifest (see src/batch.py for the format)
+    python src/worker.py enqueue --queue shared/queue.db --manifest songs.txt --output_dir shared/clean
+    # on every box, as many times as it has capacity
+    python src/worker.py work --queue shared/queue.db --cache_dir shared/cache
+    python src/worker.py status --queue shared/queue.db
+
+Workers keep their models warm across jobs and share transcripts, stems and
+synth clips through a content-addressed cache (src/cache.py).
+"""
+import argparse
+import os
+import sys
+from typing import Dict, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import main as pipeline
+from src import metrics
+from src.audio_utils import get_audio_duration
+from src.batch import read_manifest
+from src.cache import SharedCache, content_hash
+from src.edl import build_edl, default_edl_path, save_edl
+from src.word_index import RENDER_OPTIONS, WordIndex
+from src.work_queue import DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS, WorkQueue, default_worker_id, run_worker
+
+
+class WorkerModels:
+    """Loads each model the first time a job needs it, then keeps it for later jobs."""
+
+    def __init__(self, model_size: str = "base"):
+        self.model_size = model_size
+        self._whisper = None
+        self._demucs = None
+        self._synthesizer = None
+        self._synth_failed = False
+
+    def whisper(self):
+        if self._whisper is None:
+            with metrics.current().stage("transcription.model_load", model=self.model_size):
+                self._whisper = pipeline.load_whisper_model(self.model_size)
+        return self._whisper
+
+    def demucs(self):
+        if self._demucs is None:
+            from src.separator import load_demucs_model
+            self._demucs = load_demucs_model()
+        return self._demucs
+
+    def synthesizer(self):
+        if self._synthesizer is None and not self._synth_failed:
+            try:
+                with metrics.current().stage("synthesis.model_load"):
+                    self._synthesizer = pipeline.VoiceSynthesizer()
+            except Exception as e:
+                print(f"Warning: Voice synthesis unavailable on this worker: {e}")
+                self._synth_failed = True
+        return self._synthesizer
+
+
+def process_job(job: Dict, models: WorkerModels, cache: SharedCache, word_index: Optional[str] = None) -> Dict:
+    """
+    Runs one queued song through the pipeline, reusing cached stage outputs.
+    With word_index, the transcript is added to that src/word_index.py database.
+    """
+    options = job["options"]
+    input_path, output_path = job["input"], job["output"]
+    key = content_hash(input_path)
+    tag = models.model_size + ("-vad" if options.get("vad") else "")
+    audio_seconds = get_audio_duration(input_path)
+
+    lyrics_data = cache.load_transcript(key, tag)
+    if lyrics_data is None:
+        lyrics_data = pipeline.run_transcription(
+            input_path, models.model_size, whisper_model=models.whisper(),
+            audio_seconds=audio_seconds, vad=options.get("vad", False)
+        )
+        cache.save_transcript(key, tag, lyrics_data)
+    if word_index:
+        index = WordIndex(word_index)
+        options_used = {"model_size": models.model_size, "edl_path": options.get("edl")}
+        options_used.update((k, v) for k, v in options.items() if k in RENDER_OPTIONS)
+        index.add_track(f"{key}-{tag}", input_path, output_path, lyrics_data, options_used)
+        index.close()
+
+    cuss_segments = pipeline.run_detection(lyrics_data)
+    result = {"key": key, "cuss_words": len(cuss_segments), "output": None, "edl": None}
+    if not cuss_segments:
+        if options.get("passthrough"):
+            result["output"] = pipeline.write_unedited(input_path, output_path, options.get("bitrate"))
+        return result
+
+    stems = cache.find_stems(key)
+    if stems is None:
+        stems = pipeline.run_separation(
+            input_path, audio_seconds=audio_seconds, stem_format=options.get("stem_format", "stem"),
+            model=models.demucs(), output_dir=cache.stems_dir(key)
+        )
+    vocals_path, instrumental_path = stems
+
+    synth_dir = cache.synth_dir(key)
+    if options.get("use_synth", True) and models.synthesizer() is not None:
+        try:
+            pipeline.run_synthesis(cuss_segments, vocals_path, synth_dir=synth_dir, synthesizer=models.synthesizer())
+        except Exception as e:
+            print(f"Warning: Voice synthesis failed for {input_path}: {e}")
+
+    result["edl"] = save_edl(
+        build_edl(input_path, cuss_segments, vocals_path, instrumental_path, synth_dir=synth_dir),
+        options.get("edl") or default_edl_path(output_path)
+    )
+    result["output"] = pipeline.run_mixing(
+        input_path, output_path, cuss_segments, vocals_path, instrumental_path,
+        audio_seconds=audio_seconds, bitrate=options.get("bitrate"),
+        passthrough=options.get("passthrough", False), patch=options.get("patch", False),
+        synth_dir=synth_dir
+    )
+    return result
+
+
+def _job_options(args) -> Dict:
+    options = {"use_synth": args.use_synth, "stem_format": args.stem_format}
+    for name in ("bitrate", "passthrough", "patch", "vad"):
+        if getattr(args, name):
+            options[name] = getattr(args, name)
+    return options
+
+
+def enqueue_command(args):
+    queue = WorkQueue(args.queue)
+    entries = read_manifest(args.manifest, args.output_dir)
+    for input_path, output_path in entries:
+        queue.enqueue(os.path.abspath(input_path), os.path.abspath(output_path), _job_options(args), args.max_attempts)
+    print(f"Queued {len(entries)} songs in {args.queue}.")
+
+
+def work_command(args):
+    queue = WorkQueue(args.queue, lease_seconds=args.lease_seconds)
+    models = WorkerModels(args.model_size)
+    cache = SharedCache(args.cache_dir)
+    run_metrics = metrics.PipelineMetrics(sink_path=args.metrics_file, run_id=args.worker_id, keep_records=False)
+    previous = metrics.activate(run_metrics)
+    try:
+        ran = run_worker(
+            queue,
+            lambda job: process_job(job, models, cache, args.word_index),
+            worker_id=args.worker_id,
+            poll_interval=args.poll_interval,
+            exit_when_idle=args.exit_when_idle,
+            max_jobs=args.max_jobs
+        )
+    finally:
+        run_metrics.emit_summary()
+        metrics.activate(previous)
+    print(f"Worker {args.worker_id} ran {ran} jobs.")
+
+
+def status_command(args):
+    queue = WorkQueue(args.queue)
+    counts = queue.counts()
+    print(", ".join(f"{status}: {counts.get(status, 0)}" for status in ("queued", "running", "done", "failed")))
+    for job in queue.jobs("failed"):
+        print(f"  FAILED {job['input']} after {job['attempts']} attempts: {job['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CleanMusic: shared work queue for catalog processing.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = commands.add_parser("enqueue", help="Queue every song in a manifest.")
+    enqueue.add_argument("--queue", required=True, help="Queue database on shared storage.")
+    enqueue.add_argument("--manifest", required=True, help="Text file with one 'input[,output]' per line.")
+    enqueue.add_argument("--output_dir", default="data/clean", help="Output directory for entries without an output path.")
+    enqueue.add_argument("--max_attempts", type=int, default=DEFAULT_MAX_ATTEMPTS, help="Tries per song before it is marked failed.")
+    enqueue.add_argument("--bitrate", default=None, help="Bitrate for lossy output, e.g. 192k.")
+    enqueue.add_argument("--passthrough", action="store_true", help="Copy unedited audio and write clean songs unchanged.")
+    enqueue.add_argument("--patch", action="store_true", help="Patch a copy of each input instead of re-rendering it.")
+    enqueue.add_argument("--stem_format", default="stem", choices=["stem", "stem16", "wav"], help="How separated stems are stored.")
+    enqueue.add_argument("--vad", action="store_true", help="Only transcribe sections with vocals.")
+    enqueue.add_argument("--no_use_synth", dest="use_synth", action="store_false", help="Disable voice synthesis.")
+    enqueue.set_defaults(use_synth=True, handler=enqueue_command)
+
+    work = commands.add_parser("work", help="Claim and process jobs until stopped.")
+    work.add_argument("--queue", required=True, help="Queue database on shared storage.")
+    work.add_argument("--cache_dir", default="data/cache", help="Shared cache for transcripts, stems and synth clips.")
+    work.add_argument("--worker_id", default=default_worker_id(), help="Name recorded on claimed jobs.")
+    work.add_argument("--model_size", default="base", help="Whisper model size (tiny, base, small, medium, large).")
+    work.add_argument("--lease_seconds", type=float, default=DEFAULT_LEASE_SECONDS, help="Lease length; heartbeats renew it every third.")
+    work.add_argument("--poll_interval", type=float, default=5.0, help="Seconds to wait when no job is available.")
+    work.add_argument("--exit_when_idle", action="store_true", help="Exit once no job is queued or running.")
+    work.add_argument("--max_jobs", type=int, default=None, help="Exit after this many jobs.")
+    work.add_argument("--word_index", default=None, help="Add every transcript to this word index (see src/word_index.py).")
+    work.add_argument("--metrics_file", default=None, help="Append per-stage metrics as JSON lines to this file.")
+    work.add_argument("--log_level", default="WARNING", help="Logging level (DEBUG, INFO, WARNING, ERROR).")
+    work.set_defaults(handler=work_command)
+
+    status = commands.add_parser("status", help="Show job counts and failures.")
+    status.add_argument("--queue", required=True, help="Queue database on shared storage.")
+    status.set_defaults(handler=status_command)
+
+    args = parser.parse_args()
+    metrics.configure_logging(getattr(args, "log_level", "WARNING"))
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
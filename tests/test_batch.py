@@ -0,0 +1,124 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+
+def stub_model_modules():
+    """Stubs the torch-backed modules as test_pipeline does (extending its stubs if they are installed)."""
+    separator_stub = sys.modules.setdefault("src.separator", types.ModuleType("src.separator"))
+    for name in ("separate_vocals", "separate_vocals_batch", "load_demucs_model"):
+        if not hasattr(separator_stub, name):
+            setattr(separator_stub, name, MagicMock())
+    sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+
+
+def fake_transcribe(model, path, **kwargs):
+    if "clean" in path:
+        return [{"word": "hello", "start": 0.0, "end": 0.5, "confidence": 0.9}]
+    return [{"word": "shit", "start": 1.0, "end": 1.5, "confidence": 0.9}]
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        # Imported here so test_mixer can still install its pydub stub first.
+        stub_model_modules()
+        from src import batch
+        self.batch = batch
+        self.tmp = tempfile.mkdtemp()
+        self.songs = []
+        for name in ("a.wav", "b.wav", "clean.wav"):
+            path = os.path.join(self.tmp, name)
+            with open(path, "w") as f:
+                f.write("dummy audio content")
+            self.songs.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_read_manifest(self):
+        manifest = os.path.join(self.tmp, "songs.txt")
+        with open(manifest, "w") as f:
+            f.write(f"# songs\n{self.songs[0]}\n\n{self.songs[1]}, out/b_clean.wav\n")
+        self.assertEqual(self.batch.read_manifest(manifest, "clean"), [
+            (self.songs[0], os.path.join("clean", "a.wav")),
+            (self.songs[1], "out/b_clean.wav"),
+        ])
+
+    def test_same_named_inputs_need_their_own_outputs(self):
+        songs = []
+        for folder in ("a", "b"):
+            os.makedirs(os.path.join(self.tmp, folder))
+            songs.append(os.path.join(self.tmp, folder, "01.wav"))
+        manifest = os.path.join(self.tmp, "songs.txt")
+        with open(manifest, "w") as f:
+            f.write(f"{songs[0]}\n{songs[1]}\n")
+        with self.assertRaisesRegex(ValueError, "already written by line 1"):
+            self.batch.read_manifest(manifest, "clean")
+        with open(manifest, "w") as f:
+            f.write(f"{songs[0]}\n{songs[1]}, clean/b_01.wav\n")
+        self.assertEqual(len(self.batch.read_manifest(manifest, "clean")), 2)
+
+    @patch("src.main.create_clean_version")
+    @patch("src.main.load_whisper_model")
+    def test_same_named_songs_keep_their_own_synth_clips(self, mock_load, mock_create):
+        entries = []
+        for folder in ("a", "b"):
+            song = os.path.join(self.tmp, folder, "01.wav")
+            os.makedirs(os.path.dirname(song))
+            with open(song, "w") as f:
+                f.write(f"dummy audio content {folder}")
+            entries.append((song, os.path.join(self.tmp, "out", f"{folder}_01.wav")))
+        with patch.object(self.batch, "transcribe_batch") as mock_transcribe, \
+                patch.object(self.batch, "load_demucs_model"), \
+                patch.object(self.batch, "separate_vocals_batch") as mock_separate, \
+                patch("src.main.run_synthesis") as mock_synth:
+            mock_transcribe.side_effect = lambda model, paths, **kwargs: [fake_transcribe(model, p) for p in paths]
+            mock_separate.side_effect = lambda paths, **kwargs: [(f"{p}.vocals", f"{p}.inst") for p in paths]
+            self.batch.process_batch(entries, synth_root=os.path.join(self.tmp, "synth"))
+
+        synth_dirs = [c.kwargs["synth_dir"] for c in mock_synth.call_args_list]
+        self.assertEqual(len(set(synth_dirs)), 2)
+        self.assertEqual([c.kwargs["vocals_path"] for c in mock_create.call_args_list],
+                         [f"{song}.vocals" for song, _ in entries])
+
+    @patch("src.main.create_clean_version")
+    @patch("src.main.load_whisper_model")
+    def test_songs_with_cuss_words_are_separated_together(self, mock_load, mock_create):
+        out_dir = os.path.join(self.tmp, "out")
+        entries = [(song, os.path.join(out_dir, os.path.basename(song))) for song in self.songs]
+        with patch.object(self.batch, "transcribe_batch") as mock_transcribe, \
+                patch.object(self.batch, "load_demucs_model") as mock_demucs, \
+                patch.object(self.batch, "separate_vocals_batch") as mock_separate:
+            mock_transcribe.side_effect = lambda model, paths, **kwargs: [fake_transcribe(model, p) for p in paths]
+            mock_separate.side_effect = lambda paths, **kwargs: [(f"{p}.vocals", f"{p}.inst") for p in paths]
+            results = self.batch.process_batch(entries, use_synth=False, synth_root=os.path.join(self.tmp, "synth"))
+
+        self.assertEqual(mock_load.call_count, 1)
+        self.assertEqual(mock_transcribe.call_args[0][1], self.songs)
+        self.assertEqual(mock_demucs.call_count, 1)
+        self.assertEqual(mock_separate.call_count, 1)
+        self.assertEqual(mock_separate.call_args[0][0], self.songs[:2])
+        self.assertEqual([r["output"] for r in results], [entries[0][1], entries[1][1], None])
+        self.assertEqual([r["cuss_words"] for r in results], [1, 1, 0])
+        self.assertEqual(mock_create.call_count, 2)
+        self.assertTrue(os.path.exists(os.path.join(out_dir, "a.edl.json")))
+
+    @patch("src.main.create_clean_version")
+    @patch("src.main.transcribe_audio", side_effect=fake_transcribe)
+    @patch("src.main.load_whisper_model")
+    def test_falls_back_to_per_song_transcription(self, mock_load, mock_transcribe, mock_create):
+        entries = [(song, os.path.join(self.tmp, "out", os.path.basename(song))) for song in self.songs]
+        with patch.object(self.batch, "transcribe_batch", side_effect=RuntimeError("decode failed")), \
+                patch.object(self.batch, "load_demucs_model"), \
+                patch.object(self.batch, "separate_vocals_batch", return_value=[]):
+            results = self.batch.process_batch(entries, use_synth=False)
+        self.assertEqual(mock_transcribe.call_count, 3)
+        self.assertEqual([r["cuss_words"] for r in results], [1, 1, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import tempfile
+import unittest
+
+from benchmarks.run_benchmarks import check_results
+from benchmarks.standins import StandInWhisper
+from benchmarks.synthetic import generate_song
+from src.censor_manager import detect_cuss_words
+from src.lyrics import transcribe_audio
+
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def test_synthetic_song_is_deterministic(self):
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            first = generate_song(a, duration=20.0, cuss_per_minute=30.0, sr=8000, seed=3)
+            second = generate_song(b, duration=20.0, cuss_per_minute=30.0, sr=8000, seed=3)
+        self.assertEqual(first["words"], second["words"])
+        self.assertGreater(first["cuss_count"], 0)
+
+    def test_standin_whisper_round_trips_through_transcribe_audio(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            song = generate_song(tmp, duration=20.0, cuss_per_minute=30.0, sr=8000, seed=1)
+            words = transcribe_audio(StandInWhisper(), song["paths"]["mix"])
+        self.assertEqual([w["word"] for w in words], [w["word"] for w in song["words"]])
+        self.assertEqual(len(detect_cuss_words(words)), song["cuss_count"])
+
+    def test_check_results_flags_threshold_and_baseline_regressions(self):
+        result = {
+            "duration": 60.0,
+            "cuss_per_minute": 6.0,
+            "stages": {"mixing": {"audio_s_per_s": 4.0, "peak_alloc_mb": 10.0}},
+        }
+        baseline = {"results": [dict(result, stages={"mixing": {"audio_s_per_s": 10.0}})]}
+        failures = check_results([result], {"min_audio_s_per_s": {"mixing": 5}}, baseline, tolerance=0.25)
+        self.assertEqual(len(failures), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
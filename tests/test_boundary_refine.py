@@ -0,0 +1,108 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import soundfile as sf
+
+SR = 44100
+
+
+def _stem(words, seconds=6.0):
+    """Noise 'syllables' with a raised-sine envelope at the given (start, end) seconds over a near-silent floor."""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(SR * seconds)) / SR
+    audio = 1e-4 * rng.standard_normal(len(t))
+    for start, end in words:
+        inside = (t >= start) & (t < end)
+        audio[inside] += 0.3 * rng.standard_normal(inside.sum()) * np.sin(np.pi * (t[inside] - start) / (end - start))
+    return np.repeat(audio.astype(np.float32)[:, None], 2, axis=1)
+
+
+def _segment(start, end):
+    return {"word": "shit", "replacement": "shoot", "start": start, "end": end}
+
+
+class TestBoundaryRefine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _write(self, audio):
+        path = os.path.join(self.tmp, "vocals.wav")
+        sf.write(path, audio, SR)
+        return path
+
+    def test_isolated_words_snap_to_the_vocal(self):
+        from src.boundary_refine import refine_segments
+
+        path = self._write(_stem([(1.0, 1.4), (4.0, 4.35)]))
+        late, early = refine_segments([_segment(1.1, 1.5), _segment(3.9, 4.25)], path)
+        for seg, (start, end) in ((late, (1.0, 1.4)), (early, (4.0, 4.35))):
+            self.assertLessEqual(seg["start"], start)
+            self.assertGreaterEqual(seg["end"], end)
+            self.assertLess(start - seg["start"], 0.03)
+            self.assertLess(seg["end"] - end, 0.03)
+        self.assertEqual((late["asr_start"], late["asr_end"]), (1.1, 1.5))
+
+    def test_connected_words_split_at_the_energy_dip(self):
+        from src.boundary_refine import refine_segments
+
+        path = self._write(_stem([(2.0, 2.3), (2.3, 2.7)]))
+        (seg,) = refine_segments([_segment(2.35, 2.6)], path)
+        self.assertAlmostEqual(seg["start"], 2.3, delta=0.02)
+        self.assertAlmostEqual(seg["end"], 2.7, delta=0.03)
+
+    def test_silent_stem_keeps_the_transcript_times(self):
+        from src.boundary_refine import refine_segments
+
+        segments = [_segment(1.0, 1.3)]
+        self.assertEqual(refine_segments(segments, self._write(_stem([]))), segments)
+
+    def test_neighbours_do_not_overlap_and_shifts_are_bounded(self):
+        from src.boundary_refine import SEARCH_MS, refine_segments
+
+        path = self._write(_stem([(1.0, 1.6), (1.62, 2.0)]))
+        first, second = refine_segments([_segment(1.2, 1.5), _segment(1.65, 1.9)], path)
+        self.assertGreaterEqual(second["start"], first["end"])
+        for seg in (first, second):
+            self.assertLessEqual(abs(seg["start"] - seg["asr_start"]), SEARCH_MS / 1000.0 + 1e-9)
+            self.assertLessEqual(abs(seg["end"] - seg["asr_end"]), SEARCH_MS / 1000.0 + 1e-9)
+
+    def test_reads_stem_files(self):
+        from src.boundary_refine import refine_segments
+        from src.stem_store import write_stem
+
+        path = write_stem(os.path.join(self.tmp, "vocals.stem"), _stem([(1.0, 1.4)]), SR)
+        (seg,) = refine_segments([_segment(1.1, 1.5)], path)
+        self.assertAlmostEqual(seg["start"], 1.0, delta=0.03)
+
+    def test_pipeline_refines_after_separation(self):
+        # Stub the torch-backed modules as test_pipeline does, importing late so
+        # test_mixer can still install its pydub stub first.
+        sys.modules.setdefault("src.separator", types.SimpleNamespace(separate_vocals=MagicMock()))
+        sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+        from src import main
+
+        vocals = self._write(_stem([(1.0, 1.4)]))
+        song = os.path.join(self.tmp, "song.wav")
+        sf.write(song, _stem([(1.0, 1.4)]), SR)
+        words = [{"word": "shit", "start": 1.1, "end": 1.5, "confidence": 0.9}]
+        with patch.object(main, "load_whisper_model"), \
+                patch.object(main, "transcribe_audio", return_value=words), \
+                patch.object(main, "separate_vocals", return_value=(vocals, song)), \
+                patch.object(main, "create_clean_version") as mock_create:
+            main.process_song(song, os.path.join(self.tmp, "clean.wav"), use_synth=False, refine=True)
+        (seg,) = mock_create.call_args.kwargs["cuss_segments"]
+        self.assertAlmostEqual(seg["start"], 1.0, delta=0.03)
+        self.assertEqual(seg["asr_start"], 1.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.checkpoint import SongCheckpoint
+
+WORDS = [
+    {"word": "hello", "start": 0.0, "end": 0.5, "confidence": 0.9},
+    {"word": "shit", "start": 1.0, "end": 1.5, "confidence": 0.9},
+]
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.input = os.path.join(self.tmp, "song.wav")
+        with open(self.input, "w") as f:
+            f.write("dummy audio content")
+        self.root = os.path.join(self.tmp, "checkpoints")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_stages_survive_reopening_and_later_stages_are_invalidated(self):
+        stem = os.path.join(self.tmp, "vocals.stem")
+        open(stem, "w").close()
+        checkpoint = SongCheckpoint(self.root, self.input)
+        checkpoint.put("transcription", WORDS)
+        checkpoint.put("separation", {"vocals": stem}, refs=[stem])
+
+        reopened = SongCheckpoint(self.root, self.input)
+        self.assertEqual(reopened.get("transcription"), WORDS)
+        self.assertEqual(reopened.last_completed(), "separation")
+
+        os.remove(stem)
+        self.assertIsNone(reopened.get("separation"))
+        reopened.put("synthesis", [])
+        reopened.put("transcription", WORDS[:1])
+        self.assertIsNone(reopened.manifest["stages"].get("synthesis"))
+        self.assertNotEqual(SongCheckpoint(self.root, self.input, model_size="large").dir, reopened.dir)
+
+    def test_a_detection_change_keeps_the_stems(self):
+        stem = os.path.join(self.tmp, "vocals.stem")
+        open(stem, "w").close()
+        checkpoint = SongCheckpoint(self.root, self.input)
+        checkpoint.put("transcription", WORDS)
+        checkpoint.put("detection", [dict(WORDS[1], replacement="shoot")])
+        checkpoint.put("separation", {"vocals": stem}, refs=[stem])
+        for stage in ("synthesis", "edl", "mixing"):
+            checkpoint.put(stage, {})
+
+        checkpoint.put("detection", [dict(WORDS[1], replacement="ship")])
+        self.assertEqual(checkpoint.get("separation"), {"vocals": stem})
+        self.assertEqual(sorted(checkpoint.manifest["stages"]), ["detection", "separation", "transcription"])
+
+    def test_rerun_resumes_after_a_crash(self):
+        # Stub the torch-backed modules as test_pipeline does, importing late so
+        # test_mixer can still install its pydub stub first.
+        sys.modules.setdefault("src.separator", types.SimpleNamespace(separate_vocals=MagicMock()))
+        sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+        from src import main
+
+        with patch.object(main, "load_whisper_model"), \
+                patch.object(main, "transcribe_audio", return_value=WORDS) as mock_transcribe, \
+                patch.object(main, "separate_vocals") as mock_separate, \
+                patch.object(main, "create_clean_version") as mock_create:
+            self._crash_then_resume(main.process_song, mock_transcribe, mock_separate, mock_create)
+
+    def test_synth_clips_are_only_reused_for_the_same_length(self):
+        sys.modules.setdefault("src.separator", types.SimpleNamespace(separate_vocals=MagicMock()))
+        sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+        from src import main
+
+        synth_dir = SongCheckpoint(self.root, self.input).synth_dir
+        synthesizer = MagicMock()
+        synthesizer.generate_speech.side_effect = lambda **kwargs: open(kwargs["output_path"], "w").close()
+        first = [{"word": "shit", "replacement": "shoot", "start": 1.0, "end": 1.5}]
+        main.run_synthesis(first, "vocals.stem", synth_dir=synth_dir, synthesizer=synthesizer)
+        # A rerun with refined (shorter) bounds must not pick up the old clip.
+        second = [{"word": "shit", "replacement": "shoot", "start": 1.05, "end": 1.4}]
+        main.run_synthesis(second, "vocals.stem", synth_dir=synth_dir, synthesizer=synthesizer)
+        again = [dict(first[0])]
+        main.run_synthesis(again, "vocals.stem", synth_dir=synth_dir, synthesizer=synthesizer)
+
+        self.assertEqual(synthesizer.generate_speech.call_count, 2)
+        self.assertNotEqual(first[0]["synth_path"], second[0]["synth_path"])
+        self.assertEqual(again[0]["synth_path"], first[0]["synth_path"])
+        self.assertEqual(sorted(os.listdir(synth_dir)), sorted(os.path.basename(s[0]["synth_path"]) for s in (first, second)))
+
+    def _crash_then_resume(self, process_song, mock_transcribe, mock_separate, mock_create):
+        stems = [os.path.join(self.tmp, name) for name in ("vocals.stem", "no_vocals.stem")]
+        for stem in stems:
+            open(stem, "w").close()
+        mock_separate.return_value = tuple(stems)
+        output = os.path.join(self.tmp, "clean.wav")
+
+        mock_create.side_effect = RuntimeError("killed during mixing")
+        with self.assertRaises(RuntimeError):
+            process_song(self.input, output, use_synth=False, checkpoint_dir=self.root)
+
+        def finish_mix(**kwargs):
+            open(kwargs["output_path"], "w").close()
+        mock_create.side_effect = finish_mix
+        self.assertEqual(process_song(self.input, output, use_synth=False, checkpoint_dir=self.root), output)
+
+        self.assertEqual(mock_transcribe.call_count, 1)
+        self.assertEqual(mock_separate.call_count, 1)
+        self.assertEqual(mock_create.call_count, 2)
+        self.assertEqual(SongCheckpoint(self.root, self.input).last_completed(), "mixing")
+
+
+if __name__ == "__main__":
+    unittest.main()
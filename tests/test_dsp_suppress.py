@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+from src.dsp_suppress import _istft, _stft, suppress_vocals
+
+SR = 8000
+
+
+def tone(freq, seconds, amplitude=0.3):
+    t = np.arange(int(seconds * SR)) / SR
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)
+
+
+def level(signal):
+    return float(np.sqrt(np.mean(np.square(signal))))
+
+
+class TestSuppressVocals(unittest.TestCase):
+    def test_stft_round_trip(self):
+        signal = np.random.default_rng(0).standard_normal(SR + 123).astype(np.float32)
+        np.testing.assert_allclose(_istft(_stft(signal), len(signal)), signal, atol=1e-4)
+
+    def test_centred_vocal_band_is_attenuated(self):
+        voice = tone(1000, 2.0)
+        out = suppress_vocals(np.stack([voice, voice], axis=1), SR)
+        middle = slice(SR // 2, 3 * SR // 2)
+        self.assertLess(level(out[middle]), level(voice[middle]) * 10 ** (-20 / 20))
+
+    def test_panned_and_bass_content_passes_through(self):
+        guitar = tone(700, 2.0)
+        bass = tone(60, 2.0)
+        audio = np.stack([guitar + bass, bass], axis=1)
+        out = suppress_vocals(audio, SR)
+        middle = slice(SR // 2, 3 * SR // 2)
+        # The guitar is only on the left, the bass sits below the vocal band.
+        self.assertGreater(level(out[middle, 0]), 0.9 * level(audio[middle, 0]))
+        self.assertGreater(level(out[middle, 1]), 0.9 * level(bass[middle]))
+
+    def test_mono_is_treated_as_centred(self):
+        voice = tone(1000, 1.0)
+        out = suppress_vocals(voice, SR)
+        self.assertEqual(out.shape, (len(voice), 1))
+        self.assertLess(level(out[SR // 4:3 * SR // 4]), 0.2 * level(voice))
+
+
+class TestDspRender(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.voice = tone(1000, 3.0)
+        self.guitar = tone(500, 3.0, amplitude=0.2)
+        self.mix_path = os.path.join(self.tmp, "mix.wav")
+        sf.write(self.mix_path, np.stack([self.voice + self.guitar, self.voice], axis=1), SR, subtype="FLOAT")
+        self.segments = [{"word": "damn", "replacement": "dang", "start": 1.0, "end": 2.0}]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_only_cuss_regions_are_suppressed(self):
+        from src.mixer import render_clean_array
+
+        samples, rate, changed = render_clean_array(
+            self.mix_path, self.mix_path, self.segments, synth_dir=os.path.join(self.tmp, "synth"), dsp=True
+        )
+        original, _ = sf.read(self.mix_path, dtype="float32")
+        self.assertEqual((rate, changed), (SR, [(SR, 2 * SR)]))
+        np.testing.assert_array_equal(samples[:SR], original[:SR])
+        np.testing.assert_array_equal(samples[2 * SR:], original[2 * SR:])
+        inside = slice(SR + SR // 4, 2 * SR - SR // 4)
+        # The right channel is only the centred voice; the guitar on the left survives.
+        self.assertLess(level(samples[inside, 1]), 0.2 * level(self.voice[inside]))
+        self.assertGreater(level(samples[inside, 0]), 0.8 * level(self.guitar[inside]))
+
+    def test_edl_records_dsp_mode(self):
+        from src.edl import build_edl
+
+        edl = build_edl(self.mix_path, self.segments, None, self.mix_path, dsp=True)
+        self.assertEqual((edl["mix"]["mode"], edl["stems"]["vocals"]), ("dsp", None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+from src.edl import build_edl, default_edl_path, edl_segments, load_edl, save_edl
+from src.stem_store import write_stem
+
+SR = 8000
+
+
+class TestEdl(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.vocals = (0.2 * rng.standard_normal((SR * 2, 1))).astype(np.float32)
+        self.instrumental = (0.2 * rng.standard_normal((SR * 2, 1))).astype(np.float32)
+        self.mix_path = os.path.join(self.tmp, "mix.wav")
+        sf.write(self.mix_path, self.vocals + self.instrumental, SR, subtype="FLOAT")
+        self.vocals_path = write_stem(os.path.join(self.tmp, "vocals.stem"), self.vocals, SR)
+        self.inst_path = write_stem(os.path.join(self.tmp, "no_vocals.stem"), self.instrumental, SR)
+        self.segments = [{"word": "darn", "replacement": "beep", "start": 0.5, "end": 1.0}]
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _edl(self, **kwargs):
+        return build_edl(self.mix_path, self.segments, self.vocals_path, self.inst_path,
+                         synth_dir=os.path.join(self.tmp, "synth"), **kwargs)
+
+    def test_round_trip(self):
+        edl = self._edl(fade_ms=5)
+        path = save_edl(edl, default_edl_path(os.path.join(self.tmp, "clean.mp3")))
+        self.assertTrue(path.endswith("clean.edl.json"))
+        loaded = load_edl(path)
+        self.assertEqual(loaded, json.loads(json.dumps(edl)))
+        self.assertEqual(loaded["source"]["frames"], SR * 2)
+        self.assertEqual(loaded["mix"]["mode"], "stems")
+        seg = loaded["segments"][0]
+        self.assertEqual((seg["start_sample"], seg["end_sample"]), (SR // 2, SR))
+        self.assertEqual(seg["fade_ms"], 5)
+        self.assertNotIn("synth_path", edl_segments(loaded)[0])
+        self.assertEqual(edl_segments(loaded, fade_ms=20)[0]["fade_ms"], 20)
+
+    def test_rejects_unknown_version(self):
+        path = save_edl(dict(self._edl(), version=99), os.path.join(self.tmp, "bad.edl.json"))
+        with self.assertRaises(ValueError):
+            load_edl(path)
+
+    def test_render_without_models(self):
+        # Imported here so test_mixer can still install its pydub stub first.
+        from src.render import render_edl
+
+        edl = self._edl()
+        hard = os.path.join(self.tmp, "hard.wav")
+        soft = os.path.join(self.tmp, "soft.wav")
+        render_edl(edl, hard)
+        render_edl(edl, soft, fade_ms=50)
+        hard_audio, _ = sf.read(hard, dtype="float32", always_2d=True)
+        soft_audio, _ = sf.read(soft, dtype="float32", always_2d=True)
+
+        # The cuss region is instrumental only; outside the fades nothing differs.
+        np.testing.assert_allclose(hard_audio[SR // 2 + 100:SR - 100], self.instrumental[SR // 2 + 100:SR - 100], atol=1e-4)
+        np.testing.assert_allclose(hard_audio[:SR // 2 - 400], soft_audio[:SR // 2 - 400], atol=1e-4)
+        np.testing.assert_allclose(hard_audio[SR // 2 + 400:SR - 400], soft_audio[SR // 2 + 400:SR - 400], atol=1e-4)
+        self.assertGreater(np.abs(hard_audio[SR // 2:SR // 2 + 200] - soft_audio[SR // 2:SR // 2 + 200]).max(), 1e-3)
+
+
+if __name__ == "__main__":
+    unittest.main()
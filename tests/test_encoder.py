@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+from src.encoder import copy_stream, encode_audio, infer_format
+
+
+class TestEncoder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        t = np.arange(8000) / 8000.0
+        self.tone = (0.5 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_infer_format_from_extension(self):
+        self.assertEqual(infer_format("song.FLAC"), "flac")
+        self.assertEqual(infer_format("song.m4a"), "aac")
+        self.assertEqual(infer_format("song"), "mp3")
+
+    def test_wav_and_flac_round_trip(self):
+        for ext in ("wav", "flac"):
+            path = os.path.join(self.tmp, f"out.{ext}")
+            encode_audio(self.tone, 8000, path)
+            data, sr = sf.read(path, dtype="float32")
+            self.assertEqual(sr, 8000)
+            np.testing.assert_allclose(data, self.tone, atol=1e-3)
+
+    def test_passthrough_keeps_original_outside_changed_ranges(self):
+        original_path = os.path.join(self.tmp, "orig.wav")
+        sf.write(original_path, self.tone, 8000)
+        render = np.zeros_like(self.tone)
+
+        out = os.path.join(self.tmp, "clean.wav")
+        encode_audio(render, 8000, out, passthrough_from=original_path, changed_ranges=[(1000, 2000)])
+        data, _ = sf.read(out, dtype="float32")
+
+        np.testing.assert_allclose(data[:1000], self.tone[:1000], atol=1e-4)
+        self.assertTrue(np.all(data[1000:2000] == 0))
+        np.testing.assert_allclose(data[2000:], self.tone[2000:], atol=1e-4)
+
+    def test_passthrough_keeps_the_source_subtype(self):
+        for ext, subtype in (("wav", "PCM_24"), ("flac", "PCM_24"), ("wav", "FLOAT")):
+            original_path = os.path.join(self.tmp, f"orig.{ext}")
+            sf.write(original_path, self.tone, 8000, subtype=subtype)
+            out = os.path.join(self.tmp, f"clean.{ext}")
+            encode_audio(np.zeros_like(self.tone), 8000, out, passthrough_from=original_path, changed_ranges=[(1000, 2000)])
+            self.assertEqual(sf.info(out).subtype, subtype)
+            original, _ = sf.read(original_path, dtype="int32" if subtype == "PCM_24" else "float32")
+            data, _ = sf.read(out, dtype="int32" if subtype == "PCM_24" else "float32")
+            np.testing.assert_array_equal(data[2000:], original[2000:])
+
+    def test_copy_stream_only_when_formats_match(self):
+        source = os.path.join(self.tmp, "song.flac")
+        encode_audio(self.tone, 8000, source)
+        self.assertTrue(copy_stream(source, os.path.join(self.tmp, "copy.flac")))
+        self.assertFalse(copy_stream(source, os.path.join(self.tmp, "copy.mp3")))
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg not installed")
+    def test_lossy_formats_stream_through_ffmpeg(self):
+        for ext in ("mp3", "m4a", "opus"):
+            path = os.path.join(self.tmp, f"out.{ext}")
+            encode_audio(self.tone, 8000, path, bitrate="64k")
+            self.assertGreater(os.path.getsize(path), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import soundfile as sf
+
+SAMPLE_RATE = 8000  # src.fingerprint.SAMPLE_RATE, so nothing is resampled
+
+WORDS = [
+    {"word": "hello", "start": 2.0, "end": 2.5, "confidence": 0.9},
+    {"word": "shit", "start": 5.0, "end": 5.4, "confidence": 0.9},
+]
+
+
+def melody(seconds, seed):
+    """Random notes with harmonics, a new pitch every 250 ms."""
+    rng = np.random.default_rng(seed)
+    note = int(0.25 * SAMPLE_RATE)
+    t = np.arange(note) / SAMPLE_RATE
+    notes = [sum(np.sin(2 * np.pi * f * k * t) / k for k in (1, 2, 3)) * np.hanning(note)
+             for f in rng.uniform(150, 1200, int(seconds / 0.25))]
+    return (0.3 * np.concatenate(notes)).astype(np.float32)
+
+
+def fingerprint_module():
+    # Imported late: src.vad pulls in pydub, and test_mixer must install its stub first.
+    from src import fingerprint
+    return fingerprint
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.fp = fingerprint_module()
+        self.tmp = tempfile.mkdtemp()
+        self.index = self.fp.FingerprintIndex(os.path.join(self.tmp, "fp.db"))
+        self.song = melody(30.0, seed=1)
+        self.index.add_track("master", os.path.join(self.tmp, "missing.wav"), 30.0, *self.fp.fingerprint(self.song))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.tmp)
+
+    def test_noisy_copy_with_extra_lead_in_matches_at_its_offset(self):
+        rng = np.random.default_rng(0)
+        copy = np.concatenate([np.zeros(int(1.3 * SAMPLE_RATE), dtype=np.float32), self.song])
+        copy += 0.002 * rng.standard_normal(len(copy)).astype(np.float32)
+        found = self.index.match(*self.fp.fingerprint(copy))
+        self.assertEqual(found["track"], "master")
+        self.assertAlmostEqual(found["offset_s"], -1.3, delta=self.fp.HOP / SAMPLE_RATE)
+        self.assertGreaterEqual(found["coverage"], 0.9)
+        self.assertAlmostEqual(self.fp.refine_offset(copy, self.song, found["offset_s"]), -1.3, places=3)
+
+    def test_other_songs_are_not_duplicates(self):
+        other = melody(30.0, seed=2)
+        self.assertIsNone(self.fp.find_duplicate(self.index, other, *self.fp.fingerprint(other)))
+
+    def test_copies_are_only_aligned_when_the_reference_can_be_checked(self):
+        duplicate = self.fp.find_duplicate(self.index, self.song, *self.fp.fingerprint(self.song))
+        self.assertEqual(duplicate["offset_s"], 0.0)
+        self.assertFalse(duplicate["aligned"])  # the reference input is gone
+
+    def test_edited_windows_differ_but_noise_does_not(self):
+        rng = np.random.default_rng(0)
+        noisy = self.song + 0.002 * rng.standard_normal(len(self.song)).astype(np.float32)
+        self.assertEqual(self.fp.differing_intervals(noisy, self.song, 0.0), [])
+
+        edited = self.song.copy()
+        edited[int(5.0 * SAMPLE_RATE):int(5.5 * SAMPLE_RATE)] += melody(0.5, seed=9)
+        self.assertEqual(self.fp.differing_intervals(edited, self.song, 0.0), [(5.0, 5.5)])
+
+    def test_shift_words_moves_to_query_time(self):
+        self.assertEqual(self.fp.shift_words(WORDS, 3.0, duration=10.0), [dict(WORDS[1], start=2.0, end=2.4)])
+
+
+class TestProcessSongDeduplication(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.master = os.path.join(self.tmp, "master.wav")
+        sf.write(self.master, melody(20.0, seed=3), SAMPLE_RATE)
+        self.stems = [os.path.join(self.tmp, name) for name in ("vocals.wav", "no_vocals.wav")]
+        for stem in self.stems:
+            open(stem, "w").close()
+        # Stub the torch-backed modules as test_pipeline does, importing late so
+        # test_mixer can still install its pydub stub first.
+        sys.modules.setdefault("src.separator", types.SimpleNamespace(separate_vocals=MagicMock()))
+        sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _run_twice(self, copy, words=WORDS):
+        from src import main
+
+        index = os.path.join(self.tmp, "fp.db")
+        with patch.object(main, "load_whisper_model"), \
+                patch.object(main, "transcribe_audio", side_effect=[WORDS, words]) as mock_transcribe, \
+                patch.object(main, "separate_vocals", return_value=tuple(self.stems)) as mock_separate, \
+                patch.object(main, "create_clean_version") as mock_create:
+            for path in (self.master, copy):
+                main.process_song(path, os.path.join(self.tmp, "clean.wav"), use_synth=False, fingerprint_index=index)
+        return mock_transcribe, mock_separate, mock_create
+
+    def test_aligned_copy_reuses_transcript_and_stems(self):
+        copy = os.path.join(self.tmp, "copy.flac")
+        sf.write(copy, sf.read(self.master)[0], SAMPLE_RATE)
+        mock_transcribe, mock_separate, mock_create = self._run_twice(copy)
+        self.assertEqual(mock_transcribe.call_count, 1)
+        self.assertEqual(mock_separate.call_count, 1)
+        self.assertEqual(mock_create.call_args.kwargs["vocals_path"], os.path.abspath(self.stems[0]))
+
+    def test_shifted_copy_reuses_the_transcript_at_its_offset(self):
+        copy = os.path.join(self.tmp, "radio.wav")
+        sf.write(copy, np.concatenate([np.zeros(SAMPLE_RATE), sf.read(self.master)[0]]), SAMPLE_RATE)
+        mock_transcribe, mock_separate, mock_create = self._run_twice(copy)
+        self.assertEqual(mock_transcribe.call_count, 1)
+        self.assertEqual(mock_separate.call_count, 2)
+        segments = mock_create.call_args.kwargs["cuss_segments"]
+        self.assertEqual([(s["word"], s["start"]) for s in segments], [("shit", 6.0)])
+
+    def test_edited_copy_is_transcribed_again_where_it_differs(self):
+        # A radio edit: same backing track, but something else over the cuss word.
+        audio = sf.read(self.master, dtype="float32")[0]
+        audio[int(5.0 * SAMPLE_RATE):int(5.5 * SAMPLE_RATE)] += melody(0.5, seed=9)
+        copy = os.path.join(self.tmp, "edit.wav")
+        sf.write(copy, audio, SAMPLE_RATE)
+        edit = [{"word": "fuck", "start": 5.1, "end": 5.4, "confidence": 0.9}]
+        mock_transcribe, mock_separate, mock_create = self._run_twice(copy, words=edit)
+
+        self.assertEqual(mock_transcribe.call_count, 2)
+        self.assertEqual(mock_transcribe.call_args.kwargs["voiced_intervals"], [(4.0, 6.5)])
+        self.assertEqual(mock_separate.call_count, 2)
+        segments = mock_create.call_args.kwargs["cuss_segments"]
+        self.assertEqual([(s["word"], s["start"]) for s in segments], [("fuck", 5.1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
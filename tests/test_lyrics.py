@@ -0,0 +1,34 @@
+import unittest
+
+from src.lyrics import plan_windows, split_timestamped_tokens
+
+TS = 50000  # stand-in for tokenizer.timestamp_begin
+
+
+class TestBatchedTranscriptionHelpers(unittest.TestCase):
+    def test_windows_own_every_moment_once(self):
+        windows = plan_windows(70.0)
+        self.assertEqual([(w[0], w[1]) for w in windows], [(0.0, 30.0), (27.0, 57.0), (54.0, 70.0)])
+        owned = [(w[2], w[3]) for w in windows]
+        self.assertEqual(owned[0][0], 0.0)
+        self.assertEqual(owned[-1][1], 70.0)
+        for (_, end), (start, _) in zip(owned, owned[1:]):
+            self.assertEqual(end, start)
+        for start, end, own_start, own_end in windows:
+            self.assertTrue(start <= own_start < own_end <= end)
+
+    def test_short_song_is_one_window(self):
+        self.assertEqual(plan_windows(12.5), [(0.0, 12.5, 0.0, 12.5)])
+
+    def test_split_timestamped_tokens(self):
+        tokens = [TS + 0, 1, 2, TS + 50, TS + 50, 3, TS + 100, TS + 120, 4]
+        segments = split_timestamped_tokens(tokens, TS, offset=27.0, window_end=57.0)
+        self.assertEqual([(s["start"], s["end"], s["tokens"]) for s in segments], [
+            (27.0, 28.0, [1, 2]),
+            (28.0, 29.0, [3]),
+            (29.4, 57.0, [4]),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from collections import namedtuple
+from unittest.mock import MagicMock, patch
+
+from src.lyrics_align import (assign_timings, lyric_words, parse_lyrics, place_unaligned_cuss_words, plan_chunks,
+                              text_cuss_words)
+
+WordTiming = namedtuple("WordTiming", "word tokens start end probability")
+
+LRC = """[ar:Someone]
+[offset:+500]
+[00:12.00]First line, here
+[00:15.50][01:05.50]Chorus <00:16.00>goes shit
+[Chorus]
+[00:20.00]last line.
+"""
+
+
+class TestParseLyrics(unittest.TestCase):
+    def test_lrc_lines_are_timed_sorted_and_offset(self):
+        lines = parse_lyrics(LRC)
+        self.assertEqual([line["time"] for line in lines], [11.5, 15.0, 19.5, 65.0])
+        self.assertEqual(lines[1]["text"], "Chorus goes shit")
+        self.assertEqual(lines[3]["text"], "Chorus goes shit")
+
+    def test_plain_lyrics_drop_section_labels(self):
+        lines = parse_lyrics("[Verse 1]\nHello there\n\nWhat the fuck\n")
+        self.assertEqual(lines, [{"time": None, "text": "Hello there"}, {"time": None, "text": "What the fuck"}])
+        self.assertEqual([w["word"] for w in lyric_words(lines)], ["hello", "there", "what", "the", "fuck"])
+
+    def test_detection_runs_on_the_text(self):
+        segments = text_cuss_words(parse_lyrics(LRC))
+        self.assertEqual([(s["word"], s["start"]) for s in segments], [("shit", 15.0), ("shit", 65.0)])
+        self.assertEqual(text_cuss_words(parse_lyrics("nothing to see here")), [])
+
+
+class TestAlignmentHelpers(unittest.TestCase):
+    def test_chunks_stay_inside_the_window(self):
+        lines = [{"time": t, "text": "la"} for t in (2.0, 10.0, 25.0, 31.0, 70.0)]
+        chunks = plan_chunks(lines, duration=80.0, window=30.0)
+        self.assertEqual([numbers for _, _, numbers in chunks], [[0, 1, 2], [3], [4]])
+        self.assertEqual(chunks[0][:2], (1.5, 31.5))
+        # Line 3 runs until 70 s but its window is capped at 30 s.
+        self.assertEqual(chunks[1][:2], (30.5, 60.5))
+        self.assertEqual(chunks[2][:2], (69.5, 80.0))
+
+    def test_timings_map_back_to_lyric_words_by_token(self):
+        words = lyric_words([{"time": None, "text": "don't shit"}])
+        # The tokenizer split "don't" into two timed pieces and "shit" into one.
+        timings = [
+            WordTiming(" don", [1], 0.5, 0.7, 0.9),
+            WordTiming("'t", [2], 0.7, 0.8, 0.6),
+            WordTiming(" shit", [3], 1.0, 1.3, 0.8),
+        ]
+        placed = assign_timings(words, [2, 1], timings, offset=10.0)
+        self.assertEqual([(w["word"], w["start"], w["end"], w["confidence"]) for w in placed],
+                         [("don't", 10.5, 10.8, 0.6), ("shit", 11.0, 11.3, 0.8)])
+        self.assertEqual(assign_timings(words, [2, 1], timings[:2], offset=0.0)[1], None)
+
+    def test_unaligned_cuss_words_fill_the_gap_between_neighbours(self):
+        lines = parse_lyrics("[00:10.00]well shit happens\n[00:14.00]fuck\n[00:20.00]end")
+        words = lyric_words(lines)
+        placed = [dict(words[0], start=10.2, end=10.5), None, dict(words[2], start=11.0, end=11.6), None, None]
+        missing = place_unaligned_cuss_words(words, placed, lines, duration=30.0)
+        self.assertEqual([(w["word"], w["start"], w["end"], w["unaligned"]) for w in missing],
+                         [("shit", 10.5, 11.0, True), ("fuck", 14.0, 20.0, True)])
+        # Plain lyrics have no line span: the neighbours (or the song edges) bound the word.
+        plain = lyric_words(parse_lyrics("shit happens"))
+        missing = place_unaligned_cuss_words(plain, [None, dict(plain[1], start=3.0, end=3.4)], parse_lyrics("shit happens"), 60.0)
+        self.assertEqual([(w["start"], w["end"]) for w in missing], [(0.0, 3.0)])
+
+
+class TestProcessSongWithLyrics(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.input = os.path.join(self.tmp, "song.wav")
+        with open(self.input, "w") as f:
+            f.write("dummy audio content")
+        self.lyrics = os.path.join(self.tmp, "song.lrc")
+        # Stub the torch-backed modules as test_pipeline does, importing late so
+        # test_mixer can still install its pydub stub first.
+        sys.modules.setdefault("src.separator", types.SimpleNamespace(separate_vocals=MagicMock()))
+        sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_clean_lyrics_exit_before_loading_a_model(self):
+        from src import main
+
+        with open(self.lyrics, "w") as f:
+            f.write("[00:01.00]nothing to see here\n")
+        with patch.object(main, "load_whisper_model") as mock_load, \
+                patch.object(main, "separate_vocals") as mock_separate:
+            self.assertIsNone(main.process_song(self.input, os.path.join(self.tmp, "clean.wav"), lyrics=self.lyrics))
+        mock_load.assert_not_called()
+        mock_separate.assert_not_called()
+
+    def test_lyrics_with_cuss_words_are_aligned_instead_of_transcribed(self):
+        from src import main
+
+        with open(self.lyrics, "w") as f:
+            f.write("[00:01.00]what the shit\n")
+        aligned = [{"word": "shit", "start": 1.6, "end": 1.9, "confidence": 0.8}]
+        stems = [os.path.join(self.tmp, name) for name in ("vocals.stem", "no_vocals.stem")]
+        with patch.object(main, "load_whisper_model"), \
+                patch.object(main, "align_lyrics", return_value=aligned) as mock_align, \
+                patch.object(main, "transcribe_audio") as mock_transcribe, \
+                patch.object(main, "separate_vocals", return_value=tuple(stems)), \
+                patch.object(main, "create_clean_version") as mock_create:
+            main.process_song(self.input, os.path.join(self.tmp, "clean.wav"), use_synth=False, lyrics=self.lyrics)
+        mock_transcribe.assert_not_called()
+        self.assertEqual(mock_align.call_args[0][2], [{"time": 1.0, "text": "what the shit"}])
+        segments = mock_create.call_args.kwargs["cuss_segments"]
+        self.assertEqual([(s["word"], s["start"], s["end"]) for s in segments], [("shit", 1.6, 1.9)])
+
+
+if __name__ == "__main__":
+    unittest.main()
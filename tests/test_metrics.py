@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import unittest
+
+from src import metrics
+
+
+class TestPipelineMetrics(unittest.TestCase):
+    def test_stage_records_timings_and_throughput(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            sink = os.path.join(tmp, "metrics.jsonl")
+            run = metrics.PipelineMetrics(sink_path=sink, run_id="test")
+            with run.stage("mixing", audio_seconds=10.0) as extra:
+                extra["segments"] = 3
+
+            with open(sink) as f:
+                lines = [json.loads(line) for line in f]
+
+        self.assertEqual(len(lines), 1)
+        record = lines[0]
+        self.assertEqual(record["stage"], "mixing")
+        self.assertEqual(record["status"], "ok")
+        self.assertEqual(record["segments"], 3)
+        self.assertGreaterEqual(record["wall_s"], 0)
+        self.assertIn("cpu_s", record)
+        self.assertIn("audio_s_per_s", record)
+
+    def test_failed_stage_is_recorded_as_error(self):
+        run = metrics.PipelineMetrics()
+        with self.assertRaises(RuntimeError):
+            with run.stage("separation"):
+                raise RuntimeError("boom")
+        self.assertEqual(run.records[-1]["status"], "error")
+
+    def test_cache_hit_rate_in_summary(self):
+        run = metrics.PipelineMetrics()
+        run.cache("synth_clip", True)
+        run.cache("synth_clip", True)
+        run.cache("synth_clip", False)
+        summary = run.summary()
+        self.assertAlmostEqual(summary["caches"]["synth_clip"]["hit_rate"], 2 / 3)
+
+    def test_long_running_recorders_keep_totals_but_not_records(self):
+        run = metrics.PipelineMetrics(keep_records=False)
+        for _ in range(3):
+            with run.stage("mixing"):
+                pass
+        self.assertEqual(run.records, [])
+        self.assertEqual(run.summary()["stages"]["mixing"]["calls"], 3)
+
+    def test_activate_restores_previous_recorder(self):
+        run = metrics.PipelineMetrics()
+        previous = metrics.activate(run)
+        try:
+            self.assertIs(metrics.current(), run)
+        finally:
+            metrics.activate(previous)
+        self.assertIsNot(metrics.current(), run)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+from src.mixer import patch_clean_version
+from src.patcher import changed_sample_ranges, patch_file
+
+
+def _silence(start, stop, original):
+    return np.zeros_like(original)
+
+
+class TestPatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.sr = 8000
+        rng = np.random.default_rng(0)
+        self.instrumental = (0.2 * rng.standard_normal((self.sr * 3, 2))).astype(np.float32)
+        t = np.arange(self.sr * 3) / self.sr
+        self.vocals = np.repeat((0.3 * np.sin(2 * np.pi * 220 * t))[:, None], 2, axis=1).astype(np.float32)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_changed_ranges_are_padded_and_merged(self):
+        segments = [{"start": 1.0, "end": 1.2}, {"start": 1.21, "end": 1.3}, {"start": 2.0, "end": 2.1}]
+        ranges = changed_sample_ranges(segments, 1000, total_frames=2050, margin_ms=10)
+        self.assertEqual(ranges, [(990, 1310), (1990, 2050)])
+
+    def test_pcm_patch_only_touches_edited_ranges(self):
+        for ext in ("wav", "flac"):
+            original = os.path.join(self.tmp, f"orig.{ext}")
+            sf.write(original, self.instrumental, self.sr)
+            source, _ = sf.read(original, dtype="float32")
+            output = os.path.join(self.tmp, f"patched.{ext}")
+
+            patch_file(original, output, [(100, 200), (5000, 5100)], _silence)
+            data, _ = sf.read(output, dtype="float32")
+
+            self.assertTrue(np.all(data[100:200] == 0))
+            self.assertTrue(np.all(data[5000:5100] == 0))
+            np.testing.assert_array_equal(data[:100], source[:100])
+            np.testing.assert_array_equal(data[200:5000], source[200:5000])
+
+    def test_patch_clean_version_replaces_vocals_inside_segments(self):
+        original = os.path.join(self.tmp, "song.wav")
+        inst_path = os.path.join(self.tmp, "no_vocals.wav")
+        vocals_path = os.path.join(self.tmp, "vocals.wav")
+        sf.write(original, self.instrumental + self.vocals, self.sr, subtype="FLOAT")
+        sf.write(inst_path, self.instrumental, self.sr, subtype="FLOAT")
+        sf.write(vocals_path, self.vocals, self.sr, subtype="FLOAT")
+
+        output = os.path.join(self.tmp, "clean.wav")
+        segments = [{"word": "shit", "replacement": "ship", "start": 1.0, "end": 1.5}]
+        patch_clean_version(original, inst_path, segments, vocals_path=vocals_path,
+                            synth_dir=self.tmp, output_path=output)
+        data, _ = sf.read(output, dtype="float32")
+
+        np.testing.assert_allclose(data[8000:12000], self.instrumental[8000:12000], atol=1e-6)
+        np.testing.assert_allclose(data[:8000], (self.instrumental + self.vocals)[:8000], atol=1e-6)
+        np.testing.assert_allclose(data[12000:], (self.instrumental + self.vocals)[12000:], atol=1e-6)
+
+    @unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg not installed")
+    def test_mp3_patch_keeps_frames_outside_the_edit_bit_exact(self):
+        wav = os.path.join(self.tmp, "src.wav")
+        sf.write(wav, np.tile(self.instrumental + self.vocals, (4, 1)) * 0.5, 44100)
+        original = os.path.join(self.tmp, "orig.mp3")
+        subprocess.run(["ffmpeg", "-loglevel", "error", "-i", wav, "-b:a", "128k", original], check=True)
+        output = os.path.join(self.tmp, "patched.mp3")
+
+        patch_file(original, output, [(44100, 50000)], _silence)
+
+        def decode(path):
+            raw = subprocess.run(["ffmpeg", "-loglevel", "error", "-i", path, "-f", "f32le", "pipe:1"],
+                                 stdout=subprocess.PIPE, check=True).stdout
+            return np.frombuffer(raw, dtype=np.float32).reshape(-1, 2)
+
+        before, after = decode(original), decode(output)
+        self.assertEqual(before.shape, after.shape)
+        self.assertLess(np.abs(after[44100 + 1000:50000 - 1000]).max(), 0.05)
+        np.testing.assert_array_equal(after[:30000], before[:30000])
+        np.testing.assert_array_equal(after[70000:], before[70000:])
+
+
+if __name__ == "__main__":
+    unittest.main()
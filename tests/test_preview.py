@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+from src.edl import build_edl
+from src.stem_store import write_stem
+
+SR = 8000
+
+
+class TestPreview(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.vocals = (0.1 * rng.standard_normal((SR * 20, 2))).astype(np.float32)
+        self.instrumental = (0.1 * rng.standard_normal((SR * 20, 2))).astype(np.float32)
+        self.mix_path = os.path.join(self.tmp, "mix.wav")
+        sf.write(self.mix_path, self.vocals + self.instrumental, SR, subtype="FLOAT")
+        self.vocals_path = write_stem(os.path.join(self.tmp, "vocals.stem"), self.vocals, SR)
+        self.inst_path = write_stem(os.path.join(self.tmp, "no_vocals.stem"), self.instrumental, SR)
+        self.segments = [
+            {"word": "shit", "replacement": "shoot", "start": 3.0, "end": 3.5},
+            {"word": "damn", "replacement": "dang", "start": 5.0, "end": 5.25},
+            {"word": "fuck", "replacement": "fudge", "start": 15.0, "end": 15.5},
+        ]
+        self.edl = build_edl(self.mix_path, self.segments, self.vocals_path, self.inst_path,
+                             synth_dir=os.path.join(self.tmp, "synth"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_windows_merge_nearby_edits(self):
+        from src.preview import preview_windows
+
+        windows = preview_windows(self.segments, duration=16.0, context_s=2.0)
+        self.assertEqual([(start, end, len(segs)) for start, end, segs in windows], [(1.0, 7.25, 2), (13.0, 16.0, 1)])
+
+    def test_sequential_preview_plays_original_then_clean(self):
+        # Imported here so test_mixer can still install its pydub stub first.
+        from src.mixer import render_clean_array
+        from src.preview import default_labels_path, render_preview
+
+        output = os.path.join(self.tmp, "review.wav")
+        render_preview(self.edl, output, context_s=1.0)
+        review, rate = sf.read(output, dtype="float32", always_2d=True)
+        with open(default_labels_path(output), encoding="utf-8") as f:
+            labels = [line.rstrip("\n").split("\t") for line in f]
+        self.assertEqual(len(labels), 4)
+        self.assertTrue(labels[0][2].startswith("original: shit -> shoot @ 3.00s"))
+        self.assertTrue(labels[1][2].startswith("clean: shit -> shoot"))
+
+        # Snippet 1 covers 2.0-4.5 s of the song: original, gap, then the clean render of the same span.
+        full, _, _ = render_clean_array(self.mix_path, self.inst_path, list(self.segments), self.vocals_path)
+        original_start, clean_start = int(float(labels[0][0]) * rate), int(float(labels[1][0]) * rate)
+        length = int(2.5 * SR)
+        np.testing.assert_allclose(review[original_start:original_start + length],
+                                   (self.vocals + self.instrumental)[2 * SR:2 * SR + length], atol=1e-4)
+        np.testing.assert_allclose(review[clean_start:clean_start + length], full[2 * SR:2 * SR + length], atol=1e-4)
+        # Snippets of 4.25 s (merged edits) and 2.5 s, each played twice with 0.4 s and 1 s gaps.
+        self.assertEqual(len(review), int((2 * (4.25 + 2.5) + 2 * (0.4 + 1.0)) * SR))
+
+    def test_split_preview_puts_original_left_and_clean_right(self):
+        from src.preview import render_preview
+
+        output = os.path.join(self.tmp, "split.wav")
+        render_preview(self.edl, output, context_s=0.5, layout="split")
+        review, _ = sf.read(output, dtype="float32", always_2d=True)
+        inside = review[int(0.5 * SR):int(1.0 * SR)]  # the first edit, 3.0-3.5 s
+        np.testing.assert_allclose(inside[:, 0], (self.vocals + self.instrumental)[3 * SR:int(3.5 * SR)].mean(axis=1), atol=1e-4)
+        np.testing.assert_allclose(inside[:, 1], self.instrumental[3 * SR:int(3.5 * SR)].mean(axis=1), atol=1e-4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import soundfile as sf
+
+from src.repetition import SAMPLE_RATE, apply_repeats, decode_intervals, detect_repeats, verify_repeat
+
+NOTES = {"C": 261.63, "D": 293.66, "E": 329.63, "F": 349.23, "G": 392.0, "A": 440.0, "B": 493.88}
+
+
+def backing(chords, chord_s=2.5):
+    t = np.arange(int(chord_s * SAMPLE_RATE)) / SAMPLE_RATE
+    return np.concatenate([
+        0.1 * sum(np.sin(2 * np.pi * NOTES[n] * k * t) / k for n in chord for k in (1, 2, 3)) for chord in chords
+    ])
+
+
+def vocal(length, seed):
+    """Harmonic tone gated into random syllables."""
+    rng = np.random.default_rng(seed)
+    envelope = np.zeros(length)
+    position = 0
+    while position < length:
+        syllable = int(rng.uniform(0.12, 0.35) * SAMPLE_RATE)
+        envelope[position:position + syllable] = np.hanning(syllable)[:length - position]
+        position += syllable + int(rng.uniform(0.05, 0.3) * SAMPLE_RATE)
+    t = np.arange(length) / SAMPLE_RATE
+    f0 = rng.uniform(180, 260)
+    return 0.3 * envelope * sum(np.sin(2 * np.pi * f0 * k * t) / k for k in range(1, 8))
+
+
+VERSE = [("C", "E", "G"), ("A", "C", "E"), ("F", "A", "C"), ("G", "B", "D")]
+CHORUS = [("F", "A", "C"), ("G", "B", "D"), ("C", "E", "G"), ("C", "E", "G")]
+BRIDGE = [("D", "F", "A"), ("E", "G", "B"), ("A", "C", "E"), ("G", "B", "D")]
+
+
+def section(chords, seed):
+    music = backing(chords)
+    return music + vocal(len(music), seed)
+
+
+class TestRepetition(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_finds_a_repeated_chorus_but_not_a_new_verse_over_old_chords(self):
+        chorus = section(CHORUS, 2)
+        song = np.concatenate([section(VERSE, 1), chorus, section(BRIDGE, 3), chorus, section(VERSE, 4)])
+        path = os.path.join(self.tmp, "song.wav")
+        sf.write(path, song.astype(np.float32), SAMPLE_RATE)
+
+        repeats, duration = detect_repeats(path)
+        self.assertAlmostEqual(duration, 50.0, places=2)
+        self.assertEqual(len(repeats), 1)
+        self.assertAlmostEqual(repeats[0]["offset"], 20.0, delta=0.05)
+        self.assertAlmostEqual(repeats[0]["source"][0], 10.0, delta=0.5)
+        self.assertAlmostEqual(repeats[0]["source"][1], 20.0, delta=0.5)
+
+    def test_verification_refines_the_offset_and_rejects_other_lyrics(self):
+        rng = np.random.default_rng(0)
+        phrase = rng.random(200)
+        envelope = np.concatenate([rng.random(100), phrase, rng.random(53), phrase, rng.random(100)])
+        candidate = {"source": (1.0, 3.0), "repeat": (3.5, 5.5), "offset": 2.5}
+        self.assertAlmostEqual(verify_repeat(envelope, 0.01, candidate), 2.53)
+
+        envelope[353:553] = rng.random(200)
+        self.assertIsNone(verify_repeat(envelope, 0.01, candidate))
+
+    def test_repeats_are_skipped_and_get_the_source_words(self):
+        repeats = [{"source": (10.0, 20.0), "repeat": (30.0, 40.0), "offset": 20.0}]
+        self.assertEqual(decode_intervals(repeats, 50.0), [(0.0, 30.5), (39.5, 50.0)])
+        self.assertEqual(decode_intervals(repeats, 50.0, voiced=[(5.0, 25.0), (32.0, 45.0)]), [(5.0, 25.0), (39.5, 45.0)])
+
+        words = [
+            {"word": "edge", "start": 10.2, "end": 10.4},
+            {"word": "shit", "start": 12.0, "end": 12.4},
+            {"word": "outro", "start": 41.0, "end": 41.5},
+        ]
+        result = apply_repeats(words, repeats)
+        self.assertEqual([(w["word"], w["start"]) for w in result],
+                         [("edge", 10.2), ("shit", 12.0), ("shit", 32.0), ("outro", 41.0)])
+        self.assertEqual(result[2]["repeat_offset"], 20.0)
+
+    def test_pipeline_transcribes_and_synthesizes_a_repeat_once(self):
+        sys.modules.setdefault("src.separator", types.SimpleNamespace(separate_vocals=MagicMock()))
+        sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+        from src import main
+
+        repeats = [{"source": (10.0, 20.0), "repeat": (30.0, 40.0), "offset": 20.0}]
+        words = [{"word": "shit", "start": 12.0, "end": 12.4}]
+        with patch.object(main, "detect_repeats", return_value=(repeats, 50.0)), \
+                patch.object(main, "transcribe_audio", return_value=words) as mock_transcribe:
+            lyrics = main.run_transcription("song.wav", whisper_model=MagicMock(), repeats=True)
+        self.assertEqual(mock_transcribe.call_args[1]["voiced_intervals"], [(0.0, 30.5), (39.5, 50.0)])
+
+        segments = main.run_detection(lyrics)
+        synthesizer = MagicMock()
+        main.run_synthesis(segments, "vocals.wav", synth_dir=os.path.join(self.tmp, "synth"), synthesizer=synthesizer)
+        self.assertEqual(synthesizer.generate_speech.call_count, 1)
+        self.assertEqual(segments[0]["synth_path"], segments[1]["synth_path"])
+
+
+if __name__ == "__main__":
+    unittest.main()
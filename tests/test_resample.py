@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from src.resample import StreamResampler, _kernel, output_length, resample
+
+
+def tone(freq, seconds, rate):
+    return np.sin(2 * np.pi * freq * np.arange(int(seconds * rate)) / rate).astype(np.float32)
+
+
+class TestResample(unittest.TestCase):
+    def test_tone_keeps_its_frequency_and_level(self):
+        for src, dst in ((48000, 44100), (22050, 44100), (44100, 16000)):
+            out = resample(tone(1000, 1.0, src), src, dst)
+            self.assertEqual(len(out), output_length(src, src, dst))
+            middle = out[dst // 10:-dst // 10]
+            expected = tone(1000, 1.0, dst)[dst // 10:-dst // 10]
+            self.assertLess(np.abs(middle - expected).max(), 3e-3)  # Kaiser beta 5: about -55 dB ripple
+
+    def test_content_above_the_new_nyquist_is_removed(self):
+        out = resample(tone(12000, 1.0, 44100), 44100, 16000)
+        self.assertLess(np.sqrt(np.mean(out[1600:-1600] ** 2)), 1e-3)
+
+    def test_kernels_are_built_once_per_rate_pair(self):
+        _kernel.cache_clear()
+        for _ in range(5):
+            resample(np.zeros((4800, 2), dtype=np.float32), 48000, 44100)
+        self.assertEqual((_kernel.cache_info().misses, _kernel.cache_info().currsize), (1, 1))
+
+    def test_same_rate_is_a_no_op(self):
+        data = np.ones((10, 2), dtype=np.float32)
+        self.assertIs(resample(data, 44100, 44100), data)
+
+
+class TestStreamResampler(unittest.TestCase):
+    def test_blocks_match_the_whole_buffer(self):
+        rng = np.random.default_rng(0)
+        data = rng.standard_normal((22050 + 17, 2)).astype(np.float32)
+        for src, dst in ((22050, 44100), (44100, 16000), (48000, 44100)):
+            resampler = StreamResampler(src, dst)
+            pieces, start = [], 0
+            while start < len(data):
+                size = int(rng.integers(1, 3000))
+                pieces.append(resampler.process(data[start:start + size]))
+                start += size
+            pieces.append(resampler.flush())
+            out = np.concatenate(pieces)
+            np.testing.assert_allclose(out, resample(data, src, dst), atol=1e-5)
+            self.assertEqual(resampler.produced, len(out))
+
+    def test_mono_blocks_and_matching_rates(self):
+        resampler = StreamResampler(32000, 16000)
+        out = np.concatenate([resampler.process(np.ones(100, dtype=np.float32)) for _ in range(10)] + [resampler.flush()])
+        self.assertEqual(out.shape, (500,))
+        passthrough = StreamResampler(16000, 16000)
+        block = np.ones(160, dtype=np.float32)
+        self.assertIs(passthrough.process(block), block)
+        self.assertEqual((passthrough.produced, len(passthrough.flush())), (160, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
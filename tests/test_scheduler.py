@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.scheduler import CostModel, Scheduler
+
+
+def stage(name, wall_s, audio_seconds=None, status="ok", **fields):
+    return dict(event="stage", stage=name, status=status, wall_s=wall_s, audio_seconds=audio_seconds, **fields)
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_costs_are_fitted_from_metrics(self):
+        path = os.path.join(self.tmp, "metrics.jsonl")
+        records = [
+            stage("transcription.inference", 20.0, 100.0, model="small"),
+            stage("transcription.inference", 30.0, 100.0, model="small"),
+            stage("transcription.inference", 90.0, 100.0, model="small", status="error"),
+            stage("separation", 50.0, 100.0, shifts=1),
+            stage("synthesis.inference", 2.0, 0.4),
+            {"event": "summary"},
+        ]
+        with open(path, "w") as f:
+            f.write("\n".join(json.dumps(r) for r in records) + "\nnot json\n")
+        costs = CostModel.from_metrics([path, os.path.join(self.tmp, "missing.jsonl")])
+        self.assertAlmostEqual(costs.costs["transcription:small"], 0.25)
+        self.assertAlmostEqual(costs.costs["synthesis:xtts"], 2.0)
+        self.assertAlmostEqual(costs.separation(1), 0.5)
+        self.assertAlmostEqual(costs.separation(3), 1.5)
+        self.assertEqual(costs.costs["transcription:base"], 0.08)
+
+    def test_quality_degrades_as_the_queue_grows(self):
+        scheduler = Scheduler(400, max_model_size="small", min_model_size="base")
+        idle = scheduler.plan(180, queue_depth=0)
+        busy = scheduler.plan(180, queue_depth=3)
+        swamped = scheduler.plan(180, queue_depth=50)
+        self.assertEqual((idle["whisper"], idle["shifts"], idle["degraded"]), ("small", 5, False))
+        self.assertEqual((busy["whisper"], busy["shifts"], busy["synth"]), ("base", 1, "xtts"))
+        self.assertEqual((swamped["whisper"], swamped["shifts"], swamped["synth"]), ("base", 1, "silence"))
+        self.assertTrue(swamped["degraded"])
+
+    def test_replan_after_detection_uses_the_real_word_count(self):
+        scheduler = Scheduler(400, max_model_size="base", workers=2)
+        # A clean song needs no separation, so only the transcription counts.
+        self.assertEqual(scheduler.plan(180, cuss_words=0, whisper="base")["estimated_s"], 0.0)
+        plan = scheduler.plan(180, queue_depth=2, elapsed=100, cuss_words=1, whisper="base")
+        self.assertEqual((plan["whisper"], plan["shifts"], plan["synth"]), ("base", 2, "xtts"))
+        self.assertEqual(plan["budget_s"], 300)
+
+    def test_dsp_is_the_last_resort_when_allowed(self):
+        self.assertNotIn(0, [plan["shifts"] for plan in Scheduler(400).ladder()])
+        scheduler = Scheduler(400, max_model_size="base", allow_dsp=True)
+        self.assertEqual(scheduler.ladder()[-1], {"whisper": "tiny", "separation": "dsp", "shifts": 0, "synth": "silence"})
+        plan = scheduler.plan(180, queue_depth=50, cuss_words=3, whisper="base")
+        self.assertEqual((plan["separation"], plan["shifts"], plan["synth"]), ("dsp", 0, "silence"))
+        self.assertLess(plan["estimated_s"], 10)
+
+    def test_whisper_variants_run_on_their_sizes_rung(self):
+        scheduler = Scheduler(1000.0, max_model_size="large-v3", min_model_size="base.en")
+        self.assertEqual(scheduler.whisper_sizes, ("large-v3", "medium", "small", "base.en"))
+        self.assertEqual(scheduler.plan(1.0)["whisper"], "large-v3")
+        self.assertEqual(Scheduler(10.0, max_model_size="turbo").whisper_sizes[:2], ("turbo", "medium"))
+        with self.assertRaisesRegex(ValueError, "Unknown Whisper model size 'huge'"):
+            Scheduler(10.0, max_model_size="huge")
+
+    def test_process_song_records_its_plan(self):
+        sys.modules.setdefault("src.separator", types.SimpleNamespace(separate_vocals=MagicMock()))
+        sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+        from src import main
+
+        input_path = os.path.join(self.tmp, "song.wav")
+        open(input_path, "w").close()
+        output = os.path.join(self.tmp, "clean.wav")
+        words = [{"word": "shit", "start": 1.0, "end": 1.5}]
+        scheduler = Scheduler(150, max_model_size="small", use_synth=False)
+        with patch.object(main, "get_audio_duration", return_value=180.0), \
+                patch.object(main, "load_whisper_model") as mock_load, \
+                patch.object(main, "transcribe_audio", return_value=words), \
+                patch.object(main, "separate_vocals", return_value=("v.wav", "nv.wav")) as mock_separate, \
+                patch.object(main, "create_clean_version"):
+            main.process_song(input_path, output, use_synth=False, scheduler=scheduler, queue_depth=1)
+
+        with open(os.path.join(self.tmp, "clean.edl.json")) as f:
+            schedule = json.load(f)["schedule"]
+        self.assertEqual(mock_load.call_args[0][0], schedule["whisper"])
+        self.assertEqual(mock_separate.call_args[1]["shifts"], schedule["shifts"])
+        self.assertEqual((schedule["whisper"], schedule["synth"], schedule["queue_depth"]), ("base", "silence", 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
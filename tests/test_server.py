@@ -0,0 +1,169 @@
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+# The server imports the whole pipeline; stub the torch-backed modules as test_pipeline does.
+sys.modules.setdefault("src.separator", types.SimpleNamespace(separate_vocals=MagicMock()))
+sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+
+from src.scheduler import Scheduler  # noqa: E402
+from src.server import JobServer  # noqa: E402
+
+WORDS = [
+    {"word": "hello", "start": 0.0, "end": 0.5, "confidence": 0.9},
+    {"word": "shit", "start": 1.0, "end": 1.5, "confidence": 0.9},
+]
+
+
+async def http(port, method, path, body=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, payload = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(payload)
+
+
+class TestJobServer(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.input = os.path.join(self.tmp, "song.wav")
+        with open(self.input, "w") as f:
+            f.write("dummy audio content")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _server(self, **kwargs):
+        models = {"whisper": MagicMock(), "demucs": MagicMock(), "synthesizer": MagicMock()}
+        return JobServer(work_dir=os.path.join(self.tmp, "jobs"), models=models, **kwargs)
+
+    @patch("src.main.create_clean_version")
+    @patch("src.main.separate_vocals", return_value=("vocals.wav", "no_vocals.wav"))
+    @patch("src.main.transcribe_audio", return_value=WORDS)
+    def test_job_runs_with_warm_models(self, mock_transcribe, mock_separate, mock_create):
+        server = self._server()
+
+        async def scenario():
+            port = await server.start(port=0)
+            try:
+                status, submitted = await http(port, "POST", "/jobs", {"input": self.input, "use_synth": False})
+                self.assertEqual(status, 202)
+                for _ in range(200):
+                    status, job = await http(port, "GET", f"/jobs/{submitted['id']}")
+                    if job["status"] in ("done", "failed"):
+                        break
+                    await asyncio.sleep(0.01)
+                return await http(port, "GET", f"/jobs/{submitted['id']}/result")
+            finally:
+                await server.stop()
+
+        status, result = asyncio.run(scenario())
+        self.assertEqual((status, result["status"]), (200, "done"))
+        self.assertEqual([w["word"] for w in result["cuss_words"]], ["shit"])
+        self.assertTrue(os.path.exists(result["edl"]))
+        self.assertIs(mock_transcribe.call_args[0][0], server.models["whisper"])
+        self.assertIs(mock_separate.call_args[1]["model"], server.models["demucs"])
+        self.assertEqual(mock_create.call_count, 1)
+
+    @patch("src.main.create_clean_version")
+    @patch("src.main.separate_vocals", return_value=("vocals.wav", "no_vocals.wav"))
+    @patch("src.main.transcribe_audio", return_value=WORDS)
+    def test_scheduler_degrades_jobs_that_would_miss_the_deadline(self, mock_transcribe, mock_separate, mock_create):
+        server = self._server(scheduler=Scheduler(1.0, max_model_size="small"))
+        tiny = MagicMock()
+        server.models["whisper_models"] = {"small": server.models["whisper"], "tiny": tiny}
+
+        async def scenario():
+            port = await server.start(port=0)
+            try:
+                _, submitted = await http(port, "POST", "/jobs", {"input": self.input})
+                for _ in range(200):
+                    _, job = await http(port, "GET", f"/jobs/{submitted['id']}")
+                    if job["status"] in ("done", "failed"):
+                        return job
+                    await asyncio.sleep(0.01)
+            finally:
+                await server.stop()
+
+        job = asyncio.run(scenario())
+        self.assertEqual(job["status"], "done")
+        self.assertEqual((job["schedule"]["whisper"], job["schedule"]["synth"]), ("tiny", "silence"))
+        self.assertIs(mock_transcribe.call_args[0][0], tiny)
+        self.assertEqual(mock_separate.call_args[1]["shifts"], 1)
+        server.models["synthesizer"].generate_speech.assert_not_called()
+
+    @patch("src.main.create_clean_version")
+    @patch("src.main.separate_vocals", return_value=("vocals.wav", "no_vocals.wav"))
+    @patch("src.main.transcribe_audio", return_value=WORDS)
+    def test_refinement_runs_off_the_event_loop_and_is_reported(self, mock_transcribe, mock_separate, mock_create):
+        threads = []
+
+        def refine(segments, vocals_path):
+            threads.append(threading.current_thread())
+            return [dict(seg, start=seg["start"] - 0.1, asr_start=seg["start"], asr_end=seg["end"]) for seg in segments]
+
+        server = self._server()
+
+        async def scenario():
+            port = await server.start(port=0)
+            try:
+                _, submitted = await http(port, "POST", "/jobs",
+                                          {"input": self.input, "use_synth": False, "refine_boundaries": True})
+                for _ in range(200):
+                    _, job = await http(port, "GET", f"/jobs/{submitted['id']}")
+                    if job["status"] in ("done", "failed"):
+                        break
+                    await asyncio.sleep(0.01)
+                return await http(port, "GET", f"/jobs/{submitted['id']}/result")
+            finally:
+                await server.stop()
+
+        with patch("src.main.refine_segments", side_effect=refine):
+            _, result = asyncio.run(scenario())
+        self.assertEqual([(w["word"], w["start"]) for w in result["cuss_words"]], [("shit", 0.9)])
+        self.assertEqual(mock_create.call_args.kwargs["cuss_segments"][0]["start"], 0.9)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    @patch("src.main.transcribe_audio")
+    def test_full_queue_is_rejected(self, mock_transcribe):
+        release = threading.Event()
+        mock_transcribe.side_effect = lambda model, path: release.wait(5) and []
+        server = self._server(workers=1, queue_size=1)
+
+        async def scenario():
+            port = await server.start(port=0)
+            try:
+                statuses = []
+                for _ in range(3):
+                    status, _ = await http(port, "POST", "/jobs", {"input": self.input})
+                    statuses.append(status)
+                    await asyncio.sleep(0.05)
+                bad = await http(port, "POST", "/jobs", {"input": os.path.join(self.tmp, "missing.wav")})
+                unknown = await http(port, "GET", "/jobs/nope")
+                release.set()
+                return statuses, bad[0], unknown[0]
+            finally:
+                await server.stop()
+
+        statuses, bad, unknown = asyncio.run(scenario())
+        self.assertEqual(statuses, [202, 202, 503])
+        self.assertEqual((bad, unknown), (400, 404))
+
+    def test_model_stages_run_one_job_at_a_time(self):
+        server = self._server(concurrency={"transcription": 3, "separation": 2, "mixing": 4})
+        self.assertEqual(server.concurrency, {"transcription": 1, "separation": 1, "synthesis": 1, "mixing": 4})
+
+
+if __name__ == "__main__":
+    unittest.main()
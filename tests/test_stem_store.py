@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+from src.mixer import create_clean_version
+from src.stem_store import is_stem_path, open_stem, write_stem
+
+
+class TestStemStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        self.data = (0.25 * rng.standard_normal((4000, 2))).astype(np.float32)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_float32_stem_is_a_zero_copy_view(self):
+        path = write_stem(os.path.join(self.tmp, "vocals.stem"), self.data, 8000)
+        stem = open_stem(path)
+        self.assertTrue(is_stem_path(path))
+        self.assertEqual((stem.frames, stem.channels, stem.sample_rate), (4000, 2, 8000))
+        region = stem.read(100, 200)
+        self.assertIsInstance(region.base, np.memmap)
+        np.testing.assert_array_equal(region, self.data[100:200])
+
+    def test_int16_stem_round_trips_within_quantization(self):
+        path = write_stem(os.path.join(self.tmp, "vocals.stem"), self.data, 8000, dtype="int16")
+        np.testing.assert_allclose(open_stem(path).read(), self.data, atol=1 / 32768)
+
+    def test_rejects_foreign_files(self):
+        path = os.path.join(self.tmp, "bogus.stem")
+        with open(path, "wb") as f:
+            f.write(b"RIFF" + bytes(100))
+        with self.assertRaises(ValueError):
+            open_stem(path)
+
+    def test_mixer_renders_from_stems_without_pydub(self):
+        sr = 8000
+        instrumental = self.data * 0.5
+        vocals = np.full_like(self.data, 0.1)
+        inst_path = write_stem(os.path.join(self.tmp, "no_vocals.stem"), instrumental, sr)
+        vocals_path = write_stem(os.path.join(self.tmp, "vocals.stem"), vocals, sr)
+        original = os.path.join(self.tmp, "song.wav")
+        sf.write(original, instrumental + vocals, sr, subtype="FLOAT")
+
+        output = os.path.join(self.tmp, "clean.wav")
+        segments = [{"word": "damn", "replacement": "darn", "start": 0.1, "end": 0.2}]
+        create_clean_version(original, inst_path, segments, vocals_path=vocals_path,
+                             synth_dir=self.tmp, output_path=output)
+        data, _ = sf.read(output, dtype="float32")
+
+        np.testing.assert_allclose(data[800:1600], instrumental[800:1600], atol=1e-4)
+        np.testing.assert_allclose(data[:800], (instrumental + vocals)[:800], atol=1e-4)
+        np.testing.assert_allclose(data[1600:], (instrumental + vocals)[1600:], atol=1e-4)
+
+
+if __name__ == "__main__":
+    unittest.main()
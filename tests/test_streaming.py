@@ -0,0 +1,155 @@
+import io
+import threading
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from src import streaming
+from src.streaming import DelayLine, StreamCensor, _decode, _encode, run_stream
+
+# The transcriber's rate, so windows reach it without resampling.
+RATE = 16000
+
+
+def words_transcriber(words, delay=0.0):
+    """Returns the words fully inside each window, window-relative, after delay seconds."""
+    def transcribe(audio, offset_s):
+        if delay:
+            threading.Event().wait(delay)
+        length = len(audio) / RATE
+        return [
+            dict(w, start=w["start"] - offset_s, end=w["end"] - offset_s, confidence=1.0)
+            for w in words if w["start"] >= offset_s and w["end"] <= offset_s + length
+        ]
+    return transcribe
+
+
+def stream(censor, audio, block, settle=True):
+    """Feeds audio block by block; with settle, lets each window finish first, as real-time pacing would."""
+    out = []
+    for i in range(0, len(audio), block):
+        out.append(censor.process(audio[i:i + block]))
+        with censor._cond:
+            while settle and (censor._pending is not None or censor._busy):
+                censor._cond.wait()
+    out.append(censor.close())
+    return np.concatenate(out)
+
+
+class TestDelayLine(unittest.TestCase):
+    def test_delays_by_exactly_delay_frames(self):
+        line = DelayLine(5, 1)
+        signal = np.arange(1, 13, dtype=np.float32)[:, None]
+        out = np.concatenate([line.push(signal[i:i + 3]) for i in range(0, 12, 3)] + [line.drain()])
+        np.testing.assert_array_equal(out[:, 0], np.concatenate([np.zeros(5), np.arange(1, 13)]))
+
+    def test_edits_only_touch_held_frames(self):
+        line = DelayLine(4, 1)
+        line.push(np.ones((4, 1), dtype=np.float32))
+        line.push(np.ones((2, 1), dtype=np.float32))  # frames 0-1 emitted, 2-5 held
+        self.assertEqual(line.oldest, 2)
+        self.assertEqual(line.emitted(0, 4), 2)
+        line.scale(0, 4, lambda frames: np.zeros(len(frames), dtype=np.float32))
+        np.testing.assert_array_equal(line.drain()[:, 0], [0, 0, 1, 1])
+
+    def test_rejects_blocks_longer_than_the_delay(self):
+        with self.assertRaises(ValueError):
+            DelayLine(4, 1).push(np.zeros((5, 1), dtype=np.float32))
+
+
+class TestStreamCensor(unittest.TestCase):
+    def setUp(self):
+        self.audio = np.full((RATE * 12, 2), 0.5, dtype=np.float32)
+        self.words = [
+            {"word": "hello", "start": 1.0, "end": 1.4},
+            {"word": "fuck", "start": 4.0, "end": 4.3},
+            {"word": "shit", "start": 9.1, "end": 9.5},
+        ]
+
+    def test_mutes_cuss_words_in_the_delayed_output(self):
+        censor = StreamCensor(words_transcriber(self.words), RATE, 2, delay_s=3, window_s=2, step_s=1, fade_ms=0, pad_ms=0)
+        out = stream(censor, self.audio, RATE // 10)
+        delay = 3 * RATE
+        self.assertEqual(len(out), len(self.audio) + delay)
+        np.testing.assert_array_equal(out[:delay], 0.0)
+        for start, end in ((4.0, 4.3), (9.1, 9.5)):
+            np.testing.assert_array_equal(out[delay + int(start * RATE):delay + int(end * RATE)], 0.0)
+        np.testing.assert_array_equal(out[delay + int(1.0 * RATE):delay + int(1.4 * RATE)], 0.5)
+        self.assertEqual(float(np.sum(out == 0.0)) / 2, delay + int(0.3 * RATE) + int(0.4 * RATE))
+        self.assertEqual(censor.stats["edits"], 2)
+        self.assertEqual(censor.stats["late_edits"], 0)
+
+    def test_other_rates_are_resampled_as_they_arrive(self):
+        rate = 44100
+        windows = []
+        transcribe = words_transcriber(self.words)
+        censor = StreamCensor(lambda audio, offset_s: windows.append(len(audio)) or transcribe(audio, offset_s),
+                              rate, 1, delay_s=3, window_s=2, step_s=1, fade_ms=0, pad_ms=0)
+        out = stream(censor, np.full((rate * 12, 1), 0.5, dtype=np.float32), rate // 10)
+        delay = 3 * rate
+        # Each window reaches the transcriber at 16 kHz, short only by the resampler's few samples of delay.
+        self.assertTrue(all(2 * RATE - 32 <= length <= 2 * RATE for length in windows[1:]))
+        for start, end in ((4.0, 4.3), (9.1, 9.5)):
+            muted = np.flatnonzero(out[delay + int((start - 0.1) * rate):delay + int((end + 0.1) * rate), 0] == 0.0)
+            self.assertAlmostEqual(len(muted) / rate, end - start, delta=2 / rate)
+            self.assertAlmostEqual(muted[0] / rate, 0.1, delta=2 / rate)
+        self.assertEqual(censor.stats["edits"], 2)
+
+    def test_overlapping_windows_apply_an_edit_once(self):
+        censor = StreamCensor(words_transcriber(self.words), RATE, 2, delay_s=3, window_s=3, step_s=1)
+        stream(censor, self.audio, RATE // 10)
+        self.assertEqual(censor.stats["windows"], 13)
+        self.assertEqual(censor.stats["edits"], 2)
+
+    def test_counts_edits_that_arrive_after_the_audio_left(self):
+        # A 0.5 s delay with a 2 s step: every word is out before its window is transcribed.
+        censor = StreamCensor(words_transcriber(self.words), RATE, 2, delay_s=0.5, window_s=2, step_s=2, pad_ms=0)
+        out = stream(censor, self.audio, RATE // 10)
+        self.assertEqual(censor.stats["late_edits"], 2)
+        self.assertGreater(censor.stats["late_frames"], 0)
+        self.assertTrue(np.all(out[RATE // 2 + int(4.0 * RATE):RATE // 2 + int(4.3 * RATE)] == 0.5))
+
+    def test_slow_transcriber_skips_stale_windows(self):
+        censor = StreamCensor(words_transcriber(self.words, delay=0.05), RATE, 2, delay_s=3, window_s=1, step_s=0.1)
+        stream(censor, self.audio, RATE // 10, settle=False)
+        self.assertGreater(censor.stats["skipped_windows"], 0)
+        self.assertEqual(censor.stats["windows"] + censor.stats["skipped_windows"], 121)
+
+    def test_rejects_windows_shorter_than_the_step(self):
+        with self.assertRaises(ValueError):
+            StreamCensor(words_transcriber([]), RATE, 1, window_s=1, step_s=2)
+
+
+class TestRunStream(unittest.TestCase):
+    def test_round_trip_through_raw_pcm(self):
+        audio = np.tile(np.linspace(-0.5, 0.5, RATE, dtype=np.float32)[:, None], (3, 2))
+        source = io.BytesIO(_encode(audio, "s16le") + b"\x01")  # a stray trailing byte is dropped
+        sink = io.BytesIO()
+        censor = StreamCensor(words_transcriber([]), RATE, 2, delay_s=1, window_s=1, step_s=1)
+        stats = run_stream(censor, source, sink, "s16le", block_ms=70)
+        out = _decode(sink.getvalue(), "s16le", 2)
+        self.assertEqual(len(out), len(audio) + RATE)
+        np.testing.assert_allclose(out[RATE:], audio, atol=1e-4)
+        self.assertEqual(stats["edits"], 0)
+
+    def test_cli_keeps_messages_out_of_the_audio(self):
+        audio = np.zeros((RATE // 2, 1), dtype=np.float32)
+        stdin = io.TextIOWrapper(io.BytesIO(_encode(audio, "s16le")))
+        stdout, stderr = io.TextIOWrapper(io.BytesIO()), io.StringIO()
+        argv = ["streaming.py", "--sample_rate", str(RATE), "--channels", "1", "--delay", "0.25", "--window", "0.25", "--step", "0.25"]
+
+        def load(model_size):
+            print(f"Loading Whisper model '{model_size}'...")
+            return object()
+        with patch("sys.argv", argv), patch("sys.stdin", stdin), patch("sys.stdout", stdout), \
+                patch("sys.stderr", stderr), patch("src.lyrics.load_whisper_model", side_effect=load), \
+                patch("src.streaming.whisper_transcriber", return_value=words_transcriber([])):
+            streaming.main()
+        stdout.flush()
+        self.assertEqual(len(stdout.buffer.getvalue()), len(_encode(audio, "s16le")) + 2 * RATE // 4)
+        self.assertIn("Loading Whisper model", stderr.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
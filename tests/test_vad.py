@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import soundfile as sf
+
+from src.lyrics import transcribe_audio
+from src.vad import gather_intervals, remap_time, voiced_intervals
+
+SR = 16000
+
+
+def _song(with_pad):
+    """10 s: a modulated noise 'voice' from 3 s to 6 s, optionally over a held chord."""
+    rng = np.random.default_rng(0)
+    t = np.arange(SR * 10) / SR
+    voiced = (t >= 3) & (t < 6)
+    audio = 1e-4 * rng.standard_normal(len(t))
+    audio[voiced] += 0.2 * rng.standard_normal(voiced.sum()) * (0.5 + 0.5 * np.sin(2 * np.pi * 5 * t[voiced]))
+    if with_pad:
+        audio += 0.1 * (np.sin(2 * np.pi * 220 * t) + 0.5 * np.sin(2 * np.pi * 440 * t))
+    return audio.astype(np.float32)
+
+
+class FakeWhisper:
+    def transcribe(self, audio, word_timestamps=True):
+        self.decoded_seconds = len(audio) / SR
+        return {"segments": [{"words": [{"word": " Darn,", "start": 0.5, "end": 1.0, "probability": 0.9}]}]}
+
+
+class TestVad(unittest.TestCase):
+    def assertCovers(self, intervals, start, end):
+        self.assertEqual(len(intervals), 1)
+        self.assertLessEqual(intervals[0][0], start)
+        self.assertGreaterEqual(intervals[0][1], end)
+        self.assertLess(intervals[0][1] - intervals[0][0], (end - start) + 1.5)
+
+    def test_vocal_stem(self):
+        self.assertCovers(voiced_intervals(_song(False), SR, source="vocals"), 3.0, 6.0)
+
+    def test_mix_skips_held_chord(self):
+        self.assertCovers(voiced_intervals(_song(True), SR, source="mix"), 3.0, 6.0)
+
+    def test_gather_and_remap(self):
+        audio = np.ones(SR * 10, dtype=np.float32)
+        clip, spans = gather_intervals(audio, SR, [(1.0, 2.0), (5.0, 7.0)], gap_s=0.5)
+        self.assertEqual(len(clip), SR * 3 + SR // 2)
+        self.assertAlmostEqual(remap_time(0.25, spans), 1.25)
+        self.assertAlmostEqual(remap_time(1.75, spans), 5.25)
+        self.assertAlmostEqual(remap_time(1.2, spans), 2.0)  # inside the gap
+
+    def test_transcribe_only_voiced_sections(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "song.wav")
+            sf.write(path, _song(True), SR)
+            model = FakeWhisper()
+            words = transcribe_audio(model, path, voiced_intervals=[(3.0, 6.0)])
+        finally:
+            shutil.rmtree(tmp)
+        self.assertAlmostEqual(model.decoded_seconds, 3.0)
+        self.assertEqual(words, [{"word": "darn", "start": 3.5, "end": 4.0, "confidence": 0.9}])
+
+
+if __name__ == "__main__":
+    unittest.main()
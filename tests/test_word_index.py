@@ -0,0 +1,136 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.censor_manager import CUSS_MAPPING, detect_cuss_words
+from src.word_index import WordIndex, index_checkpoints, rerender, with_failed_jobs
+from src.work_queue import WorkQueue
+
+
+def words(*items):
+    return [{"word": word, "start": float(i), "end": i + 0.4} for i, word in enumerate(items)]
+
+
+class TestWordIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.index = WordIndex(os.path.join(self.tmp, "words.db"))
+        self.index.add_track("a", "/music/a.mp3", "/clean/a.mp3", words("Well", "frick", "this"))
+        self.index.add_track("b", "/music/b.mp3", "/clean/b.mp3", words("Fuckin'", "hell"))
+        self.index.add_track("c", "/music/c.mp3", "/clean/c.mp3", words("nothing", "to", "see"))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.tmp)
+
+    def test_only_tracks_with_changed_words_are_affected(self):
+        self.assertEqual(self.index.dictionary(), CUSS_MAPPING)
+        new_mapping = dict(CUSS_MAPPING, frick="fudge")
+        new_mapping.pop("hell")
+        affected = self.index.affected_tracks(new_mapping=new_mapping)
+        self.assertEqual([t["track"] for t in affected], ["a", "b"])
+        self.assertEqual(affected[0]["hits"], [("frick", 1.0, 1.4)])
+        self.assertEqual(affected[1]["hits"], [("hell", 1.0, 1.4)])
+
+    def test_slang_forms_follow_their_dictionary_entry(self):
+        new_mapping = dict(CUSS_MAPPING, fucking="flipping")
+        self.assertEqual(self.index.changed_words(CUSS_MAPPING, new_mapping), ["fuckin"])
+        self.assertEqual(detect_cuss_words(words("fuckin"), new_mapping)[0]["replacement"], "flipping")
+
+    def test_reindexing_a_track_replaces_its_words(self):
+        self.index.add_track("a", "/music/a.mp3", "/clean/a.mp3", words("clean", "now"))
+        new_mapping = dict(CUSS_MAPPING, frick="fudge")
+        self.assertEqual(self.index.affected_tracks(new_mapping=new_mapping), [])
+        self.assertEqual(len(self.index.tracks()), 3)
+
+    def test_rerender_can_queue_tracks_for_workers(self):
+        self.index.add_track("a", "/music/a.mp3", "/clean/a.mp3", words("frick"), {"model_size": "base", "vad": True})
+        queue_path = os.path.join(self.tmp, "queue.db")
+        tracks = self.index.affected_tracks(new_mapping=dict(CUSS_MAPPING, frick="fudge"))
+        self.assertEqual(rerender(tracks, queue_path), [])
+        queue = WorkQueue(queue_path)
+        jobs = queue.jobs()
+        queue.close()
+        self.assertEqual([(j["input"], j["output"], j["options"]) for j in jobs], [("/music/a.mp3", "/clean/a.mp3", {"vad": True})])
+
+    def test_local_rerender_keeps_the_render_options(self):
+        sys.modules.setdefault("src.separator", types.SimpleNamespace(separate_vocals=MagicMock()))
+        sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+        from src import main
+
+        song = os.path.join(self.tmp, "a.mp3")
+        open(song, "w").close()
+        options = {"model_size": "base", "use_synth": False, "dsp": True, "refine": True}
+        self.index.add_track("a", song, "/clean/a.mp3", words("frick"), dict(options, unknown=1))
+        tracks = self.index.affected_tracks(new_mapping=dict(CUSS_MAPPING, frick="fudge"))
+        with patch.object(main, "process_song") as mock_process:
+            self.assertEqual(rerender(tracks), [])
+        mock_process.assert_called_once_with(song, "/clean/a.mp3", **options)
+
+    def test_rerendering_a_checkpointed_track_keeps_its_stems(self):
+        sys.modules.setdefault("src.separator", types.SimpleNamespace(separate_vocals=MagicMock()))
+        sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+        from src import main
+
+        song, output = os.path.join(self.tmp, "song.wav"), os.path.join(self.tmp, "clean.wav")
+        stems = [os.path.join(self.tmp, name) for name in ("vocals.stem", "no_vocals.stem", song)]
+        for path in stems:
+            open(path, "w").close()
+        checkpoints = os.path.join(self.tmp, "checkpoints")
+        new_mapping = dict(CUSS_MAPPING, frick="fudge")
+        with patch.object(main, "load_whisper_model"), \
+                patch.object(main, "transcribe_audio", return_value=words("shit", "frick")) as mock_transcribe, \
+                patch.object(main, "separate_vocals", return_value=tuple(stems[:2])) as mock_separate, \
+                patch.object(main, "create_clean_version") as mock_create:
+            mock_create.side_effect = lambda **kwargs: open(kwargs["output_path"], "w").close()
+            main.process_song(song, output, model_size="large-v3", use_synth=False, checkpoint_dir=checkpoints)
+
+            index = WordIndex(os.path.join(self.tmp, "catalog.db"))
+            self.assertEqual(index_checkpoints(index, checkpoints), 1)
+            (track,) = index.affected_tracks(new_mapping=new_mapping)
+            self.assertEqual((track["options"]["model_size"], track["options"]["vad"]), ("large-v3", False))
+            with patch("src.word_timeline.CUSS_MAPPING", new_mapping):
+                self.assertEqual(rerender([track]), [])
+            index.close()
+
+        self.assertEqual((mock_transcribe.call_count, mock_separate.call_count, mock_create.call_count), (1, 1, 2))
+        segments = mock_create.call_args.kwargs["cuss_segments"]
+        self.assertEqual([seg["replacement"] for seg in segments], ["ship", "fudge"])
+
+    def test_queued_tracks_stay_pending_until_their_job_is_done(self):
+        queue_path = os.path.join(self.tmp, "queue.db")
+        new_mapping = dict(CUSS_MAPPING, frick="fudge")
+        self.index.add_track("d", "/music/d.mp3", "", words("frick"))
+        tracks = self.index.affected_tracks(new_mapping=new_mapping)
+        self.assertEqual(rerender(tracks, queue_path, self.index, CUSS_MAPPING), ["/music/d.mp3"])
+        self.assertEqual([row["track"] for row in self.index.pending()], ["a"])
+        self.index.set_dictionary(new_mapping)
+
+        queue = WorkQueue(queue_path, lease_seconds=60)
+        job = queue.claim("w1")
+        self.assertEqual(self.index.settle_pending(), (["a"], []))
+        queue.fail(job["id"], "w1", "boom")
+        queue.fail(queue.claim("w1")["id"], "w1", "boom")
+        queue.fail(queue.claim("w1")["id"], "w1", "boom")
+        in_flight, failed_jobs = self.index.settle_pending()
+        self.assertEqual(in_flight, [])
+        # The snapshot moved on, but the failed track is still rendered with the old dictionary.
+        with patch("src.word_index.CUSS_MAPPING", new_mapping):
+            self.assertEqual(self.index.changed_words(self.index.dictionary(), new_mapping), [])
+            retry = with_failed_jobs(self.index, [], failed_jobs)
+            self.assertEqual([(t["track"], t["hits"]) for t in retry], [("a", [("frick", 1.0, 1.4)])])
+            rerender(retry, queue_path, self.index)
+        self.assertEqual(self.index.pending()[0]["dictionary"], CUSS_MAPPING)
+
+        queue.complete(queue.claim("w1")["id"], "w1")
+        queue.close()
+        self.assertEqual(self.index.settle_pending(), ([], []))
+        self.assertEqual(self.index.pending(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
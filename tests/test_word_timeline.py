@@ -0,0 +1,63 @@
+import unittest
+
+import numpy as np
+
+from src.censor_manager import CUSS_MAPPING, detect_cuss_words
+from src.word_timeline import MAX_LOOKUPS, Vocabulary, WordTimeline
+
+WORDS = [
+    {"word": "oh", "start": 0.0, "end": 0.2, "confidence": 0.9},
+    {"word": "ShIT!!!", "start": 0.5, "end": 0.9, "confidence": 0.8},
+    {"word": "fuckin'", "start": 1.0, "end": 1.4, "confidence": 0.7},
+    {"word": "oh", "start": 2.0, "end": 2.2, "confidence": 0.95},
+    {"word": "shiiiit", "start": 3.0, "end": 3.5},
+]
+
+
+class TestWordTimeline(unittest.TestCase):
+    def test_round_trips_the_dict_format(self):
+        vocabulary = Vocabulary()
+        timeline = WordTimeline.from_words(WORDS, vocabulary)
+        self.assertEqual(len(timeline), 5)
+        self.assertEqual(vocabulary.words, ["oh", "ShIT!!!", "fuckin'", "shiiiit"])
+        np.testing.assert_array_equal(timeline.ids, [0, 1, 2, 0, 3])
+        self.assertEqual(timeline.to_words(), WORDS)
+
+    def test_detect_matches_the_per_word_rules(self):
+        timeline = WordTimeline.from_words(WORDS, Vocabulary())
+        self.assertEqual(
+            [(seg["word"], seg["start"], seg["replacement"]) for seg in timeline.detect()],
+            [("ShIT!!!", 0.5, "ship"), ("fuckin'", 1.0, "ducking"), ("shiiiit", 3.0, "ship")]
+        )
+        self.assertEqual(detect_cuss_words(timeline), detect_cuss_words(WORDS))
+        self.assertEqual(detect_cuss_words([]), [])
+
+    def test_lookups_are_cached_per_mapping_and_extended(self):
+        vocabulary = Vocabulary()
+        WordTimeline.from_words(WORDS[:2], vocabulary).detect()
+        codes, _ = vocabulary.replacement_codes(CUSS_MAPPING)
+        self.assertEqual(len(codes), 2)
+        timeline = WordTimeline.from_words(WORDS, vocabulary)
+        self.assertEqual(len(timeline.detect()), 3)
+        self.assertEqual(len(vocabulary.replacement_codes(CUSS_MAPPING)[0]), 4)
+        # A changed dictionary gets its own table.
+        mapping = dict(CUSS_MAPPING, fucking="flipping")
+        self.assertEqual([seg["replacement"] for seg in timeline.detect(mapping)], ["ship", "flipping", "ship"])
+        self.assertEqual([seg["replacement"] for seg in timeline.detect()], ["ship", "ducking", "ship"])
+
+    def test_default_vocabularies_are_per_timeline_and_lookups_are_capped(self):
+        first, second = WordTimeline.from_words(WORDS), WordTimeline.from_words(WORDS[:1])
+        self.assertIsNot(first.vocabulary, second.vocabulary)
+        self.assertEqual(len(second.vocabulary), 1)
+
+        vocabulary = Vocabulary()
+        timeline = WordTimeline.from_words(WORDS, vocabulary)
+        for index in range(MAX_LOOKUPS + 3):
+            timeline.detect(dict(CUSS_MAPPING, **{f"word{index}": "x"}))
+        timeline.detect()
+        self.assertEqual(len(vocabulary._lookups), MAX_LOOKUPS)
+        self.assertIn(tuple(CUSS_MAPPING.items()), vocabulary._lookups)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.work_queue import WorkQueue, run_worker
+
+
+def record_handler(job):
+    with open(job["output"], "a") as f:
+        f.write(f"{os.getpid()}\n")
+    return {"output": job["output"]}
+
+
+def worker_process(queue_path):
+    run_worker(WorkQueue(queue_path, lease_seconds=5.0), record_handler, poll_interval=0.01, exit_when_idle=True)
+
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "queue.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_expired_lease_is_reclaimed(self):
+        queue = WorkQueue(self.path, lease_seconds=0.05)
+        job_id = queue.enqueue("song.wav", "clean.wav")
+        self.assertEqual(queue.claim("a")["id"], job_id)
+        self.assertIsNone(queue.claim("b"))
+        time.sleep(0.1)
+
+        job = queue.claim("b")
+        self.assertEqual((job["id"], job["attempts"], job["worker"]), (job_id, 2, "b"))
+        self.assertFalse(queue.heartbeat(job_id, "a"))
+        self.assertFalse(queue.complete(job_id, "a", {"output": "stale"}))
+        self.assertTrue(queue.complete(job_id, "b", {"output": "clean.wav"}))
+        self.assertEqual(queue.get(job_id)["result"], {"output": "clean.wav"})
+
+    def test_heartbeat_keeps_the_lease(self):
+        queue = WorkQueue(self.path, lease_seconds=0.1)
+        job_id = queue.enqueue("song.wav", "clean.wav")
+        queue.claim("a")
+        for _ in range(3):
+            time.sleep(0.05)
+            self.assertTrue(queue.heartbeat(job_id, "a"))
+        self.assertIsNone(queue.claim("b"))
+
+    def test_failures_are_retried_until_attempts_run_out(self):
+        queue = WorkQueue(self.path)
+        job_id = queue.enqueue("song.wav", "clean.wav", {"vad": True}, max_attempts=2)
+        for attempt in (1, 2):
+            job = queue.claim("a")
+            self.assertEqual((job["attempts"], job["options"]), (attempt, {"vad": True}))
+            queue.fail(job_id, "a", "RuntimeError: boom")
+        self.assertIsNone(queue.claim("a"))
+        self.assertEqual(queue.get(job_id)["status"], "failed")
+        self.assertEqual(queue.counts(), {"failed": 1})
+
+    def test_workers_in_separate_processes_never_share_a_job(self):
+        queue = WorkQueue(self.path)
+        outputs = [os.path.join(self.tmp, f"out{i}.txt") for i in range(24)]
+        for output in outputs:
+            queue.enqueue("song.wav", output)
+
+        workers = [multiprocessing.Process(target=worker_process, args=(self.path,)) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+
+        self.assertEqual(queue.counts(), {"done": 24})
+        for output in outputs:
+            with open(output) as f:
+                self.assertEqual(len(f.read().split()), 1)
+
+
+class TestWorkerCache(unittest.TestCase):
+    def setUp(self):
+        # Stub the torch-backed modules as test_pipeline does, importing late so
+        # test_mixer can still install its pydub stub first.
+        separator_stub = sys.modules.setdefault("src.separator", types.ModuleType("src.separator"))
+        for name in ("separate_vocals", "separate_vocals_batch", "load_demucs_model"):
+            if not hasattr(separator_stub, name):
+                setattr(separator_stub, name, MagicMock())
+        sys.modules.setdefault("src.voice_synth", types.SimpleNamespace(VoiceSynthesizer=MagicMock()))
+        from src import worker
+        self.worker = worker
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    @patch("src.main.create_clean_version")
+    @patch("src.main.transcribe_audio", return_value=[{"word": "shit", "start": 1.0, "end": 1.5, "confidence": 0.9}])
+    def test_same_song_reuses_shared_cache(self, mock_transcribe, mock_create):
+        cache = self.worker.SharedCache(os.path.join(self.tmp, "cache"))
+        models = self.worker.WorkerModels()
+        models._whisper = models._demucs = MagicMock()
+
+        def fake_separate(input_path, output_dir, **kwargs):
+            stem_dir = os.path.join(output_dir, "song")
+            os.makedirs(stem_dir)
+            for name in ("vocals.stem", "no_vocals.stem"):
+                open(os.path.join(stem_dir, name), "w").close()
+            return os.path.join(stem_dir, "vocals.stem"), os.path.join(stem_dir, "no_vocals.stem")
+
+        results = []
+        with patch("src.main.separate_vocals", side_effect=fake_separate) as mock_separate:
+            for name in ("a.wav", "copy_of_a.wav"):
+                path = os.path.join(self.tmp, name)
+                with open(path, "w") as f:
+                    f.write("same audio bytes")
+                job = {"input": path, "output": os.path.join(self.tmp, "out", name), "options": {"use_synth": False}}
+                results.append(self.worker.process_job(job, models, cache))
+
+        self.assertEqual(mock_transcribe.call_count, 1)
+        self.assertEqual(mock_separate.call_count, 1)
+        self.assertEqual(mock_create.call_count, 2)
+        self.assertEqual(results[0]["key"], results[1]["key"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+import numpy as np
+
+from benchmarks.synthetic import XTTS_SAMPLE_RATE as SAMPLE_RATE, artifact_db, harmonic_word
+from src.time_stretch import stretch
+
+
+class TestWsola(unittest.TestCase):
+    def test_lengths_are_exact(self):
+        word = harmonic_word(0.45, 180.0)
+        for target in (1, 300, 6615, 15435):
+            self.assertEqual(stretch(word, SAMPLE_RATE, target).shape, (target,))
+        stereo = np.stack([word, 0.5 * word])
+        self.assertEqual(stretch(stereo, SAMPLE_RATE, 9000).shape, (2, 9000))
+
+    def test_pitch_is_kept_without_artifacts(self):
+        sine = np.sin(2 * np.pi * 440 * np.arange(SAMPLE_RATE) / SAMPLE_RATE).astype(np.float32)
+        for seconds in (2.0, 0.5):
+            out = stretch(sine, SAMPLE_RATE, int(seconds * SAMPLE_RATE))
+            self.assertLess(artifact_db(out, [440.0]), -40)
+            self.assertAlmostEqual(float(np.sqrt(np.mean(out ** 2))), 0.707, delta=0.02)
+        word = harmonic_word(0.45, 180.0)
+        out = stretch(word, SAMPLE_RATE, int(0.3 * SAMPLE_RATE))
+        self.assertLess(artifact_db(out, [180.0 * k for k in range(1, 6)]), -35)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            stretch(np.zeros(100, dtype=np.float32), SAMPLE_RATE, 200, backend="rubberband")
+
+
+if __name__ == "__main__":
+    unittest.main()